@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Content-addressed archive cache shared by the download scripts.
+
+Archives are stored as `<sha256>.zip` under the cache directory, downloads
+resume from a partial file, and extraction goes through a staging directory
+so the data directory is never left half-written.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+INDEX_NAME = "index.json"
+MANIFEST_NAME = ".manifest.json"
+
+# Several archives may be fetched/extracted concurrently into the same directories
+_INDEX_LOCK = threading.Lock()
+_MANIFEST_LOCK = threading.Lock()
+
+
+class ArchiveError(Exception):
+    """Download could not produce a usable archive."""
+
+
+class InvalidArchiveError(ArchiveError):
+    """Downloaded bytes are not a ZIP or do not match the expected checksum."""
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalise_source(source: str) -> str:
+    """Accept plain local paths as well as URLs (file://, http(s)://, Google Drive)."""
+    if "://" not in source and Path(source).exists():
+        return Path(source).resolve().as_uri()
+    return source
+
+
+def _write_json_atomic(path: Path, payload: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _download_drive(url: str, partial: Path, quiet: bool) -> int:
+    try:
+        import gdown
+    except ImportError as exc:
+        raise ArchiveError("gdown is not installed. Run: pip install gdown") from exc
+    # gdown keeps its own temp file (`<partial>*.part`) next to `partial`, resumes from it
+    # and skips the download when `partial` is already there
+    existed = partial.exists()
+    resumed_from = max((tmp.stat().st_size for tmp in partial.parent.glob(partial.name + "*.part")), default=0)
+    out = gdown.download(url, str(partial), quiet=quiet, resume=True)
+    if not out or not partial.exists():
+        raise ArchiveError(f"download failed or file missing: {url}")
+    return 0 if existed else max(partial.stat().st_size - resumed_from, 0)
+
+
+def _validator_path(partial: Path) -> Path:
+    return partial.with_name(partial.name + ".validator")
+
+
+def _response_validator(response) -> dict:
+    """ETag / Last-Modified of the remote file, saved next to the partial file."""
+    headers = response.headers
+    validator = {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+    return {key: value for key, value in validator.items() if value}
+
+
+def _if_range(validator: dict) -> str | None:
+    # If-Range only accepts a strong ETag; fall back to the modification date
+    etag = validator.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validator.get("last_modified")
+
+
+def _same_validator(saved: dict, current: dict) -> bool:
+    return all(saved[key] == current[key] for key in saved.keys() & current.keys())
+
+
+def _download_url(url: str, partial: Path) -> int:
+    """Download into `partial`; returns the number of bytes written by this call."""
+    validator_path = _validator_path(partial)
+    saved = _read_json(validator_path)
+    offset = partial.stat().st_size if partial.exists() else 0
+    if_range = _if_range(saved) if offset else None
+    if offset and not if_range:
+        # Without a validator nothing proves the remote file is unchanged: start over
+        offset = 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": if_range} if offset else {}
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 416 and offset:
+            # The partial file is already complete
+            return 0
+        raise ArchiveError(f"download failed ({exc.code}): {url}") from exc
+    except urllib.error.URLError as exc:
+        raise ArchiveError(f"download failed ({exc.reason}): {url}") from exc
+
+    with response:
+        current = _response_validator(response)
+        # 200: the server ignored the Range header or the file changed (If-Range), as does file://
+        resumed = offset > 0 and getattr(response, "status", None) == 206
+        if resumed and not _same_validator(saved, current):
+            resumed = False
+        if not resumed:
+            if offset and getattr(response, "status", None) == 206:
+                # Partial content of a different file: drop it and download everything again
+                response.close()
+                partial.unlink(missing_ok=True)
+                validator_path.unlink(missing_ok=True)
+                return _download_url(url, partial)
+            if current:
+                _write_json_atomic(validator_path, current)
+            else:
+                validator_path.unlink(missing_ok=True)
+        written = 0
+        with open(partial, "ab" if resumed else "wb") as fh:
+            for block in iter(lambda: response.read(CHUNK_SIZE), b""):
+                fh.write(block)
+                written += len(block)
+    return written
+
+
+def download_to(url: str, partial: Path, quiet: bool = False) -> int:
+    """Download `url` into `partial`, resuming from the bytes already there.
+
+    Returns the number of bytes written by this call: the whole file again
+    when a stale partial file had to be discarded.
+    """
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    if "drive.google.com" in url:
+        return _download_drive(url, partial, quiet)
+    return _download_url(url, partial)
+
+
+@dataclass
+class FetchResult:
+    path: Path
+    downloaded_bytes: int
+    seconds: float
+    cached: bool
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.downloaded_bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class ArchiveCache:
+    root: Path
+
+    def __post_init__(self) -> None:
+        (self.root / "partial").mkdir(parents=True, exist_ok=True)
+
+    def archive_path(self, sha256: str) -> Path:
+        return self.root / f"{sha256}.zip"
+
+    def partial_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        return self.root / "partial" / f"{key}.zip"
+
+    def lookup(self, url: str, expected_sha256: str | None = None) -> Path | None:
+        """Return a verified cached archive for `url`, or None."""
+        sha256 = expected_sha256 or _read_json(self.root / INDEX_NAME).get(url)
+        if not sha256:
+            return None
+        cached = self.archive_path(sha256)
+        if not cached.exists():
+            return None
+        if sha256_file(cached) != sha256:
+            cached.unlink()
+            return None
+        return cached
+
+    def fetch(
+        self,
+        url: str,
+        expected_sha256: str | None = None,
+        refresh: bool = False,
+        quiet: bool = False,
+    ) -> FetchResult:
+        """Return the cached archive for `url`, downloading it only when needed."""
+        if not refresh or expected_sha256:
+            cached = self.lookup(url, expected_sha256)
+            if cached is not None:
+                return FetchResult(cached, 0, 0.0, cached=True)
+
+        partial = self.partial_path(url)
+        start = time.perf_counter()
+        downloaded = download_to(url, partial, quiet=quiet)
+        elapsed = time.perf_counter() - start
+
+        # The validator only serves to resume this partial file
+        _validator_path(partial).unlink(missing_ok=True)
+        if not zipfile.is_zipfile(partial):
+            partial.unlink(missing_ok=True)
+            raise InvalidArchiveError(f"downloaded file is not a valid ZIP: {url}")
+        sha256 = sha256_file(partial)
+        if expected_sha256 and sha256 != expected_sha256:
+            partial.unlink(missing_ok=True)
+            raise InvalidArchiveError(
+                f"checksum mismatch for {url}: expected {expected_sha256}, got {sha256}"
+            )
+
+        archive = self.archive_path(sha256)
+        os.replace(partial, archive)
+        with _INDEX_LOCK:
+            index = _read_json(self.root / INDEX_NAME)
+            index[url] = sha256
+            _write_json_atomic(self.root / INDEX_NAME, index)
+        return FetchResult(archive, downloaded, elapsed, cached=False)
+
+
+@dataclass
+class SyncReport:
+    updated: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+
+def _current_sha256(path: Path, entry: dict | None) -> str | None:
+    if not path.exists():
+        return None
+    stat = path.stat()
+    # Untouched since we installed it: trust the recorded hash
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+    return sha256_file(path)
+
+
+def _extract_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, staging: Path) -> tuple[Path, str]:
+    """Stream one member to the staging directory, hashing it on the way."""
+    # Same sanitising as ZipFile.extract: drop absolute roots and '..' components
+    parts = [part for part in Path(info.filename).parts if part not in ("", ".", "..", "/")]
+    if not parts:
+        raise InvalidArchiveError(f"unsafe member name in archive: {info.filename!r}")
+    extracted = staging.joinpath(*parts)
+    extracted.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    with zf.open(info) as src, open(extracted, "wb") as dst:
+        for block in iter(lambda: src.read(CHUNK_SIZE), b""):
+            digest.update(block)
+            dst.write(block)
+    return extracted, digest.hexdigest()
+
+
+def sync_archive(archive: Path, target_dir: Path, source: str) -> SyncReport:
+    """Install the archive contents into `target_dir`, touching only changed files.
+
+    Every member is first streamed into a staging directory next to `target_dir`
+    and hashed in the same pass. Only once the whole archive has been read (a bad
+    CRC aborts before anything is touched) are the changed files moved with
+    `os.replace` (atomic on the same filesystem). Files previously installed
+    from the same `source` but absent from the archive are removed.
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = target_dir / MANIFEST_NAME
+    with _MANIFEST_LOCK:
+        known = _read_json(manifest_path)
+    report = SyncReport()
+
+    installed: dict[str, dict] = {}
+    staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=target_dir.parent))
+    try:
+        staged: list[tuple[str, Path, str]] = []
+        with zipfile.ZipFile(archive, "r") as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                extracted, sha256 = _extract_member(zf, info, staging)
+                staged.append((extracted.relative_to(staging).as_posix(), extracted, sha256))
+
+        # Whole archive read and CRC-checked: `target_dir` is only modified from here on
+        for relative, extracted, sha256 in staged:
+            destination = target_dir / relative
+            if _current_sha256(destination, known.get(relative)) == sha256:
+                report.unchanged.append(relative)
+            else:
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(extracted, destination)
+                report.updated.append(relative)
+            stat = destination.stat()
+            installed[relative] = {
+                "sha256": sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "source": source,
+            }
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    with _MANIFEST_LOCK:
+        manifest = _read_json(manifest_path)
+        for relative, entry in list(manifest.items()):
+            if entry.get("source") == source and relative not in installed:
+                (target_dir / relative).unlink(missing_ok=True)
+                del manifest[relative]
+                report.removed.append(relative)
+        manifest.update(installed)
+        _write_json_atomic(manifest_path, manifest)
+    return report
@@ -1,54 +1,59 @@
 #!/usr/bin/env python3
+import argparse
 import sys
-import zipfile
 from pathlib import Path
+from typing import Sequence
+
+from archive_cache import ArchiveCache, ArchiveError, InvalidArchiveError, normalise_source, sync_archive
 
 DRIVE_FILE_ID = "1S4KMI-bBA0b3BEi_D-PW5qtPc_UdEl4T"
 DRIVE_URL = f"https://drive.google.com/uc?id={DRIVE_FILE_ID}"
+# Set to the archive's SHA-256 to pin it; the cached copy is then reused without any network access.
+DRIVE_SHA256: str | None = None
 
-def main():
-    try:
-        import gdown
-    except ImportError:
-        print("gdown is not installed. Run: pip install gdown", file=sys.stderr)
-        sys.exit(1)
-
-    here = Path(__file__).resolve().parent
-    data_dir = (here / "../../data").resolve()
-    data_dir.mkdir(parents=True, exist_ok=True)
-
-    removed = 0
-    for csv in data_dir.rglob("*.csv"):
-        try:
-            csv.unlink()
-            removed += 1
-        except Exception as e:
-            print(f"Warning: couldn't remove {csv}: {e}", file=sys.stderr)
-
-    zip_path = here / "download.zip"
-    if zip_path.exists():
-        zip_path.unlink()
-
-    print("Downloading data ZIP from Google Drive...")
-    out = gdown.download(DRIVE_URL, str(zip_path), quiet=False)
-    if not out or not zip_path.exists():
-        print("Error: download failed or file missing.", file=sys.stderr)
-        sys.exit(2)
+HERE = Path(__file__).resolve().parent
+DEFAULT_DATA_DIR = (HERE / "../../data").resolve()
+DEFAULT_CACHE_DIR = HERE / ".cache"
 
-    if not zipfile.is_zipfile(zip_path):
-        print(f"Error: downloaded file is not a valid ZIP: {zip_path}", file=sys.stderr)
-        sys.exit(3)
 
-    print(f"Extracting to {data_dir}...")
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(data_dir)
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download and install the raw CSV archive.")
+    parser.add_argument("--url", default=DRIVE_URL, help="Archive source: Drive URL, http(s)://, file:// or local path")
+    parser.add_argument("--sha256", default=DRIVE_SHA256, help="Expected SHA-256 of the archive")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--refresh", action="store_true", help="Fetch the archive again even if it is cached")
+    return parser.parse_args(argv)
+
 
+def main(argv: Sequence[str] | None = None):
+    args = parse_args(argv)
+    url = normalise_source(args.url)
+    data_dir = args.data_dir.resolve()
+    cache = ArchiveCache(args.cache_dir)
+
+    print(f"Fetching data ZIP from {url}...")
     try:
-        zip_path.unlink()
-    except Exception:
-        pass
+        fetched = cache.fetch(url, expected_sha256=args.sha256, refresh=args.refresh)
+    except InvalidArchiveError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except ArchiveError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if fetched.cached:
+        print(f"Using cached archive {fetched.path.name}.")
+    else:
+        print(f"Downloaded {fetched.downloaded_bytes / 1e6:.1f} MB at {fetched.bytes_per_second / 1e6:.2f} MB/s.")
+
+    print(f"Extracting {fetched.path.name} to {data_dir}...")
+    report = sync_archive(fetched.path, data_dir, source=url)
 
-    print(f"Done. Removed {removed} CSV file(s), downloaded and extracted archive into {data_dir}.")
+    print(
+        f"Done. {len(report.updated)} file(s) updated, {len(report.unchanged)} unchanged, "
+        f"{len(report.removed)} removed in {data_dir}."
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -7,22 +7,18 @@ Utilisation :
 
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.decomposition import FactorAnalysis
-from factor_analyzer import FactorAnalyzer
-from factor_analyzer.factor_analyzer import calculate_bartlett_sphericity
 
 
 CSV_PATH: str = "data/merged_tracks.csv"
 OUTPUT_PATH: str = "graphs/matthieu/"
 COL_1: str = "artist_location"
 COL_2: str = "track_genre_top"
+CHUNK_SIZE: int = 100_000
 
 
 def main() -> None:
-    data: pd.DataFrame = load_data()
-
     print(f"\nColumns selected: {COL_1} and {COL_2}\n")
-    contingency_table = get_contingency_table(data, COL_1, COL_2)
+    contingency_table = load_contingency_table(COL_1, COL_2)
     standardized_contingency_table: pd.DataFrame = standardize_contingency_table(
         contingency_table
     )
@@ -38,24 +34,40 @@ def main() -> None:
     afc(standardized_contingency_table, nb_factors)
 
 
-def load_data() -> pd.DataFrame:
+def load_contingency_table(col1: str, col2: str) -> pd.DataFrame:
     print("\nLoading CSV...")
-    data: pd.DataFrame
     try:
-        data = pd.read_csv(
-            CSV_PATH,
-            low_memory=False,
-            # Paramètre nrows=1000 possible pour limiter la lecture
-        )
+        contingency_table = build_contingency_table(CSV_PATH, col1, col2)
     except FileNotFoundError:
         print("CSV not found. Make sure to run this script from the root of the repository.")
         raise SystemExit(1)
     print("CSV loaded.\n")
-    return data
-
+    return contingency_table
+
+
+def build_contingency_table(
+    csv_path: str, col1: str, col2: str, chunksize: int = CHUNK_SIZE
+) -> pd.DataFrame:
+    # Lecture par blocs des deux seules colonnes utiles : les effectifs sont cumulés
+    # par couple observé (forme creuse), la mémoire dépend donc du nombre de couples
+    # distincts et non de la taille du CSV.
+    counts: pd.Series | None = None
+    reader = pd.read_csv(
+        csv_path,
+        usecols=[col1, col2],
+        dtype=str,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk_counts = chunk.groupby([col1, col2]).size()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
 
-def get_contingency_table(data: pd.DataFrame, col1: str, col2: str) -> pd.DataFrame:
-    return pd.crosstab(data[col1], data[col2])
+    if counts is None or counts.empty:
+        return pd.DataFrame(
+            index=pd.Index([], name=col1), columns=pd.Index([], name=col2), dtype="int64"
+        )
+    # Même forme que pd.crosstab : modalités triées, zéros pour les couples absents.
+    return counts.astype("int64").unstack(fill_value=0).sort_index().sort_index(axis=1)
 
 
 def standardize_contingency_table(contingency_table: pd.DataFrame) -> pd.DataFrame:
@@ -67,12 +79,16 @@ def standardize_contingency_table(contingency_table: pd.DataFrame) -> pd.DataFra
 def get_p_val(
     contingency_table: pd.DataFrame, standardized_contingency_table: pd.DataFrame
 ) -> tuple:
+    from factor_analyzer.factor_analyzer import calculate_bartlett_sphericity
+
     _, p_val = calculate_bartlett_sphericity(contingency_table)
     _, p_val_std = calculate_bartlett_sphericity(standardized_contingency_table)
     return (p_val, p_val_std)
 
 
 def get_nb_factors(contingency_table: pd.DataFrame, X_scaled: pd.DataFrame) -> int:
+    from factor_analyzer import FactorAnalyzer
+
     print("\nGet nb factors...")
     max_nb_factors: int = min(
         contingency_table.shape[0], contingency_table.shape[1] - 1
@@ -108,6 +124,8 @@ def get_nb_factors(contingency_table: pd.DataFrame, X_scaled: pd.DataFrame) -> i
 
 
 def afc(X_scaled: pd.DataFrame, nb_factors: int) -> None:
+    from sklearn.decomposition import FactorAnalysis
+
     print("\nAFC...")
     methods = [
         ("FA No rotation", FactorAnalysis(nb_factors)),
@@ -5,6 +5,7 @@ Utilisation :
 (à lancer depuis la racine du projet pour accéder à 'cleaned_data/merged_tracks.csv' et produire 'area_chart_artists.png')
 """
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
@@ -12,87 +13,74 @@ import os
 
 def generate_area_chart(csv_path: str = "../../../cleaned_data/merged_tracks.csv",
                         output_filename: str = "area_chart_artists.png",
-                        top_n: int = 9):
-
-    # Charger le CSV
-    df = pd.read_csv(csv_path)
+                        top_n: int | None = 9):
 
     # Colonnes nécessaires
     required = ["artist_id", "track_id", "tempo", "artist_favorites"]
-    missing = [c for c in required if c not in df.columns]
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing = [c for c in required if c not in header]
     if missing:
         print(f"ERROR: Missing columns in CSV: {', '.join(missing)}")
         raise SystemExit(1)
 
+    # Charger uniquement les colonnes utiles (+ libellés artistes si présents)
+    use = required + (["artist_name"] if "artist_name" in header else [])
+    df = pd.read_csv(csv_path, usecols=use)
+
     # Nettoyage de base
     df["artist_id"] = pd.to_numeric(df["artist_id"], errors="coerce")
     df["track_id"] = pd.to_numeric(df["track_id"], errors="coerce")
     df["tempo"] = pd.to_numeric(df["tempo"], errors="coerce")
     df["artist_favorites"] = pd.to_numeric(df["artist_favorites"], errors="coerce").fillna(0)
+    df = df.dropna(subset=["artist_id", "tempo"])
 
-    # Libellés artistes
+    # Libellés artistes (un nom par identifiant)
     if "artist_name" in df.columns:
         name_map = (
-            df[["artist_id", "artist_name"]]
-            .dropna()
-            .drop_duplicates()
+            df.dropna(subset=["artist_name"])
+            .drop_duplicates(subset="artist_id")
             .set_index("artist_id")["artist_name"]
         )
     else:
         name_map = pd.Series(dtype=str)
 
-    # Top N artistes par favoris (max par artiste) parmi ceux avec tempo defini
-    valid = df.dropna(subset=["tempo"]).copy()
-    artist_rank = (
-        valid.groupby("artist_id", dropna=True)["artist_favorites"]
-        .max()
-        .sort_values(ascending=False)
-    )
-    top_artists = artist_rank.head(int(top_n)).index.tolist()
-
-    # Restreindre au top et supprimer tempo manquant
-    work = df[df["artist_id"].isin(top_artists)].dropna(subset=["tempo"]).copy()
+    # Top N artistes par favoris (max par artiste) ; None conserve tous les artistes
+    if top_n is not None:
+        artist_rank = (
+            df.groupby("artist_id")["artist_favorites"]
+            .max()
+            .sort_values(ascending=False)
+        )
+        df = df[df["artist_id"].isin(artist_rank.index[:int(top_n)])]
 
     # Dé-dupliquer paires (artist, track, tempo) si données explosées
-    work = work.drop_duplicates(subset=["artist_id", "track_id", "tempo"])
+    work = df.drop_duplicates(subset=["artist_id", "track_id", "tempo"])
 
-    # Découper le tempo en 12 bins
+    # Découper le tempo en 12 bins ; les centres viennent directement des intervalles
     bins = 12
-    work["bin"] = pd.cut(work["tempo"], bins=bins)
-
-    # Compter le nombre de morceaux par artiste / bin
-    g = work.groupby(["artist_id", "bin"]).size().rename("count").reset_index()
-
-    # S'assurer que tous les bins existent pour chaque artiste
-    all_bins = g["bin"].cat.categories
-    artists = g["artist_id"].unique()
-    full_index = pd.MultiIndex.from_product([artists, all_bins], names=["artist_id", "bin"])
-    g = g.set_index(["artist_id", "bin"]).reindex(full_index, fill_value=0).reset_index()
-
-    # Centres des intervalles (x)
-    g["x"] = g["bin"].apply(lambda iv: (iv.left + iv.right) / 2)
-
-    # Noms pour la légende
-    def _name(aid):
-        try:
-            return str(name_map.loc[aid])
-        except Exception:
-            return f"Artist {int(aid) if pd.notna(aid) else 'Unknown'}"
-    g["artist_name"] = g["artist_id"].apply(_name)
-
-    # Tableau croisé pour tracer
-    pivot = (
-        g.pivot_table(index="x", columns="artist_name", values="count", aggfunc="sum")
-        .sort_index()
-        .fillna(0)
-    )
-    x = pivot.index.values
-    ystack = pivot.values.T
+    tempo_bins = pd.cut(work["tempo"], bins=bins)
+    bin_codes = tempo_bins.cat.codes.to_numpy()
+    x = tempo_bins.cat.categories.mid.to_numpy()
+
+    # Compter le nombre de morceaux par artiste / bin sur les codes entiers
+    artist_codes, artist_ids = pd.factorize(work["artist_id"], sort=True)
+    n_artists = len(artist_ids)
+    counts = np.bincount(
+        artist_codes * bins + bin_codes, minlength=n_artists * bins
+    ).reshape(n_artists, bins)
+
+    # Noms pour la légende, triés comme l'ancien tableau croisé
+    ids = pd.Series(artist_ids)
+    fallback = "Artist " + ids.astype("int64").astype(str)
+    labels = ids.map(name_map).fillna(fallback).astype(str).to_numpy()
+    order = np.argsort(labels, kind="stable")
+    labels = labels[order]
+    ystack = counts[order]
 
     # Tracé: aires empilées
     plt.figure(figsize=(14, 8))
-    plt.stackplot(x, ystack, labels=pivot.columns)
-    shown = len(pivot.columns)
+    plt.stackplot(x, ystack, labels=labels)
+    shown = len(labels)
     plt.title(f"Top {shown} Artists by Favorites - Track Count across Tempo (stacked)")
     plt.xlabel("Tempo (BPM)")
     plt.ylabel("Track Count")
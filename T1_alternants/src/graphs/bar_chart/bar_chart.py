@@ -13,6 +13,10 @@ import os
 
 def load_data(csv_path: str) -> pd.DataFrame:
     df = pd.read_csv(csv_path, low_memory=False)
+    return prepare_data(df)
+
+
+def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
     required_cols = {'track_genre_top', 'energy'}
     missing = required_cols - set(df.columns)
     if missing:
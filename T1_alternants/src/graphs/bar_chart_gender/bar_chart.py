@@ -18,6 +18,10 @@ from globalrules import DEFAULT_OUTPUT_DIR, DEFAULT_GRAPHS_FOLDER
 
 def load_data(csv_path: str) -> pd.DataFrame:
     df = pd.read_csv(csv_path, low_memory=False)
+    return prepare_data(df)
+
+
+def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
     required_cols = {'gender'}
     missing = required_cols - set(df.columns)
     if missing:
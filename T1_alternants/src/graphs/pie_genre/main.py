@@ -34,6 +34,11 @@ def load_genre_streams(data_path: Path) -> Tuple[pd.Series, int]:
     """Charge les données et agrège les écoutes par genre principal."""
     # Load data
     df = pd.read_csv(data_path)
+    return aggregate_genre_streams(df)
+
+
+def aggregate_genre_streams(df: pd.DataFrame) -> Tuple[pd.Series, int]:
+    """Agrège les genres cités sur un jeu déjà chargé."""
     df_clean = df.dropna(subset=["track_genre"]).copy()
     df_clean["track_genre"] = df_clean["track_genre"].apply(ast.literal_eval)
 
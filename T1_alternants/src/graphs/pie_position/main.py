@@ -35,6 +35,11 @@ def load_position_streams(data_path: Path) -> Tuple[pd.Series, int]:
 
     # Load data
     df = pd.read_csv(data_path)
+    return aggregate_position_streams(df)
+
+
+def aggregate_position_streams(df: pd.DataFrame) -> Tuple[pd.Series, int]:
+    """Agrège les domaines de travail sur un jeu déjà chargé."""
     df_clean = df.dropna(subset=["position"]).copy()
     position_streams = df_clean["position"].value_counts()
 
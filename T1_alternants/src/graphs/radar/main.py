@@ -12,6 +12,15 @@ from typing import Dict, List, Tuple
 import matplotlib.pyplot as plt
 import pandas as pd
 
+AUDIO_COLS: List[str] = [
+    "acousticness",
+    "danceability",
+    "energy",
+    "speechiness",
+    "instrumentalness",
+]
+SELECTED_GENRES: List[str] = ["Rock", "Instrumental", "Hip-Hop"]
+
 
 def resolve_paths() -> Tuple[Path, Path]:
     """Retourne le chemin du jeu de données et le dossier de sortie."""
@@ -31,6 +40,15 @@ def load_audio_features(
 ) -> Tuple[pd.DataFrame, int]:
     """Charge les données audio et filtre les genres souhaités."""
     df = pd.read_csv(data_path)
+    return filter_audio_features(df, selected_genres, audio_cols)
+
+
+def filter_audio_features(
+    df: pd.DataFrame,
+    selected_genres: List[str],
+    audio_cols: List[str],
+) -> Tuple[pd.DataFrame, int]:
+    """Filtre un jeu de données déjà chargé sur les genres souhaités."""
     # Nettoyer les données pour conserver les colonnes indispensables
     df_clean = df.dropna(subset=["track_genre_top", *audio_cols]).copy()
     df_filtered = df_clean[df_clean["track_genre_top"].isin(selected_genres)]
@@ -146,14 +164,8 @@ def main() -> None:
             f"Dataset not found at {data_path}. Ensure preprocessing is complete."
         )
 
-    audio_cols = [
-        "acousticness",
-        "danceability",
-        "energy",
-        "speechiness",
-        "instrumentalness",
-    ]
-    selected_genres = ["Rock", "Instrumental", "Hip-Hop"]
+    audio_cols = AUDIO_COLS
+    selected_genres = SELECTED_GENRES
 
     df_filtered, filtered_count = load_audio_features(
         data_path, selected_genres, audio_cols
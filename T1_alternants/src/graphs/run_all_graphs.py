@@ -4,10 +4,11 @@ from __future__ import annotations
 import importlib.util
 import os
 import sys
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from types import ModuleType
-from typing import Callable, Dict, List, Sequence
+from typing import Callable, List, Sequence
 
 os.environ.setdefault("MPLBACKEND", "Agg")
 
@@ -25,10 +26,63 @@ class RunContext:
     graphs_dir: Path
 
 
+@dataclass(frozen=True)
+class OutputRecord:
+    path: Path
+    size: int
+    render_seconds: float
+
+
+@dataclass
+class OutputWriter:
+    """Collecte les fichiers déclarés par une tâche, avec leur taille et leur durée de rendu."""
+
+    directory: Path
+    records: List[OutputRecord] = field(default_factory=list)
+    _last_mark: float = field(default_factory=time.perf_counter, repr=False)
+    _started_ns: int = field(default=0, repr=False)
+
+    def __post_init__(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._started_ns = self._filesystem_now()
+
+    def _filesystem_now(self) -> int:
+        """Horodatage du système de fichiers (mtime d'un fichier témoin), comparable aux st_mtime_ns des sorties."""
+        marker = self.directory / ".run_started"
+        marker.write_bytes(b"")
+        try:
+            return marker.stat().st_mtime_ns
+        finally:
+            marker.unlink()
+
+    def path(self, name: str) -> Path:
+        """Retourne le chemin d'une sortie dans le dossier de la tâche."""
+        return self.directory / name
+
+    def record(self, path: Path) -> OutputRecord:
+        """Déclare un fichier produit ; la durée est mesurée depuis la déclaration précédente."""
+        now = time.perf_counter()
+        # Un fichier d'une exécution précédente ne compte pas : il doit dater de cette tâche
+        if not path.is_file() or path.stat().st_mtime_ns < self._started_ns:
+            raise FileNotFoundError(f"Declared output was not written: {path}")
+        entry = OutputRecord(
+            path=path,
+            size=path.stat().st_size,
+            render_seconds=now - self._last_mark,
+        )
+        self.records.append(entry)
+        self._last_mark = now
+        return entry
+
+    def record_all(self, names: Sequence[str]) -> List[OutputRecord]:
+        """Déclare plusieurs fichiers écrits en une seule passe par le module."""
+        return [self.record(self.path(name)) for name in names]
+
+
 @dataclass(frozen=True)
 class GraphTask:
     key: str
-    runner: Callable[[RunContext], Sequence[Path]]
+    runner: Callable[[RunContext, OutputWriter], None]
 
 
 def load_module(name: str, file_path: Path) -> ModuleType:
@@ -42,179 +96,146 @@ def load_module(name: str, file_path: Path) -> ModuleType:
     return module
 
 
-def snapshot_files(directory: Path) -> Dict[Path, float]:
-    """Construit une photographie des fichiers présents avec leur mtime."""
-    if not directory.exists():
-        return {}
-    return {
-        path: path.stat().st_mtime
-        for path in directory.rglob("*")
-        if path.is_file()
-    }
-
-
-def capture_outputs(directory: Path, callable_obj: Callable[[], None]) -> List[Path]:
-    """Exécute une fonction et retourne les fichiers ajoutés ou modifiés."""
-    directory.mkdir(parents=True, exist_ok=True)
-    before = snapshot_files(directory)
-    callable_obj()
-    after = snapshot_files(directory)
-    changed = [
-        path
-        for path, mtime in after.items()
-        if path not in before or before[path] != mtime
-    ]
-    if changed:
-        return sorted(changed)
-    return sorted(after.keys())
-
-
-def run_afc(context: RunContext) -> Sequence[Path]:
+def run_afc(context: RunContext, writer: OutputWriter) -> None:
     module = load_module(
         "graphs_afc_main", context.graphs_dir / "afc" / "main.py"
     )
-    output_dir = context.outputs_root / "afc"
 
     module.CSV_PATH = str(context.cleaned_csv)
-    module.OUTPUT_PATH = output_dir.as_posix() + "/"
+    module.OUTPUT_PATH = writer.directory.as_posix() + "/"
 
-    return capture_outputs(output_dir, module.main)
+    module.main()
+    # matplotlib ajoute l'extension par défaut aux noms sans suffixe
+    writer.record_all(["afc_get_nb_factors.png", "afc.png"])
 
 
-def run_area_chart(context: RunContext) -> Sequence[Path]:
+def run_area_chart(context: RunContext, writer: OutputWriter) -> None:
     module = load_module(
         "graphs_area_chart", context.graphs_dir / "area_chart" / "area_chart.py"
     )
-    output_dir = context.outputs_root / "area_chart"
-
-    def _run() -> None:
-        module.generate_area_chart(
-            csv_path=str(context.cleaned_csv),
-            output_filename=str(output_dir / "area_chart_artists.png"),
-        )
+    output_path = writer.path("area_chart_artists.png")
 
-    return capture_outputs(output_dir, _run)
+    module.generate_area_chart(
+        csv_path=str(context.cleaned_csv),
+        output_filename=str(output_path),
+    )
+    writer.record(output_path)
 
 
-def run_bar_chart(context: RunContext) -> Sequence[Path]:
+def run_bar_chart(context: RunContext, writer: OutputWriter) -> None:
     module = load_module(
         "graphs_bar_chart", context.graphs_dir / "bar_chart" / "bar_chart.py"
     )
-    output_dir = context.outputs_root / "bar_chart"
-
-    def _run() -> None:
-        df = module.load_data(str(context.cleaned_csv))
-        energy = module.compute_energy_by_genre(df)
-        module.plot_energy_by_genre(
-            energy_by_genre=energy,
-            output_path=str(output_dir / "energy_by_genre.png"),
-        )
+    output_path = writer.path("energy_by_genre.png")
 
-    return capture_outputs(output_dir, _run)
+    df = module.load_data(str(context.cleaned_csv))
+    energy = module.compute_energy_by_genre(df)
+    module.plot_energy_by_genre(
+        energy_by_genre=energy,
+        output_path=str(output_path),
+    )
+    writer.record(output_path)
 
 
-def run_bubble_chart(context: RunContext) -> Sequence[Path]:
+def run_bubble_chart(context: RunContext, writer: OutputWriter) -> None:
     module = load_module(
         "graphs_bubble_chart", context.graphs_dir / "bubble_chart_albums" / "bubbleChart.py"
     )
-    output_dir = context.outputs_root / "bubble_chart_albums"
-
-    def _run() -> None:
-        module.generate_bubble_chart(
-            csv_path=str(context.cleaned_csv),
-            output_filename=str(output_dir / "bubble_chart_albums.png"),
-        )
+    output_path = writer.path("bubble_chart_albums.png")
 
-    return capture_outputs(output_dir, _run)
+    module.generate_bubble_chart(
+        csv_path=str(context.cleaned_csv),
+        output_filename=str(output_path),
+    )
+    writer.record(output_path)
 
 
-def run_heatmap(context: RunContext) -> Sequence[Path]:
+def run_heatmap(context: RunContext, writer: OutputWriter) -> None:
     module = load_module(
         "graphs_heatmap", context.graphs_dir / "heatmap_tracks_vs_albums" / "heatMap.py"
     )
-    output_dir = context.outputs_root / "heatmap_tracks_vs_albums"
-
-    def _run() -> None:
-        module.generate_correlation_heatmap(
-            csv_path=str(context.cleaned_csv),
-            output_filename=str(output_dir / "heatmap_track_vs_album_correlation.png"),
-        )
+    output_path = writer.path("heatmap_track_vs_album_correlation.png")
 
-    return capture_outputs(output_dir, _run)
+    module.generate_correlation_heatmap(
+        csv_path=str(context.cleaned_csv),
+        output_filename=str(output_path),
+    )
+    writer.record(output_path)
 
 
-def run_pca(context: RunContext) -> Sequence[Path]:
+def run_pca(context: RunContext, writer: OutputWriter) -> None:
     module = load_module("graphs_pca", context.graphs_dir / "pca" / "main.py")
-    output_dir = context.outputs_root / "pca"
 
     module.ROOT = context.project_root
     module.CSV_PATH = context.cleaned_csv
-    module.OUT_DIR = output_dir
+    module.OUT_DIR = writer.directory
 
-    return capture_outputs(output_dir, module.run)
+    module.run()
+    writer.record_all([
+        "explained_variance.csv",
+        "explained_variance.png",
+        "loadings.csv",
+        "biplot_variables.png",
+        "individuals_scatter.png",
+        "summary.txt",
+    ])
 
 
-def run_pie(context: RunContext) -> Sequence[Path]:
+def run_pie(context: RunContext, writer: OutputWriter) -> None:
     module = load_module("graphs_pie", context.graphs_dir / "pie" / "main.py")
-    output_dir = context.outputs_root / "pie"
 
     data_path = context.cleaned_csv
 
     def _resolve_paths() -> tuple[Path, Path]:
-        output_dir.mkdir(parents=True, exist_ok=True)
-        return data_path, output_dir
+        return data_path, writer.directory
 
     module.resolve_paths = _resolve_paths
 
-    return capture_outputs(output_dir, module.main)
+    module.main()
+    writer.record(writer.path("pie_chart_genres.png"))
 
 
-def run_radar(context: RunContext) -> Sequence[Path]:
+def run_radar(context: RunContext, writer: OutputWriter) -> None:
     module = load_module("graphs_radar", context.graphs_dir / "radar" / "main.py")
-    output_dir = context.outputs_root / "radar"
 
     data_path = context.cleaned_csv
 
     def _resolve_paths() -> tuple[Path, Path]:
-        output_dir.mkdir(parents=True, exist_ok=True)
-        return data_path, output_dir
+        return data_path, writer.directory
 
     module.resolve_paths = _resolve_paths
 
-    return capture_outputs(output_dir, module.main)
+    module.main()
+    writer.record(writer.path("radar_comparison.png"))
 
 
-def run_scatter_plot(context: RunContext) -> Sequence[Path]:
+def run_scatter_plot(context: RunContext, writer: OutputWriter) -> None:
     module = load_module("graphs_scatter", context.graphs_dir / "scatter_plot" / "scatter.py")
-    output_dir = context.outputs_root / "scatter_plot"
-
-    def _run() -> None:
-        df = module.load_data(str(context.cleaned_csv))
-        filtered = module.keep_first_n_tracks_per_album(df, n=50)
-        avg = module.compute_average_listens(filtered)
-        module.plot_average_listens(
-            avg_listens=avg,
-            output_path=str(output_dir / "scatter.png"),
-            max_track=50,
-        )
-
-    return capture_outputs(output_dir, _run)
+    output_path = writer.path("scatter.png")
+
+    df = module.load_data(str(context.cleaned_csv))
+    filtered = module.keep_first_n_tracks_per_album(df, n=50)
+    avg = module.compute_average_listens(filtered)
+    module.plot_average_listens(
+        avg_listens=avg,
+        output_path=str(output_path),
+        max_track=50,
+    )
+    writer.record(output_path)
 
 
-def run_scatter_genre_years(context: RunContext) -> Sequence[Path]:
+def run_scatter_genre_years(context: RunContext, writer: OutputWriter) -> None:
     module = load_module(
         "graphs_scatter_genre_years",
         context.graphs_dir / "scatter_plot_genre_years" / "scatter_plot_genre_years.py",
     )
-    output_dir = context.outputs_root / "scatter_plot_genre_years"
+    output_path = writer.path("genre_popularity_by_year.png")
 
-    def _run() -> None:
-        module.plot_genre_popularity_by_year(
-            csv_path=str(context.cleaned_csv),
-            output=str(output_dir / "genre_popularity_by_year.png"),
-        )
-
-    return capture_outputs(output_dir, _run)
+    module.plot_genre_popularity_by_year(
+        csv_path=str(context.cleaned_csv),
+        output=str(output_path),
+    )
+    writer.record(output_path)
 
 
 def ensure_cleaned_csv_exists(path: Path) -> None:
@@ -252,27 +273,31 @@ def main() -> int:
     )
 
     tasks = build_tasks()
-    successes: list[tuple[str, Sequence[Path]]] = []
+    successes: list[tuple[str, Sequence[OutputRecord]]] = []
     failures: list[tuple[str, Exception]] = []
 
     for task in tasks:
         print(f"\n=== Running {task.key} ===")
+        writer = OutputWriter(context.outputs_root / task.key)
         try:
-            outputs = task.runner(context)
+            task.runner(context, writer)
         except Exception as exc:  # noqa: BLE001
             failures.append((task.key, exc))
             print(f"[ERROR] {task.key} failed: {exc}")
             continue
-        successes.append((task.key, outputs))
-        if outputs:
-            for path in outputs:
-                print(f"[OK] {task.key} -> {path.relative_to(context.outputs_root)}")
+        successes.append((task.key, writer.records))
+        if writer.records:
+            for record in writer.records:
+                print(
+                    f"[OK] {task.key} -> {record.path.relative_to(context.outputs_root)} "
+                    f"({record.size / 1024:.1f} KiB, {record.render_seconds:.2f}s)"
+                )
         else:
             print(f"[OK] {task.key} -> no files reported")
 
     print("\n=== Summary ===")
-    for key, outputs in successes:
-        human = ", ".join(str(path.relative_to(context.outputs_root)) for path in outputs) or "no files"
+    for key, records in successes:
+        human = ", ".join(str(record.path.relative_to(context.outputs_root)) for record in records) or "no files"
         print(f"- {key}: {human}")
 
     if failures:
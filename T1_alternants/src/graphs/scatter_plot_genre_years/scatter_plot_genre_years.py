@@ -10,10 +10,10 @@ from __future__ import annotations
 
 import argparse
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def _resolve_csv(csv_path: str) -> str:
@@ -40,17 +40,25 @@ def plot_genre_popularity_by_year(
     smooth_window: int = 3,
     log: bool = False,
     output: str = "genre_popularity_by_year.png",
+    df: pd.DataFrame | None = None,
 ) -> str:
+    # Imports lourds différés pour que --help reste instantané
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
 
-    csv_path = _resolve_csv(csv_path)
-    # Lecture limitée aux colonnes nécessaires
-    head = pd.read_csv(csv_path, nrows=0).columns
+    # Lecture limitée aux colonnes nécessaires (ou copie d'un jeu déjà chargé)
     needed = ["track_genre_top", "album_date_released", metric]
+    if df is None:
+        csv_path = _resolve_csv(csv_path)
+        head = pd.read_csv(csv_path, nrows=0).columns
+    else:
+        head = df.columns
     use = [c for c in needed if c in head]
     if len(use) < 3:
         raise SystemExit(f"Required columns not found for metric '{metric}': {needed}")
 
-    df = pd.read_csv(csv_path, usecols=use)
+    df = pd.read_csv(csv_path, usecols=use) if df is None else df[use].copy()
     df["year"] = pd.to_datetime(df["album_date_released"], errors="coerce").dt.year
     # Nettoyage robuste des genres : exclusion des chaînes vides ou nulles
     bad = {"", "nan", "none", "null", "unknown", "n/a", "na"}
@@ -5,9 +5,12 @@ import ast
 import json
 import sys
 from pathlib import Path
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 
-import pandas as pd
+
+# pandas est importé dans les fonctions : --help et les erreurs d'arguments restent instantanés
+if TYPE_CHECKING:
+    import pandas as pd
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 DEFAULT_DATA_DIR = REPO_ROOT / "cleaned_data"
@@ -15,12 +18,16 @@ DEFAULT_DATA_DIR = REPO_ROOT / "cleaned_data"
 
 def _ensure_int(series: pd.Series) -> pd.Series:
     """Cast a series to pandas' nullable Int64 dtype without crashing on bad data."""
+    import pandas as pd
+
     numeric = pd.to_numeric(series, errors="coerce")
     return numeric.astype("Int64")
 
 
 def _parse_track_genres(value: object) -> list[int]:
     """Convert string encoded lists like '[21, 103]' into python lists of ints."""
+    import pandas as pd
+
     if value is None or (isinstance(value, float) and pd.isna(value)):
         return []
     if isinstance(value, list):
@@ -81,6 +88,8 @@ def _merge_with_priority(
 
 
 def _load_tracks(data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     tracks_path = data_dir / "clean_tracks.csv"
     tracks = pd.read_csv(tracks_path)
     for identifier in ("track_id", "album_id", "artist_id"):
@@ -92,6 +101,8 @@ def _load_tracks(data_dir: Path) -> pd.DataFrame:
 
 
 def _merge_genres(tracks: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     genres_path = data_dir / "clean_genres.csv"
     genres = pd.read_csv(genres_path).rename(
         columns={
@@ -116,6 +127,8 @@ def _merge_genres(tracks: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
 
 
 def _merge_albums(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     albums_path = data_dir / "clean_raw_albums.csv"
     albums = pd.read_csv(albums_path).rename(columns={"tags": "album_tags"})
     albums["album_id"] = _ensure_int(albums["album_id"])
@@ -123,6 +136,8 @@ def _merge_albums(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
 
 
 def _merge_artists(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     artists_path = data_dir / "clean_raw_artists.csv"
     artists = pd.read_csv(artists_path).rename(columns={"tags": "artist_tags"})
     artists["artist_id"] = _ensure_int(artists["artist_id"])
@@ -130,6 +145,8 @@ def _merge_artists(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
 
 
 def _merge_features(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     features_path = data_dir / "clean_features.csv"
     features = pd.read_csv(features_path)
     features["track_id"] = _ensure_int(features["track_id"])
@@ -137,6 +154,8 @@ def _merge_features(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
 
 
 def _merge_echonest(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     echonest_path = data_dir / "clean_echonest.csv"
     echonest = pd.read_csv(echonest_path)
     echonest["track_id"] = _ensure_int(echonest["track_id"])
@@ -144,6 +163,8 @@ def _merge_echonest(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
 
 
 def _merge_raw_tracks(df: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    import pandas as pd
+
     raw_tracks_path = data_dir / "clean_raw_tracks.csv"
     raw_tracks = pd.read_csv(raw_tracks_path).rename(columns={"tags": "track_tags_raw"})
     raw_tracks["track_id"] = _ensure_int(raw_tracks["track_id"])
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Mesure le temps de démarrage à froid des points d'entrée T1 via `python -X importtime`.
+
+Chaque script CLI est lancé avec `--help` ; les modules de graphiques sans CLI sont
+seulement importés (sans exécuter leur `main`). Le rapport donne la durée murale,
+le temps d'import cumulé et les paquets les plus coûteux.
+
+Utilisation :
+    python3 src/benchmark/startup_time.py
+    python3 src/benchmark/startup_time.py --json out/startup.json
+    python3 src/benchmark/startup_time.py --baseline out/startup.json --tolerance 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+SRC_DIR = Path(__file__).resolve().parents[1]
+
+# Scripts disposant d'un argparse : --help ne doit charger aucune dépendance lourde
+CLI_ENTRY_POINTS: List[str] = [
+    "clean/main.py",
+    "merge/main.py",
+    "graphs/graph_server.py",
+    "graphs/scatter_plot_genre_years/scatter_plot_genre_years.py",
+]
+
+IMPORT_SNIPPET = (
+    "import importlib.util, sys; "
+    "path = sys.argv[1]; "
+    "sys.path.insert(0, str(__import__('pathlib').Path(path).parent)); "
+    "spec = importlib.util.spec_from_file_location('_startup_probe', path); "
+    "module = importlib.util.module_from_spec(spec); "
+    "sys.modules[spec.name] = module; "
+    "spec.loader.exec_module(module)"
+)
+
+
+@dataclass
+class StartupResult:
+    entry_point: str
+    mode: str
+    wall_seconds: float
+    import_seconds: float
+    returncode: int
+    top_imports: Dict[str, float] = field(default_factory=dict)
+
+
+def discover_graph_modules(src_dir: Path) -> List[str]:
+    """Retourne l'orchestrateur et les scripts de graphiques qui n'ont pas de CLI dédiée."""
+    cli = set(CLI_ENTRY_POINTS)
+    modules = ["graphs/run_all_graphs.py"]
+    for path in sorted((src_dir / "graphs").glob("*/*.py")):
+        relative = path.relative_to(src_dir).as_posix()
+        if relative not in cli:
+            modules.append(relative)
+    return modules
+
+
+def parse_importtime(stderr: str) -> tuple[float, Dict[str, float]]:
+    """Somme les imports de premier niveau et retourne leur coût cumulé en secondes."""
+    top_level: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        # L'indentation du nom donne la profondeur : seul le premier niveau est additionné
+        if name.startswith("  "):
+            continue
+        package = name.strip().split(".")[0]
+        top_level[package] = top_level.get(package, 0.0) + int(parts[1]) / 1_000_000
+    return sum(top_level.values()), top_level
+
+
+def measure(entry_point: str, mode: str, repeat: int, top: int) -> StartupResult:
+    script = SRC_DIR / entry_point
+    if mode == "help":
+        command = [sys.executable, "-X", "importtime", str(script), "--help"]
+    else:
+        command = [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET, str(script)]
+
+    best: StartupResult | None = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True, cwd=SRC_DIR.parent)
+        wall = time.perf_counter() - start
+        import_seconds, packages = parse_importtime(completed.stderr)
+        heaviest = dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top])
+        result = StartupResult(entry_point, mode, wall, import_seconds, completed.returncode, heaviest)
+        if best is None or result.wall_seconds < best.wall_seconds:
+            best = result
+    assert best is not None
+    return best
+
+
+def compare(results: Sequence[StartupResult], baseline_path: Path, tolerance: float) -> List[str]:
+    """Liste les points d'entrée dont le démarrage dépasse la référence de plus de `tolerance`."""
+    baseline = {item["entry_point"]: item for item in json.loads(baseline_path.read_text(encoding="utf-8"))}
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.entry_point)
+        if reference is None:
+            continue
+        limit = reference["wall_seconds"] * (1 + tolerance)
+        if result.wall_seconds > limit:
+            regressions.append(
+                f"{result.entry_point}: {result.wall_seconds:.3f}s > {limit:.3f}s "
+                f"(baseline {reference['wall_seconds']:.3f}s)"
+            )
+    return regressions
+
+
+def print_report(results: Sequence[StartupResult]) -> None:
+    width = max(len(result.entry_point) for result in results)
+    print(f"{'entry point'.ljust(width)}  mode    wall(s)  imports(s)  heaviest imports")
+    for result in results:
+        heaviest = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in result.top_imports.items())
+        status = "" if result.returncode == 0 else f"  [exit {result.returncode}]"
+        print(
+            f"{result.entry_point.ljust(width)}  {result.mode:<6}  {result.wall_seconds:7.3f}  "
+            f"{result.import_seconds:10.3f}  {heaviest}{status}"
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the T1 entry points")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point; the fastest is kept")
+    parser.add_argument("--top", type=int, default=3, help="Number of heaviest top-level imports to show")
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON file from a previous --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = +20%%)")
+    args = parser.parse_args(argv)
+
+    targets = [(entry, "help") for entry in CLI_ENTRY_POINTS if (SRC_DIR / entry).exists()]
+    targets += [(entry, "import") for entry in discover_graph_modules(SRC_DIR)]
+    results = [measure(entry, mode, args.repeat, args.top) for entry, mode in targets]
+    print_report(results)
+
+    if args.json is not None:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps([asdict(result) for result in results], indent=2), encoding="utf-8")
+        print(f"\nResults written to {args.json}")
+
+    if args.baseline is not None:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nStartup regressions:")
+            for line in regressions:
+                print(f"- {line}")
+            return 1
+        print("\nNo startup regression against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
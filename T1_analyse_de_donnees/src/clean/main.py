@@ -4,9 +4,12 @@ import argparse
 import sys
 from collections.abc import Iterable
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from globalrules import DEFAULT_DATA_DIR, DEFAULT_OUTPUT_DIR, get_rule_for
-from validation import clean_csv, CleanReport
+
+if TYPE_CHECKING:
+    from validation import CleanReport
 
 
 def _build_parser() -> argparse.ArgumentParser:
@@ -110,6 +113,9 @@ def run(argv: Iterable[str] | None = None) -> int:
         print("[WARN] No CSV files matched the provided criteria.")
         return 0
 
+    # Import différé : pandas n'est chargé qu'une fois les arguments et les chemins validés
+    from validation import clean_csv
+
     exit_code = 0
 
     for csv_path in targets:
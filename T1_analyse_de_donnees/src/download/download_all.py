@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 import sys
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence
 
 from download_cleaned_data import main as download_cleaned_data_main
 from download_data import main as download_data_main
 
 
-def _run(label: str, func: Callable[[], None]) -> None:
+def _run(label: str, func: Callable[[Sequence[str]], None]) -> None:
     print(f"=== {label} ===")
     try:
-        func()
+        func([])
     except SystemExit as exc:
         code = exc.code if isinstance(exc.code, int) else 1
         print(f"{label} failed; aborting.", file=sys.stderr)
@@ -17,8 +18,15 @@ def _run(label: str, func: Callable[[], None]) -> None:
 
 
 def main() -> None:
-    _run("Downloading raw data", download_data_main)
-    _run("Downloading cleaned data", download_cleaned_data_main)
+    jobs = [
+        ("Downloading raw data", download_data_main),
+        ("Downloading cleaned data", download_cleaned_data_main),
+    ]
+    # Les deux téléchargements sont indépendants : on les lance en parallèle
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(_run, label, func) for label, func in jobs]
+    for future in futures:
+        future.result()
     print("All downloads completed successfully.")
 
 
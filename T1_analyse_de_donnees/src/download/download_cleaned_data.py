@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
+import argparse
 import sys
-import zipfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Sequence
+
+from archive_cache import ArchiveCache, ArchiveError, SyncReport, normalise_source, sync_archive
 
 DRIVE_FILE_IDS = [
     "1qPqFtijkDU02qKJdha89gAb-Bogh3bdV",
@@ -9,53 +14,67 @@ DRIVE_FILE_IDS = [
 ]
 DRIVE_URLS = [f"https://drive.google.com/uc?id={fid}" for fid in DRIVE_FILE_IDS]
 
+HERE = Path(__file__).resolve().parent
+DEFAULT_DATA_DIR = (HERE / "../../cleaned_data").resolve()
+DEFAULT_CACHE_DIR = HERE / ".cache"
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download and install the cleaned CSV archives.")
+    parser.add_argument("--url", dest="urls", action="append", default=None,
+                        help="Archive source (repeatable); defaults to the Google Drive archives")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=4, help="Archives fetched in parallel")
+    parser.add_argument("--refresh", action="store_true", help="Fetch archives again even if they are cached")
+    return parser.parse_args(argv)
+
+
+def fetch_and_extract(
+    idx: int, url: str, cache: ArchiveCache, data_dir: Path, refresh: bool
+) -> SyncReport:
+    # Chaque archive est extraite dès que son téléchargement se termine, pendant que les autres arrivent
+    fetched = cache.fetch(url, refresh=refresh, quiet=True)
+    if fetched.cached:
+        print(f"[#{idx}] Using cached archive {fetched.path.name}.")
+    else:
+        print(
+            f"[#{idx}] Downloaded {fetched.downloaded_bytes / 1e6:.1f} MB in {fetched.seconds:.1f}s "
+            f"({fetched.bytes_per_second / 1e6:.2f} MB/s)."
+        )
+    return sync_archive(fetched.path, data_dir, source=url)
+
+
+def main(argv: Sequence[str] | None = None):
+    args = parse_args(argv)
+    urls = [normalise_source(url) for url in (args.urls or DRIVE_URLS)]
+    data_dir = args.data_dir.resolve()
+    cache = ArchiveCache(args.cache_dir)
+
+    print(f"Fetching {len(urls)} archive(s) with {args.workers} worker(s)...")
+    start = time.perf_counter()
+    updated = unchanged = removed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            pool.submit(fetch_and_extract, idx, url, cache, data_dir, args.refresh): idx
+            for idx, url in enumerate(urls, start=1)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                report = future.result()
+            except ArchiveError as e:
+                print(f"Error: archive #{idx}: {e}", file=sys.stderr)
+                continue
+            updated += len(report.updated)
+            unchanged += len(report.unchanged)
+            removed += len(report.removed)
+            print(f"[#{idx}] Extracted: {len(report.updated)} updated, {len(report.unchanged)} unchanged.")
 
-def main():
-    try:
-        import gdown
-    except ImportError:
-        print("gdown is not installed. Run: pip install gdown", file=sys.stderr)
-        sys.exit(1)
-
-    here = Path(__file__).resolve().parent
-    data_dir = (here / "../../cleaned_data").resolve()
-    data_dir.mkdir(parents=True, exist_ok=True)
-
-    removed = 0
-    for csv in data_dir.rglob("*.csv"):
-        try:
-            csv.unlink()
-            removed += 1
-        except Exception as e:
-            print(f"Warning: couldn't remove {csv}: {e}", file=sys.stderr)
-
-    print(f"Removed {removed} CSV file(s).")
-
-    for idx, url in enumerate(DRIVE_URLS, start=1):
-        zip_path = here / f"download_{idx}.zip"
-        if zip_path.exists():
-            zip_path.unlink()
-
-        print(f"Downloading archive #{idx} from Google Drive...")
-        out = gdown.download(url, str(zip_path), quiet=False)
-        if not out or not zip_path.exists():
-            print(f"Error: download {idx} failed or file missing.", file=sys.stderr)
-            continue
-
-        if not zipfile.is_zipfile(zip_path):
-            print(f"Error: downloaded file is not a valid ZIP: {zip_path}", file=sys.stderr)
-            continue
-
-        print(f"Extracting archive #{idx} to {data_dir}...")
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(data_dir)
-
-        try:
-            zip_path.unlink()
-        except Exception:
-            pass
-
-    print(f"All archives processed. Extracted into {data_dir}.")
+    print(
+        f"All archives processed in {time.perf_counter() - start:.1f}s. "
+        f"{updated} file(s) updated, {unchanged} unchanged, {removed} removed in {data_dir}."
+    )
 
 
 if __name__ == "__main__":
@@ -11,9 +11,11 @@ import os
 
 
 def generate_bubble_chart(csv_path="../../../../data/merged_tracks.csv",
-                          output_filename="bubble_chart_albums.png"):
-    # Charger le CSV
-    df = pd.read_csv(csv_path)
+                          output_filename="bubble_chart_albums.png",
+                          df=None):
+    # Charger le CSV (sauf si un DataFrame déjà chargé est fourni)
+    if df is None:
+        df = pd.read_csv(csv_path)
     
     # Colonnes nécessaires pour le bubble chart
     required_columns = [
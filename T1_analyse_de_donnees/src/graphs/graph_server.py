@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Service local de rendu de graphiques à la demande.
+
+Le jeu consolidé est chargé une seule fois par worker (uniquement les colonnes
+utilisées par les graphiques exposés) et matplotlib reste importé entre deux
+requêtes : un rendu ne paie plus ni le démarrage de Python ni la lecture du CSV.
+
+Utilisation :
+    python3 src/graphs/graph_server.py --workers 2 --max-queue 8
+    curl -X POST localhost:8765/render -d '{"graph": "bar_chart"}'
+    curl -X POST localhost:8765/render -d '{"graph": "scatter_plot_genre_years", "params": {"agg": "share"}}'
+
+Les analyses afc et pca restent des traitements batch lancés par run_all_graphs.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence
+
+from run_all_graphs import CLEANED_DATA, GRAPHS_DIR, OUTPUTS_ROOT, OutputWriter, load_module
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass(frozen=True)
+class GraphSpec:
+    module_name: str
+    module_path: Path
+    columns: Sequence[str]
+    render: Callable[[ModuleType, pd.DataFrame, Dict[str, Any], OutputWriter], None]
+
+
+def _render_bar_chart(module: ModuleType, frame: pd.DataFrame, params: Dict[str, Any], writer: OutputWriter) -> None:
+    energy = module.compute_energy_by_genre(module.prepare_data(frame))
+    output_path = writer.path("energy_by_genre.png")
+    module.plot_energy_by_genre(energy_by_genre=energy, output_path=str(output_path))
+    writer.record(output_path)
+
+
+def _render_bubble_chart(module: ModuleType, frame: pd.DataFrame, params: Dict[str, Any], writer: OutputWriter) -> None:
+    output_path = writer.path("bubble_chart_albums.png")
+    module.generate_bubble_chart(output_filename=str(output_path), df=frame)
+    writer.record(output_path)
+
+
+def _render_pie(module: ModuleType, frame: pd.DataFrame, params: Dict[str, Any], writer: OutputWriter) -> None:
+    genre_streams, _ = module.aggregate_genre_streams(frame)
+    if genre_streams.empty or genre_streams.sum() == 0:
+        raise ValueError("No genre streams available after cleaning.")
+    plot_data = module.prepare_plot_data(genre_streams, top_n=int(params.get("top_n", 10)))
+    writer.record(module.generate_pie_chart(plot_data, writer.directory))
+
+
+def _render_radar(module: ModuleType, frame: pd.DataFrame, params: Dict[str, Any], writer: OutputWriter) -> None:
+    genres = list(params.get("genres", module.SELECTED_GENRES))
+    df_filtered, filtered_count = module.filter_audio_features(frame, genres, module.AUDIO_COLS)
+    if filtered_count == 0:
+        raise ValueError(f"No tracks found for genres: {genres}")
+    genre_averages = module.compute_genre_averages(df_filtered, genres, module.AUDIO_COLS)
+    writer.record(module.build_radar_chart(genre_averages, module.AUDIO_COLS, genres, writer.directory))
+
+
+def _render_scatter_plot(module: ModuleType, frame: pd.DataFrame, params: Dict[str, Any], writer: OutputWriter) -> None:
+    n = int(params.get("n", 50))
+    filtered = module.keep_first_n_tracks_per_album(module.prepare_data(frame), n=n)
+    avg = module.compute_average_listens(filtered)
+    output_path = writer.path("scatter.png")
+    module.plot_average_listens(avg_listens=avg, output_path=str(output_path), max_track=n)
+    writer.record(output_path)
+
+
+def _render_scatter_genre_years(module: ModuleType, frame: pd.DataFrame, params: Dict[str, Any], writer: OutputWriter) -> None:
+    output_path = writer.path("genre_popularity_by_year.png")
+    module.plot_genre_popularity_by_year(output=str(output_path), df=frame, **params)
+    writer.record(output_path)
+
+
+GRAPH_SPECS: Dict[str, GraphSpec] = {
+    "bar_chart": GraphSpec(
+        "graphs_bar_chart",
+        GRAPHS_DIR / "bar_chart" / "bar_chart.py",
+        ["track_genre_top", "energy"],
+        _render_bar_chart,
+    ),
+    "bubble_chart_albums": GraphSpec(
+        "graphs_bubble_chart",
+        GRAPHS_DIR / "bubble_chart_albums" / "bubbleChart.py",
+        ["album_id", "track_id", "energy", "danceability", "track_listens", "valence"],
+        _render_bubble_chart,
+    ),
+    "pie": GraphSpec(
+        "graphs_pie",
+        GRAPHS_DIR / "pie" / "main.py",
+        ["track_genre_top", "track_listens"],
+        _render_pie,
+    ),
+    "radar": GraphSpec(
+        "graphs_radar",
+        GRAPHS_DIR / "radar" / "main.py",
+        ["track_genre_top", "acousticness", "danceability", "energy", "speechiness", "instrumentalness"],
+        _render_radar,
+    ),
+    "scatter_plot": GraphSpec(
+        "graphs_scatter",
+        GRAPHS_DIR / "scatter_plot" / "scatter.py",
+        ["album_id", "track_number", "track_listens"],
+        _render_scatter_plot,
+    ),
+    "scatter_plot_genre_years": GraphSpec(
+        "graphs_scatter_genre_years",
+        GRAPHS_DIR / "scatter_plot_genre_years" / "scatter_plot_genre_years.py",
+        ["track_genre_top", "album_date_released", "track_listens", "track_favorites"],
+        _render_scatter_genre_years,
+    ),
+}
+
+# État propre à chaque processus worker, initialisé une seule fois
+_FRAME: pd.DataFrame | None = None
+_MODULES: Dict[str, ModuleType] = {}
+
+
+def _init_worker(csv_path: str) -> None:
+    """Charge les modules, la projection du CSV et préchauffe matplotlib."""
+    global _FRAME
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    for key, spec in GRAPH_SPECS.items():
+        if spec.module_path.exists():
+            _MODULES[key] = load_module(spec.module_name, spec.module_path)
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    wanted = {col for spec in GRAPH_SPECS.values() for col in spec.columns}
+    _FRAME = pd.read_csv(csv_path, usecols=[col for col in header if col in wanted], low_memory=False)
+
+    # Premier rendu à vide : caches de polices et backend Agg prêts avant la première requête
+    fig = plt.figure()
+    fig.text(0.5, 0.5, "warm-up")
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def _worker_ready() -> bool:
+    return _FRAME is not None
+
+
+def render_job(graph: str, params: Dict[str, Any], output_dir: str) -> List[Dict[str, Any]]:
+    """Exécuté dans un worker : produit le graphique et retourne les sorties déclarées."""
+    if _FRAME is None or graph not in _MODULES:
+        raise ValueError(f"Graph '{graph}' is not available in this worker")
+    writer = OutputWriter(Path(output_dir))
+    try:
+        GRAPH_SPECS[graph].render(_MODULES[graph], _FRAME, params, writer)
+    except SystemExit as exc:
+        raise ValueError(str(exc)) from None
+    return [
+        {"path": str(record.path), "size": record.size, "render_seconds": round(record.render_seconds, 3)}
+        for record in writer.records
+    ]
+
+
+class GraphServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        csv_path: Path,
+        outputs_root: Path,
+        workers: int,
+        max_queue: int,
+        timeout: float,
+    ) -> None:
+        super().__init__(address, GraphRequestHandler)
+        self.outputs_root = outputs_root
+        self.timeout_seconds = timeout
+        self.workers = workers
+        self.capacity = workers + max_queue
+        # Jetons = requêtes en cours + en attente ; au-delà, la requête est refusée
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(str(csv_path),)
+        )
+        # Démarre les workers tout de suite pour que le CSV soit chargé avant la première requête
+        warmups = [self.executor.submit(_worker_ready) for _ in range(workers)]
+        for warmup in warmups:
+            warmup.result()
+
+    def submit(self, graph: str, params: Dict[str, Any]) -> List[Dict[str, Any]] | None:
+        """Place un rendu dans la file ; None si la file est pleine."""
+        if not self.slots.acquire(blocking=False):
+            return None
+        output_dir = self.outputs_root / "server" / graph / uuid.uuid4().hex
+        try:
+            future = self.executor.submit(render_job, graph, params, str(output_dir))
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result(timeout=self.timeout_seconds)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class GraphRequestHandler(BaseHTTPRequestHandler):
+    server: GraphServer
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send_json(200, {
+            "graphs": sorted(GRAPH_SPECS),
+            "workers": self.server.workers,
+            "capacity": self.server.capacity,
+        })
+
+    def do_POST(self) -> None:
+        if self.path != "/render":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            graph = request["graph"]
+            params = request.get("params", {})
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send_json(400, {"error": f"Invalid request: {exc}"})
+            return
+        if graph not in GRAPH_SPECS:
+            self._send_json(400, {"error": f"Unknown graph '{graph}'", "graphs": sorted(GRAPH_SPECS)})
+            return
+        if not isinstance(params, dict):
+            self._send_json(400, {"error": "'params' must be a JSON object"})
+            return
+
+        try:
+            outputs = self.server.submit(graph, params)
+        except FutureTimeoutError:
+            self._send_json(504, {"error": f"Rendering {graph} exceeded {self.server.timeout_seconds}s"})
+            return
+        except (ValueError, TypeError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        except Exception as exc:  # noqa: BLE001
+            self._send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        if outputs is None:
+            self._send_json(503, {"error": "Render queue is full, retry later"})
+            return
+        self._send_json(200, {"graph": graph, "outputs": outputs})
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve graph renders from a preloaded dataset")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--csv", type=Path, default=CLEANED_DATA)
+    parser.add_argument("--outputs", type=Path, default=OUTPUTS_ROOT)
+    parser.add_argument("--workers", type=int, default=2, help="Rendus exécutés en parallèle")
+    parser.add_argument("--max-queue", type=int, default=8, help="Requêtes en attente avant refus (503)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Délai maximal d'attente d'un rendu (s)")
+    args = parser.parse_args(argv)
+
+    if not args.csv.exists():
+        print(f"Missing dataset at {args.csv}. Run the cleaning pipeline beforehand.", file=sys.stderr)
+        return 1
+
+    server = GraphServer(
+        (args.host, args.port),
+        csv_path=args.csv.resolve(),
+        outputs_root=args.outputs,
+        workers=args.workers,
+        max_queue=args.max_queue,
+        timeout=args.timeout,
+    )
+    print(f"Graph server listening on http://{args.host}:{args.port} ({args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,7 +6,6 @@ Utilisation :
 """
 
 import pandas as pd
-import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
 import os
@@ -108,7 +107,9 @@ def generate_correlation_heatmap(csv_path="../../../../data/merged_tracks.csv",
     for i, col in enumerate(analysis_columns):
         print(f"  {col}: {track_vs_album_corr.iloc[i, i]:.3f}")
     
-    # Créer la heatmap
+    # Créer la heatmap (seaborn n'est chargé que pour ce rendu)
+    import seaborn as sns
+
     plt.figure(figsize=(14, 12))
     sns.heatmap(track_vs_album_corr, annot=True, cmap='RdYlGn', center=0, 
                 fmt='.2f', square=True, linewidths=1, cbar_kws={"shrink": 0.8},
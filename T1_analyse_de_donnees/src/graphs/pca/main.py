@@ -7,8 +7,11 @@ Utilisation :
 (lancer depuis la racine du projet après création de 'cleaned_data/merged_tracks.csv' ; les résultats sont enregistrés dans 'src/graphs/pca/out/')
 """
 
+from __future__ import annotations
+
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
@@ -16,9 +19,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
+if TYPE_CHECKING:
+    from sklearn.decomposition import PCA
 
 
 HERE = Path(__file__).resolve().parent
@@ -72,6 +74,9 @@ def pick_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
 
 
 def standardize_impute(X: pd.DataFrame) -> tuple[np.ndarray, list[str]]:
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
     # Imputation médiane pour éviter le carnage des NaN
     imputer = SimpleImputer(strategy="median")
     X_imp = imputer.fit_transform(X.values)
@@ -137,6 +142,8 @@ def optimize_feature_subset(X: pd.DataFrame, target_ratio: float = 0.5, min_feat
 
 
 def run_pca(X_std: np.ndarray, max_components: int = 10) -> PCA:
+    from sklearn.decomposition import PCA
+
     n_features = X_std.shape[1]
     n_components = min(max_components, n_features)
     pca = PCA(n_components=n_components, random_state=42)
@@ -29,6 +29,11 @@ def resolve_paths() -> Tuple[Path, Path]:
 def load_genre_streams(data_path: Path) -> Tuple[pd.Series, int]:
     """Charge les données et agrège les écoutes par genre principal."""
     df = pd.read_csv(data_path)
+    return aggregate_genre_streams(df)
+
+
+def aggregate_genre_streams(df: pd.DataFrame) -> Tuple[pd.Series, int]:
+    """Agrège les écoutes par genre principal sur un jeu déjà chargé."""
     # Nettoyer les données : supprimer les valeurs nulles
     df_clean = df.dropna(subset=["track_genre_top", "track_listens"]).copy()
     # Grouper par genre principal et sommer les streams
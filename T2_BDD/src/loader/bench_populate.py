@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Mesure `schema.sql` + `populate.sql` sur des données synthétiques, étape par étape.
+
+Pour chaque échelle demandée : génération des CSV (`synthetic_data.py`), base jetable
+recréée à côté de celle du `.env`, schéma puis peuplement rejoués par `psql` avec un
+marqueur horodaté avant chaque `\\i`, puis tailles des tables et temps de reconstruction
+de chaque index sur les données chargées. Le Postgres visé doit avoir pgvector.
+
+    python3 T2_BDD/src/loader/bench_populate.py --tracks 10000 --tracks 100000
+    python3 T2_BDD/src/loader/bench_populate.py --tracks 100000 --output bench.json --baseline old.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Sequence
+
+import psycopg2
+from psycopg2 import sql
+
+from db import ROOT, load_env
+from synthetic_data import Scale, generate
+
+SQL_DIR = Path("T2_BDD") / "src" / "sql"
+CLEANED_DATA = Path("T1_analyse_de_donnees") / "cleaned_data"
+ANSWERS = Path("T1_alternants") / "src" / "clean" / "out" / "clean_answers.csv"
+BULK_LOAD = Path(__file__).resolve().parent / "bulk_load.py"
+
+_INCLUDE = re.compile(r"^\\i\s+(\S+)", re.M)
+_BULK_STEP = re.compile(r"^\[(\w+)\] (?:done in ([\d.]+)s|(\w+) refreshed in ([\d.]+)s)$")
+
+TABLE_SIZES = """
+    SELECT c.relname, pg_relation_size(c.oid), pg_indexes_size(c.oid), pg_total_relation_size(c.oid)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'm')
+    ORDER BY pg_total_relation_size(c.oid) DESC
+"""
+
+INDEXES = """
+    SELECT i.indexname, i.tablename, am.amname
+    FROM pg_indexes i
+    JOIN pg_class c ON c.relname = i.indexname
+    JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = i.schemaname
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE i.schemaname = 'public'
+    ORDER BY i.tablename, i.indexname
+"""
+
+
+@dataclass
+class TableSize:
+    table: str
+    rows: int
+    heap_bytes: int
+    index_bytes: int
+    total_bytes: int
+
+
+@dataclass
+class IndexBuild:
+    index: str
+    table: str
+    method: str
+    seconds: float
+
+
+@dataclass
+class ScaleResult:
+    tracks: int
+    loader: str
+    generate_seconds: float
+    stages: dict[str, float] = field(default_factory=dict)
+    tables: list[TableSize] = field(default_factory=list)
+    indexes: list[IndexBuild] = field(default_factory=list)
+
+
+def psql_env(database: str) -> dict[str, str]:
+    """Variables libpq équivalentes aux DB_* de `db.connect()`."""
+    env = dict(os.environ)
+    env.update(
+        PGHOST=os.getenv("DB_HOST", "localhost"),
+        PGPORT=os.getenv("PGDB_PORT", "5432"),
+        PGUSER=os.getenv("DB_USER", "idfou"),
+        PGDATABASE=database,
+    )
+    if os.getenv("DB_ROOT_PASSWORD"):
+        env["PGPASSWORD"] = os.environ["DB_ROOT_PASSWORD"]
+    return env
+
+
+def connect_to(database: str) -> psycopg2.extensions.connection:
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("PGDB_PORT", "5432"),
+        user=os.getenv("DB_USER", "idfou"),
+        password=os.getenv("DB_ROOT_PASSWORD"),
+        dbname=database,
+    )
+
+
+def recreate_database(database: str) -> None:
+    conn = connect_to("postgres")
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(database)))
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(database)))
+    finally:
+        conn.close()
+
+
+def link_work_root(work_root: Path, project_root: Path, data_dir: Path) -> None:
+    """Arborescence attendue par les `\\copy` relatifs, pointant vers les CSV générés."""
+    links = {
+        work_root / "T2_BDD": project_root / "T2_BDD",
+        work_root / CLEANED_DATA: data_dir,
+        work_root / ANSWERS: data_dir / "clean_answers.csv",
+    }
+    for link, target in links.items():
+        link.parent.mkdir(parents=True, exist_ok=True)
+        if link.is_symlink() or link.exists():
+            link.unlink()
+        link.symlink_to(target.resolve())
+
+
+def timed_driver(entry_point: Path, work_root: Path) -> Path:
+    """Copie d'un point d'entrée (`schema.sql`, `populate.sql`) avec un horodatage avant chaque `\\i`."""
+    lines = []
+    for line in entry_point.read_text(encoding="utf-8").splitlines():
+        include = _INCLUDE.match(line)
+        if include:
+            lines.append(f"SELECT '@@', '{Path(include.group(1)).name}', extract(epoch from clock_timestamp());")
+        lines.append(line)
+    lines.append("SELECT '@@', '', extract(epoch from clock_timestamp());")
+    driver = work_root / f"bench_{entry_point.name}"
+    driver.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return driver
+
+
+def run_psql(psql: str, script: Path, work_root: Path, database: str) -> dict[str, float]:
+    """Exécute un script dans une seule session psql ; retourne la durée de chaque fichier inclus."""
+    result = subprocess.run(
+        [psql, "-X", "-q", "-At", "-v", "ON_ERROR_STOP=1", "-f", str(script)],
+        cwd=work_root,
+        env=psql_env(database),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{script.name} failed:\n{result.stderr.strip()}")
+    marks = [line.split("|") for line in result.stdout.splitlines() if line.startswith("@@|")]
+    return {name: float(end) - float(start) for (_, name, start), (_, _, end) in zip(marks, marks[1:])}
+
+
+def run_bulk_load(data_dir: Path, database: str, env_path: Path | None) -> dict[str, float]:
+    """`bulk_load.py` dans un sous-processus ; retourne la durée de chaque vague et vue."""
+    command = [sys.executable, str(BULK_LOAD), "--data-dir", str(data_dir), "--answers", str(data_dir / "clean_answers.csv")]
+    if env_path is not None:
+        command += ["--env", str(env_path)]
+    # load_dotenv ne remplace pas une variable déjà définie : DB_NAME vise la base de mesure
+    result = subprocess.run(command, env={**os.environ, "DB_NAME": database}, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"bulk_load.py failed:\n{result.stderr.strip() or result.stdout.strip()}")
+    stages = {}
+    for line in result.stdout.splitlines():
+        step = _BULK_STEP.match(line.strip())
+        if step:
+            wave, wave_seconds, view, view_seconds = step.groups()
+            if wave_seconds is not None:
+                stages[wave] = float(wave_seconds)
+            else:
+                stages[view] = float(view_seconds)
+    return stages
+
+
+def collect_sizes(conn) -> list[TableSize]:
+    sizes = []
+    with conn.cursor() as cur:
+        cur.execute(TABLE_SIZES)
+        for table, heap, index, total in cur.fetchall():
+            cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(table)))
+            sizes.append(TableSize(table, cur.fetchone()[0], heap, index, total))
+    return sizes
+
+
+def time_index_builds(conn) -> list[IndexBuild]:
+    """REINDEX de chaque index : son temps de construction sur les données chargées."""
+    builds = []
+    with conn.cursor() as cur:
+        cur.execute(INDEXES)
+        for index, table, method in cur.fetchall():
+            start = time.perf_counter()
+            cur.execute(sql.SQL("REINDEX INDEX {}").format(sql.Identifier(index)))
+            builds.append(IndexBuild(index, table, method, time.perf_counter() - start))
+    return builds
+
+
+def bench_scale(args: argparse.Namespace, tracks: int, database: str) -> ScaleResult:
+    data_dir = args.data_dir / f"tracks_{tracks}"
+    start = time.perf_counter()
+    if not (data_dir / "clean_features.csv").exists():
+        generate(data_dir, Scale(tracks, args.users, args.seed))
+    result = ScaleResult(tracks, args.loader, time.perf_counter() - start)
+
+    work_root = args.work_dir / f"tracks_{tracks}"
+    link_work_root(work_root, args.project_root, data_dir)
+    recreate_database(database)
+
+    sql_dir = work_root / SQL_DIR
+    result.stages.update(run_psql(args.psql, timed_driver(sql_dir / "schema.sql", work_root), work_root, database))
+    if args.loader == "sql":
+        driver = timed_driver(sql_dir / "populate.sql", work_root)
+        result.stages.update(run_psql(args.psql, driver, work_root, database))
+    else:
+        result.stages.update(run_bulk_load(data_dir, database, args.env))
+
+    conn = connect_to(database)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+        result.tables = collect_sizes(conn)
+        if not args.skip_reindex:
+            result.indexes = time_index_builds(conn)
+    finally:
+        conn.close()
+    return result
+
+
+def print_result(result: ScaleResult) -> None:
+    print(f"\n=== {result.tracks} tracks ({result.loader}) ===")
+    print(f"generate                     {result.generate_seconds:9.2f}s")
+    for stage, seconds in result.stages.items():
+        print(f"{stage:<28} {seconds:9.2f}s")
+    print(f"{'total':<28} {sum(result.stages.values()):9.2f}s")
+
+    print(f"\n{'table':<28} {'rows':>10} {'heap MB':>9} {'index MB':>9} {'total MB':>9}")
+    for size in result.tables:
+        if size.total_bytes > 8192 * 2 or size.rows:
+            print(
+                f"{size.table:<28} {size.rows:>10} {size.heap_bytes / 2**20:>9.2f} "
+                f"{size.index_bytes / 2**20:>9.2f} {size.total_bytes / 2**20:>9.2f}"
+            )
+
+    if result.indexes:
+        print(f"\n{'index (rebuild)':<48} {'method':<6} {'time':>9}")
+        for build in sorted(result.indexes, key=lambda build: -build.seconds)[:15]:
+            print(f"{build.index:<48} {build.method:<6} {build.seconds:>8.2f}s")
+
+
+def compare(results: list[ScaleResult], baseline_path: Path, tolerance: float, min_seconds: float) -> list[str]:
+    """Étapes plus lentes que la référence de plus de `tolerance` (et de `min_seconds` en absolu)."""
+    baseline = {
+        (entry["tracks"], entry["loader"]): entry["stages"]
+        for entry in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    }
+    regressions = []
+    for result in results:
+        previous = baseline.get((result.tracks, result.loader))
+        if previous is None:
+            continue
+        for stage, seconds in result.stages.items():
+            before = previous.get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > min_seconds:
+                regressions.append(f"{result.tracks} tracks, {stage}: {before:.2f}s -> {seconds:.2f}s")
+    return regressions
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark schema creation and each populate stage on synthetic data.")
+    parser.add_argument("--tracks", type=int, action="append", help="Scale to benchmark, repeatable (default: 10000)")
+    parser.add_argument("--users", type=int, default=None, help="Resample the survey answers to this many users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", type=Path, default=None, help=".env file with the DB_* variables (default: repo root)")
+    parser.add_argument("--database", default=None, help="Scratch database, dropped and recreated (default: <DB_NAME>_bench)")
+    parser.add_argument("--loader", choices=("sql", "bulk"), default="sql", help="populate.sql stages or bulk_load.py waves")
+    parser.add_argument("--psql", default="psql", help="psql executable")
+    parser.add_argument("--project-root", type=Path, default=ROOT, help="Checkout whose T2_BDD scripts are measured")
+    parser.add_argument("--data-dir", type=Path, default=None, help="Where generated CSV are kept and reused")
+    parser.add_argument("--work-dir", type=Path, default=None, help="Where the psql working trees are built")
+    parser.add_argument("--skip-reindex", action="store_true", help="Do not time index rebuilds")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as JSON")
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous --output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown per stage (default: 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv)
+    load_env(args.env)
+
+    database = args.database or f"{os.getenv('DB_NAME', 'sae5idfou')}_bench"
+    if database == os.getenv("DB_NAME", "sae5idfou"):
+        print("Refusing to benchmark into DB_NAME: the database is dropped first.", file=sys.stderr)
+        return 2
+    scratch = Path(tempfile.mkdtemp(prefix="bench_populate_"))
+    args.data_dir = args.data_dir or scratch / "data"
+    args.work_dir = args.work_dir or scratch / "work"
+
+    results = []
+    for tracks in args.tracks or [10_000]:
+        try:
+            result = bench_scale(args, tracks, database)
+        except (RuntimeError, psycopg2.Error) as exc:
+            print(f"Error benchmarking {tracks} tracks: {exc}", file=sys.stderr)
+            return 1
+        print_result(result)
+        results.append(result)
+
+    if args.output is not None:
+        payload = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": [asdict(result) for result in results]}
+        args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline is not None:
+        regressions = compare(results, args.baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print("\nSlower than baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo stage slower than baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Peuple la base avec `COPY ... FROM STDIN (FORMAT binary)` au lieu de `populate.sql`.
+
+Les fichiers nettoyés sont lus et transformés côté client (listes, ids legacy -> UUID),
+puis chargés par vagues : les tables d'une même vague sont indépendantes et partent
+en parallèle, chacune sur sa propre connexion.
+
+Le schéma doit déjà exister (`init_db.sh`). À lancer depuis la racine du projet :
+    python3 T2_BDD/src/loader/bulk_load.py
+    python3 T2_BDD/src/loader/bulk_load.py --env .env.local --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from db import ROOT, connect, load_env
+from pgcopy import ROWS_PER_CHUNK, copy_frame, copy_upsert, quote_ident
+from refresh_views import refresh_views
+from transform import (
+    LegacyIds,
+    TableLoad,
+    build_albums,
+    build_artists,
+    build_echonest,
+    build_genres,
+    build_tags,
+    build_temporal,
+    build_track_links,
+    build_tracks,
+    build_users,
+    pack_temporal,
+    read_tracks,
+)
+
+DEFAULT_DATA_DIR = ROOT / "T1_analyse_de_donnees" / "cleaned_data"
+DEFAULT_ANSWERS = ROOT / "T1_alternants" / "src" / "clean" / "out" / "clean_answers.csv"
+ARTIST_COUNTERS_TRIGGER = "tr_after_insert_track_artist_main"
+TEMPORAL_STORAGES = ("columns", "packed", "both")
+
+
+@dataclass
+class LoadStat:
+    table: str
+    rows: int
+    seconds: float
+
+
+def add_missing_columns(conn, load: TableLoad) -> None:
+    """Équivalent du `ALTER TABLE ... ADD COLUMN IF NOT EXISTS` dynamique de 7_temporal_features.sql."""
+    with conn.cursor() as cur:
+        for column in load.spec:
+            if column.name not in load.upsert_key:
+                cur.execute(
+                    f"ALTER TABLE {load.table} ADD COLUMN IF NOT EXISTS {quote_ident(column.name)} double precision"
+                )
+
+
+def reset_manifest(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM temporal_feature_manifest")
+
+
+def suspend_artist_counters(conn) -> None:
+    """Le trigger de track_artist_main recalcule les compteurs de l'artiste à chaque ligne
+    (un parcours de `track` par ligne insérée) : on le coupe le temps du COPY."""
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE track_artist_main DISABLE TRIGGER {ARTIST_COUNTERS_TRIGGER}")
+
+
+def recompute_artist_counters(conn) -> None:
+    """Version ensembliste de f_recompute_artist_counters pour tous les artistes liés, puis
+    réactivation du trigger (même transaction : un échec annule aussi le DISABLE)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE artist a
+            SET artist_favorites = s.fav_sum, artist_comments = s.com_sum
+            FROM (
+                SELECT l.artist_id,
+                       COALESCE(SUM(t.track_favorites), 0) AS fav_sum,
+                       COALESCE(SUM(t.track_comments), 0) AS com_sum
+                FROM (
+                    SELECT track_id, artist_id FROM track_artist_main
+                    UNION
+                    SELECT track_id, artist_id FROM track_artist_feat
+                ) l
+                JOIN track t ON t.track_id = l.track_id
+                GROUP BY l.artist_id
+            ) s
+            WHERE a.artist_id = s.artist_id
+            """
+        )
+        cur.execute(f"ALTER TABLE track_artist_main ENABLE TRIGGER {ARTIST_COUNTERS_TRIGGER}")
+
+
+def run_job(loads: Sequence[TableLoad], rows_per_chunk: int, prepare=None, finish=None) -> List[LoadStat]:
+    """Charge une suite de tables dans une seule transaction."""
+    stats = []
+    conn = connect()
+    try:
+        if prepare is not None:
+            prepare(conn)
+        for load in loads:
+            start = time.perf_counter()
+            if load.upsert_key:
+                rows = copy_upsert(conn, load.table, load.frame, load.spec, load.upsert_key, rows_per_chunk)
+            else:
+                rows = copy_frame(conn, load.table, load.frame, load.spec, rows_per_chunk)
+            stats.append(LoadStat(load.table, rows, time.perf_counter() - start))
+        if finish is not None:
+            finish(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return stats
+
+
+def run_wave(name: str, jobs: Dict[str, tuple], workers: int, rows_per_chunk: int) -> List[LoadStat]:
+    print(f"[{name}] {', '.join(jobs)}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            label: pool.submit(run_job, loads, rows_per_chunk, *extra)
+            for label, (loads, *extra) in jobs.items()
+        }
+        stats = [stat for future in futures.values() for stat in future.result()]
+    for stat in stats:
+        print(f"  {stat.table:<26} {stat.rows:>9} rows  {stat.seconds:7.2f}s")
+    print(f"[{name}] done in {time.perf_counter() - start:.2f}s")
+    return stats
+
+
+def refresh_catalog() -> None:
+    """Les vues matérialisées des recommandeurs sont vides tant qu'elles ne sont pas rafraîchies."""
+    conn = connect()
+    try:
+        for view, seconds in refresh_views(conn).items():
+            print(f"[views] {view} refreshed in {seconds:.2f}s")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk load the cleaned CSV/Parquet files with binary COPY.")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Directory with the clean_*.csv files")
+    parser.add_argument("--answers", type=Path, default=DEFAULT_ANSWERS, help="Cleaned survey answers (users)")
+    parser.add_argument("--env", type=Path, default=None, help=".env file with the DB_* variables (default: repo root)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel connections per wave")
+    parser.add_argument(
+        "--temporal-storage",
+        choices=TEMPORAL_STORAGES,
+        default="both",
+        help="columns: wide temporal_feature table; packed: float32 blob per track + manifest",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=ROWS_PER_CHUNK, help="Rows encoded per COPY chunk")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv)
+    load_env(args.env)
+
+    start = time.perf_counter()
+    ids = LegacyIds()
+    genres = build_genres(args.data_dir, ids)
+    artist_loads, artists = build_artists(args.data_dir, ids)
+    albums = build_albums(args.data_dir, ids)
+    tracks_stg = read_tracks(args.data_dir)
+    tags, tag_ids = build_tags(artists, tracks_stg)
+    *users, genre_preference = build_users(args.answers, genres[0].frame)
+    tracks, kept = build_tracks(args.data_dir, tracks_stg, ids)
+    links = {load.table: load for load in build_track_links(kept, artists, tag_ids, ids)}
+    echonest = build_echonest(args.data_dir, ids, kept)
+    temporal = build_temporal(args.data_dir, ids)
+    print(f"Prepared {len(kept)} tracks client-side in {time.perf_counter() - start:.2f}s")
+
+    chunk = args.chunk_rows
+    try:
+        # 1. Tables sans dépendance entre elles
+        run_wave(
+            "reference",
+            {"genres": (genres,), "artists": (artist_loads,), "albums": (albums,), "tags": (tags,), "users": (users,)},
+            args.workers,
+            chunk,
+        )
+        # 2. Pistes (album) et liaisons qui ne dépendent que de la vague 1
+        run_wave(
+            "tracks",
+            {"tracks": (tracks,), "artist_tag": ([links.pop("artist_tag")],), "genre_preference": ([genre_preference],)},
+            args.workers,
+            chunk,
+        )
+        # 3. Tout ce qui référence track ; les triggers de track ont déjà créé les lignes vides
+        wave = {table: ([load],) for table, load in links.items()}
+        wave["track_artist_main"] = ([links["track_artist_main"]], suspend_artist_counters, recompute_artist_counters)
+        wave.update({load.table: ([load],) for load in echonest})
+        if args.temporal_storage in ("columns", "both"):
+            wave["temporal_feature"] = ([temporal], lambda conn: add_missing_columns(conn, temporal))
+        if args.temporal_storage in ("packed", "both"):
+            wave["temporal_feature_packed"] = (pack_temporal(temporal), reset_manifest)
+        run_wave("features", wave, args.workers, chunk)
+        refresh_catalog()
+    except Exception as exc:
+        print(f"Error populating database: {exc}", file=sys.stderr)
+        return 1
+
+    print(f"Database populated in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+import psycopg2
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[3]
+
+
+def load_env(env_path: Optional[str | Path] = None) -> None:
+    """Charge le .env indique, sinon celui a la racine du repo"""
+    load_dotenv(dotenv_path=env_path or ROOT / ".env")
+
+
+def connect() -> psycopg2.extensions.connection:
+    """Connexion dediee au chargement ; DB_HOST permet de viser un Postgres local hors Docker"""
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("PGDB_PORT", "5432"),
+        user=os.getenv("DB_USER", "idfou"),
+        password=os.getenv("DB_ROOT_PASSWORD"),
+        dbname=os.getenv("DB_NAME", "sae5idfou"),
+        # Meme reglage que 0_settings_helpers.sql
+        options="-c synchronous_commit=off",
+    )
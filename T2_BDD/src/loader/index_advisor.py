@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""Rejoue les requêtes des recommandeurs (T3) sous `EXPLAIN (ANALYZE, BUFFERS)` et
+propose les index qui leur manquent.
+
+Les requêtes sont listées dans `workload.py`. Tout est exécuté dans une transaction
+annulée à la fin : la base n'est pas modifiée. À lancer sur une base peuplée :
+    python3 T2_BDD/src/loader/index_advisor.py
+    python3 T2_BDD/src/loader/index_advisor.py --write T2_BDD/src/sql/migrations/005_indexes.sql
+
+Règles appliquées aux plans :
+- Seq Scan qui écarte l'essentiel des lignes sur un filtre `col = ...` -> index (col) ;
+- Sort (ou Incremental Sort) sur les colonnes d'une seule table -> index sur ces clés ;
+- tri par distance pgvector (`<=>`, `<->`, `<#>`) sur un parcours complet -> index HNSW.
+Les clés de jointure sont listées avec l'index qui les couvre déjà, le cas échéant.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from db import connect, load_env
+from workload import DEFAULT_PARAMETERS, SAMPLE_QUERIES, WORKLOAD, Probe
+
+# Lignes minimales parcourues par un Seq Scan pour qu'un index vaille la peine
+DEFAULT_MIN_ROWS = 1_000
+# Part maximale des lignes gardées par le filtre (au-delà, le parcours complet reste correct)
+SELECTIVITY = 0.1
+
+VECTOR_OPCLASSES = {"<=>": "vector_cosine_ops", "<->": "vector_l2_ops", "<#>": "vector_ip_ops"}
+
+_EQUALITY = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\)? = (?:ANY \()?(?:'|\$\d|ARRAY|\(InitPlan)")
+_JOIN_KEY = re.compile(r"(?:\b(\w+)\.)?\b(\w+) = \(?(\w+)\.(\w+)")
+_DISTANCE = re.compile(r"(?:\b(\w+)\.)?\b(\w+) (<=>|<->|<#>)")
+_SORT_KEY = re.compile(r"^(?:(\w+)\.)?(\w+)( DESC)?$")
+
+
+@dataclass(frozen=True)
+class IndexProposal:
+    table: str
+    columns: tuple[str, ...]
+    method: str = "btree"
+    opclass: str | None = None
+
+    @property
+    def name(self) -> str:
+        parts = [column.split()[0] for column in self.columns]
+        suffix = "_" + self.method if self.method != "btree" else ""
+        return f"idx_{self.table}_{'_'.join(parts)}{suffix}"
+
+    def ddl(self) -> str:
+        keys = ", ".join(f"{column} {self.opclass}" if self.opclass else column for column in self.columns)
+        using = f" USING {self.method}" if self.method != "btree" else ""
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table}{using} ({keys});"
+
+
+@dataclass
+class Finding:
+    proposal: IndexProposal
+    reasons: list[str] = field(default_factory=list)
+    covered_by: str | None = None
+
+
+@dataclass
+class ProbeResult:
+    probe: Probe
+    plan: dict | None = None
+    error: str | None = None
+
+    @property
+    def execution_ms(self) -> float:
+        return self.plan["Execution Time"] if self.plan else 0.0
+
+
+def iter_nodes(node: dict, parent: dict | None = None) -> Iterator[tuple[dict, dict | None]]:
+    yield node, parent
+    for child in node.get("Plans", []):
+        yield from iter_nodes(child, node)
+
+
+def _scans_below(node: dict) -> list[dict]:
+    return [child for child, _ in iter_nodes(node) if "Relation Name" in child]
+
+
+def _owner(scans: Sequence[dict], qualifier: str | None) -> dict | None:
+    """Le parcours auquel appartient une colonne qualifiée (alias ou nom de table)."""
+    if qualifier is None:
+        return scans[0] if len(scans) == 1 else None
+    for scan in scans:
+        if qualifier in (scan.get("Alias"), scan["Relation Name"]):
+            return scan
+    return None
+
+
+def _scanned_rows(scan: dict) -> float:
+    loops = scan.get("Actual Loops", 1) or 1
+    return (scan.get("Actual Rows", 0) + scan.get("Rows Removed by Filter", 0)) * loops
+
+
+def analyse_plan(plan: dict, min_rows: int) -> tuple[list[tuple[IndexProposal, str]], list[tuple[str, str]]]:
+    """Retourne (index proposés avec leur motif, clés de jointure (table, colonne))."""
+    proposals: list[tuple[IndexProposal, str]] = []
+    join_keys: list[tuple[str, str]] = []
+    root = plan["Plan"]
+
+    for node, _ in iter_nodes(root):
+        kind = node["Node Type"]
+
+        if kind == "Seq Scan" and "Filter" in node and _scanned_rows(node) >= min_rows:
+            kept = node.get("Actual Rows", 0) * (node.get("Actual Loops", 1) or 1)
+            if kept <= SELECTIVITY * _scanned_rows(node):
+                for qualifier, column in _EQUALITY.findall(node["Filter"]):
+                    if qualifier in ("", node.get("Alias"), node["Relation Name"]):
+                        proposals.append(
+                            (
+                                IndexProposal(node["Relation Name"], (column,)),
+                                f"Seq Scan keeps {kept:.0f}/{_scanned_rows(node):.0f} rows on {column}",
+                            )
+                        )
+
+        if "Sort Key" in node or "Order By" in node:
+            keys = node.get("Sort Key", []) + ([node["Order By"]] if "Order By" in node else [])
+            scans = _scans_below(node)
+            for key in keys:
+                match = _DISTANCE.search(key)
+                if match and kind != "Index Scan":
+                    qualifier, column, operator = match.groups()
+                    scan = _owner(scans, qualifier)
+                    if scan is not None and scan["Node Type"] == "Seq Scan":
+                        proposals.append(
+                            (
+                                IndexProposal(scan["Relation Name"], (column,), "hnsw", VECTOR_OPCLASSES[operator]),
+                                f"{scan['Relation Name']} fully scanned to order by {column} {operator} ...",
+                            )
+                        )
+            if kind in ("Sort", "Incremental Sort") and keys:
+                parsed = [_SORT_KEY.match(key) for key in keys]
+                owners = {id(_owner(scans, m.group(1))) for m in parsed if m} if all(parsed) else set()
+                scan = _owner(scans, parsed[0].group(1)) if all(parsed) else None
+                if scan is not None and len(owners) == 1 and _scanned_rows(scan) >= min_rows:
+                    columns = tuple(m.group(2) + (m.group(3) or "") for m in parsed)
+                    proposals.append(
+                        (
+                            IndexProposal(scan["Relation Name"], columns),
+                            f"{kind} of {_scanned_rows(scan):.0f} rows on {', '.join(columns)}",
+                        )
+                    )
+
+        for condition in ("Hash Cond", "Merge Cond", "Join Filter", "Index Cond"):
+            if condition not in node:
+                continue
+            # Le nœud lui-même en fait partie s'il parcourt une table (Index Cond)
+            scans = _scans_below(node)
+            for left_q, left_c, right_q, right_c in _JOIN_KEY.findall(node[condition]):
+                for qualifier, column in ((left_q, left_c), (right_q, right_c)):
+                    scan = _owner(scans, qualifier)
+                    if scan is not None:
+                        join_keys.append((scan["Relation Name"], column))
+
+    return proposals, join_keys
+
+
+def fetch_indexes(conn, table: str) -> list[tuple[str, str, list[str], list[bool], list[str]]]:
+    """(nom, méthode, colonnes clés, DESC par colonne, classes d'opérateurs) des index de `table`."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname,
+                   am.amname,
+                   array(
+                       SELECT a.attname
+                       FROM unnest(i.indkey::int2[]) WITH ORDINALITY k(attnum, ord)
+                       JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                       WHERE k.ord <= i.indnkeyatts
+                       ORDER BY k.ord
+                   ),
+                   array(
+                       SELECT (o.opt & 1) = 1
+                       FROM unnest(i.indoption::int2[]) WITH ORDINALITY o(opt, ord)
+                       ORDER BY o.ord
+                   ),
+                   array(
+                       SELECT oc.opcname
+                       FROM unnest(i.indclass::oid[]) WITH ORDINALITY k(opc, ord)
+                       JOIN pg_opclass oc ON oc.oid = k.opc
+                       ORDER BY k.ord
+                   )
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE i.indrelid = to_regclass(%s)
+            ORDER BY c.relname
+            """,
+            (table,),
+        )
+        return cur.fetchall()
+
+
+def covering_index(conn, proposal: IndexProposal) -> str | None:
+    """Nom d'un index existant dont les premières colonnes servent déjà la proposition."""
+    wanted = [column.split()[0] for column in proposal.columns]
+    descending = [column.endswith(" DESC") for column in proposal.columns]
+    for name, method, keys, desc, opclasses in fetch_indexes(conn, proposal.table):
+        if method != proposal.method or keys[: len(wanted)] != wanted:
+            continue
+        if proposal.opclass is not None and opclasses[0] != proposal.opclass:
+            continue
+        prefix = list(desc[: len(wanted)])
+        # Un index parcouru à l'envers sert aussi le tri inverse
+        if len(wanted) == 1 or prefix == descending or prefix == [not d for d in descending]:
+            return name
+    return None
+
+
+def sample_parameters(conn, overrides: dict) -> dict:
+    params = dict(DEFAULT_PARAMETERS)
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    with conn.cursor() as cur:
+        for key, query in SAMPLE_QUERIES.items():
+            if key not in params:
+                cur.execute(query, params)
+                row = cur.fetchone()
+                params[key] = row[0] if row else None
+    return params
+
+
+def run_probes(conn, params: dict, probes: Sequence[Probe]) -> list[ProbeResult]:
+    """Chaque sonde dans un SAVEPOINT : une relation absente n'interrompt pas les suivantes."""
+    results = []
+    with conn.cursor() as cur:
+        for probe in probes:
+            cur.execute("SAVEPOINT probe")
+            try:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + probe.text(conn), params)
+                raw = cur.fetchone()[0]
+                plan = json.loads(raw)[0] if isinstance(raw, str) else raw[0]
+                results.append(ProbeResult(probe, plan=plan))
+                cur.execute("RELEASE SAVEPOINT probe")
+            except Exception as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT probe")
+                results.append(ProbeResult(probe, error=str(exc).strip().splitlines()[0]))
+    return results
+
+
+def collect_findings(conn, results: Sequence[ProbeResult], min_rows: int) -> tuple[list[Finding], dict]:
+    findings: dict[IndexProposal, Finding] = {}
+    join_keys: dict[tuple[str, str], set[str]] = {}
+    for result in results:
+        if result.plan is None:
+            continue
+        proposals, keys = analyse_plan(result.plan, min_rows)
+        for proposal, reason in proposals:
+            finding = findings.setdefault(proposal, Finding(proposal))
+            finding.reasons.append(f"{result.probe.name}: {reason}")
+        for key in keys:
+            join_keys.setdefault(key, set()).add(result.probe.name)
+    for finding in findings.values():
+        finding.covered_by = covering_index(conn, finding.proposal)
+    return list(findings.values()), join_keys
+
+
+def _buffers(plan: dict) -> str:
+    node = plan["Plan"]
+    hit = node.get("Shared Hit Blocks", 0)
+    read = node.get("Shared Read Blocks", 0)
+    temp = node.get("Temp Written Blocks", 0)
+    return f"hit={hit} read={read}" + (f" temp={temp}" if temp else "")
+
+
+def print_report(conn, results: Sequence[ProbeResult], findings: Sequence[Finding], join_keys: dict) -> None:
+    print(f"{'probe':<28} {'time':>10}  buffers")
+    for result in results:
+        if result.error:
+            print(f"{result.probe.name:<28} {'skipped':>10}  {result.error}")
+        else:
+            print(f"{result.probe.name:<28} {result.execution_ms:>8.2f}ms  {_buffers(result.plan)}")
+
+    missing = [finding for finding in findings if finding.covered_by is None]
+    print("\nProposed indexes:" if missing else "\nNo missing index found.")
+    for finding in missing:
+        print(f"  {finding.proposal.ddl()}")
+        for reason in finding.reasons:
+            print(f"      -- {reason}")
+    for finding in findings:
+        if finding.covered_by is not None:
+            print(f"  ok  {finding.proposal.table}({', '.join(finding.proposal.columns)}) -> {finding.covered_by}")
+
+    if join_keys:
+        print("\nJoin keys:")
+        for (table, column), probes in sorted(join_keys.items()):
+            covered = covering_index(conn, IndexProposal(table, (column,)))
+            status = f"-> {covered}" if covered else "no index (fine for hash joins over full tables)"
+            print(f"  {table}({column}) {status}  [{', '.join(sorted(probes))}]")
+
+
+def write_migration(path: Path, findings: Sequence[Finding]) -> int:
+    missing = [finding for finding in findings if finding.covered_by is None]
+    lines = ["-- Index proposes par T2_BDD/src/loader/index_advisor.py", ""]
+    for finding in missing:
+        lines += [f"-- {reason}" for reason in finding.reasons]
+        lines += [finding.proposal.ddl(), ""]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return len(missing)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN the recommender queries and propose missing indexes.")
+    parser.add_argument("--env", type=Path, default=None, help=".env file with the DB_* variables (default: repo root)")
+    parser.add_argument("--account-id", default=None, help="Account used for per-user queries (default: most active listener)")
+    parser.add_argument("--track-id", default=None, help="Track used for per-track queries")
+    parser.add_argument("--min-rows", type=int, default=DEFAULT_MIN_ROWS, help="Ignore scans over fewer rows")
+    parser.add_argument("--only", nargs="+", default=None, help="Probe names (or prefixes) to run")
+    parser.add_argument("--write", type=Path, default=None, help="Write the proposed CREATE INDEX statements to this file")
+    args = parser.parse_args(argv)
+    load_env(args.env)
+
+    probes = [
+        probe for probe in WORKLOAD
+        if args.only is None or any(probe.name.startswith(prefix) for prefix in args.only)
+    ]
+    conn = connect()
+    try:
+        params = sample_parameters(conn, {"account_id": args.account_id, "track_id": args.track_id})
+        results = run_probes(conn, params, probes)
+        findings, join_keys = collect_findings(conn, results, args.min_rows)
+        print_report(conn, results, findings, join_keys)
+    except Exception as exc:
+        print(f"Error analysing queries: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        # EXPLAIN ANALYZE exécute les requêtes : rien n'est gardé
+        conn.rollback()
+        conn.close()
+
+    if args.write is not None:
+        count = write_migration(args.write, findings)
+        print(f"\n{count} statement(s) written to {args.write}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,241 @@
+"""Encodage d'un DataFrame au format binaire de `COPY ... FROM STDIN (FORMAT binary)`.
+
+Les colonnes à largeur fixe sans NULL sont regroupées et encodées d'un bloc avec
+un tableau structuré NumPy ; seules les colonnes texte/bytea (ou contenant des NULL)
+sont encodées valeur par valeur.
+"""
+from __future__ import annotations
+
+import io
+import struct
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+TRAILER = struct.pack("!h", -1)
+NULL_FIELD = struct.pack("!i", -1)
+ROWS_PER_CHUNK = 50_000
+
+PG_EPOCH_DAY = np.datetime64("2000-01-01", "D")
+PG_EPOCH_US = np.datetime64("2000-01-01", "us")
+
+# Types PostgreSQL supportés -> dtype NumPy big-endian de leur représentation binaire
+FIXED_TYPES = {
+    "uuid": "S16",
+    "int4": ">i4",
+    "int8": ">i8",
+    "float4": ">f4",
+    "float8": ">f8",
+    "bool": "?",
+    "date": ">i4",
+    "timestamp": ">i8",
+}
+VARIABLE_TYPES = {"text", "bytea"}
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    pg_type: str
+
+    def __post_init__(self) -> None:
+        if self.pg_type not in FIXED_TYPES and self.pg_type not in VARIABLE_TYPES:
+            raise ValueError(f"unsupported COPY type for {self.name}: {self.pg_type}")
+
+
+def columns(*specs: str) -> list[Column]:
+    """`columns("track_id uuid", "title text")` -> liste de `Column`."""
+    return [Column(*spec.split()) for spec in specs]
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _fixed_values(series: pd.Series, pg_type: str) -> tuple[np.ndarray, np.ndarray]:
+    """Retourne (valeurs NumPy au format binaire, masque des NULL)."""
+    if pg_type == "uuid":
+        null = series.isna().to_numpy()
+        values = np.array(series.where(~null, b"").tolist(), dtype="S16")
+        return values, null
+    if pg_type == "bool":
+        null = series.isna().to_numpy()
+        values = series.where(~null, False).astype(bool).to_numpy()
+        return values, null
+    if pg_type in ("date", "timestamp"):
+        stamps = pd.to_datetime(series, errors="coerce")
+        null = stamps.isna().to_numpy()
+        if pg_type == "date":
+            raw = stamps.to_numpy(dtype="datetime64[D]") - PG_EPOCH_DAY
+        else:
+            raw = stamps.to_numpy(dtype="datetime64[us]") - PG_EPOCH_US
+        values = np.where(null, 0, raw.astype(np.int64))
+        return values.astype(FIXED_TYPES[pg_type]), null
+
+    numbers = pd.to_numeric(series, errors="coerce")
+    null = numbers.isna().to_numpy()
+    values = numbers.to_numpy(dtype=np.float64, na_value=0.0)
+    if pg_type in ("int4", "int8"):
+        # Même arrondi que CAST(double AS INT) côté PostgreSQL
+        values = np.rint(values)
+    return values.astype(FIXED_TYPES[pg_type]), null
+
+
+def _variable_fields(series: pd.Series, pg_type: str) -> list[bytes]:
+    """text : UTF-8 ; bytea : octets bruts (le format binaire n'échappe rien)."""
+    null = series.isna().to_numpy()
+    fields = []
+    for value, is_null in zip(series.tolist(), null):
+        if is_null:
+            fields.append(NULL_FIELD)
+        else:
+            data = bytes(value) if pg_type == "bytea" else str(value).encode("utf-8")
+            fields.append(struct.pack("!i", len(data)) + data)
+    return fields
+
+
+def _block(count: int, parts: Sequence[tuple[str, np.ndarray]], with_tuple_header: bool) -> bytes:
+    """Encode des colonnes à largeur fixe sans NULL en un seul buffer (une ligne = un record)."""
+    dtype = [("count", ">i2")] if with_tuple_header else []
+    for index, (code, _) in enumerate(parts):
+        dtype += [(f"l{index}", ">i4"), (f"v{index}", code)]
+    block = np.empty(count, dtype=dtype)
+    if with_tuple_header:
+        block["count"] = len(parts)
+    for index, (code, values) in enumerate(parts):
+        block[f"l{index}"] = np.dtype(code).itemsize
+        block[f"v{index}"] = values
+    return block.tobytes()
+
+
+def encode_rows(frame: pd.DataFrame, spec: Sequence[Column]) -> bytes:
+    """Encode les lignes de `frame` (sans en-tête ni fin de flux)."""
+    count = len(frame)
+    if count == 0:
+        return b""
+
+    # Segments consécutifs : ("block", [(code, valeurs)]) ou ("fields", [bytes par ligne])
+    segments: list[tuple[str, list]] = []
+    for column in spec:
+        series = frame[column.name]
+        if column.pg_type in VARIABLE_TYPES:
+            segments.append(("fields", _variable_fields(series, column.pg_type)))
+            continue
+        values, null = _fixed_values(series, column.pg_type)
+        code = FIXED_TYPES[column.pg_type]
+        if not null.any():
+            if segments and segments[-1][0] == "block":
+                segments[-1][1].append((code, values))
+            else:
+                segments.append(("block", [(code, values)]))
+            continue
+        width = struct.pack("!i", np.dtype(code).itemsize)
+        raw = values.tobytes()
+        size = np.dtype(code).itemsize
+        segments.append(
+            (
+                "fields",
+                [NULL_FIELD if null[i] else width + raw[i * size:(i + 1) * size] for i in range(count)],
+            )
+        )
+
+    if len(segments) == 1 and segments[0][0] == "block":
+        # Cas le plus rapide : toute la table est à largeur fixe et sans NULL
+        return _block(count, segments[0][1], with_tuple_header=True)
+
+    per_row: list[list[bytes]] = []
+    for kind, payload in segments:
+        if kind == "fields":
+            per_row.append(payload)
+            continue
+        raw = _block(count, payload, with_tuple_header=False)
+        size = len(raw) // count
+        per_row.append([raw[i * size:(i + 1) * size] for i in range(count)])
+
+    tuple_header = struct.pack("!h", len(spec))
+    return b"".join(tuple_header + b"".join(fields) for fields in zip(*per_row))
+
+
+def iter_copy_chunks(frame: pd.DataFrame, spec: Sequence[Column], rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[bytes]:
+    """Flux binaire complet (en-tête, lignes par paquets, fin de flux)."""
+    yield HEADER
+    for start in range(0, len(frame), rows_per_chunk):
+        yield encode_rows(frame.iloc[start:start + rows_per_chunk], spec)
+    yield TRAILER
+
+
+class ChunkReader(io.RawIOBase):
+    """Adapte un générateur de bytes à l'interface `read()` attendue par `copy_expert`."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        # copy_expert lit par petits blocs : on avance dans le paquet courant sans le recopier
+        parts = []
+        wanted = size
+        while wanted != 0:
+            if not self._current:
+                try:
+                    self._current = memoryview(next(self._chunks))
+                except StopIteration:
+                    break
+                continue
+            take = len(self._current) if wanted < 0 else min(wanted, len(self._current))
+            parts.append(self._current[:take].tobytes())
+            self._current = self._current[take:]
+            if wanted > 0:
+                wanted -= take
+        return b"".join(parts)
+
+
+def copy_frame(conn, table: str, frame: pd.DataFrame, spec: Sequence[Column], rows_per_chunk: int = ROWS_PER_CHUNK) -> int:
+    """`COPY table (colonnes) FROM STDIN (FORMAT binary)` ; retourne le nombre de lignes."""
+    if frame.empty:
+        return 0
+    column_list = ", ".join(quote_ident(column.name) for column in spec)
+    sql = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT binary)"
+    with conn.cursor() as cur:
+        cur.copy_expert(sql, ChunkReader(iter_copy_chunks(frame, spec, rows_per_chunk)))
+    return len(frame)
+
+
+def copy_upsert(
+    conn,
+    table: str,
+    frame: pd.DataFrame,
+    spec: Sequence[Column],
+    key: Sequence[str],
+    rows_per_chunk: int = ROWS_PER_CHUNK,
+) -> int:
+    """COPY dans une table temporaire puis `INSERT ... ON CONFLICT (key) DO UPDATE`.
+
+    Nécessaire pour les tables que les triggers pré-remplissent (audio_feature,
+    temporal_feature) : un COPY direct échouerait sur la clé primaire.
+    """
+    if frame.empty:
+        return 0
+    staging = "_stg_" + table.strip('"')
+    names = [quote_ident(column.name) for column in spec]
+    updates = [f"{name} = EXCLUDED.{name}" for name in names if name.strip('"') not in key]
+    with conn.cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+    copy_frame(conn, staging, frame, spec, rows_per_chunk)
+    conflict = ", ".join(quote_ident(name) for name in key)
+    action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+    with conn.cursor() as cur:
+        cur.execute(
+            f"INSERT INTO {table} ({', '.join(names)}) "
+            f"SELECT {', '.join(names)} FROM {staging} "
+            f"ON CONFLICT ({conflict}) {action}"
+        )
+    return len(frame)
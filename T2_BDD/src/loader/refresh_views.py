@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Rafraîchit les vues matérialisées lues par les recommandeurs (T3).
+
+À lancer après un chargement ou des modifications du catalogue :
+    python3 T2_BDD/src/loader/refresh_views.py
+    python3 T2_BDD/src/loader/refresh_views.py --concurrently
+
+`--concurrently` ne bloque pas les lectures pendant le rafraîchissement (plus lent,
+nécessite l'index unique de la vue et une vue déjà remplie une première fois).
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Sequence
+
+from db import connect, load_env
+
+MATERIALIZED_VIEWS = ("mv_track_features", "mv_track_popularity")
+
+
+def refresh_views(conn, views: Sequence[str] = MATERIALIZED_VIEWS, concurrently: bool = False) -> dict[str, float]:
+    """Rafraîchit chaque vue existante ; retourne la durée par vue (les vues absentes sont ignorées)."""
+    timings = {}
+    with conn.cursor() as cur:
+        for view in views:
+            cur.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = %s", (view,))
+            row = cur.fetchone()
+            if row is None:
+                continue
+            # CONCURRENTLY est refusé sur une vue jamais remplie
+            mode = "CONCURRENTLY " if concurrently and row[0] else ""
+            start = time.perf_counter()
+            cur.execute(f"REFRESH MATERIALIZED VIEW {mode}{view}")
+            timings[view] = time.perf_counter() - start
+    return timings
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh the materialized views used by the recommenders.")
+    parser.add_argument("--concurrently", action="store_true", help="Do not block readers while refreshing")
+    parser.add_argument("--env", type=Path, default=None, help=".env file with the DB_* variables (default: repo root)")
+    args = parser.parse_args(argv)
+    load_env(args.env)
+
+    conn = connect()
+    try:
+        timings = refresh_views(conn, concurrently=args.concurrently)
+        conn.commit()
+    except Exception as exc:
+        conn.rollback()
+        print(f"Error refreshing views: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    if not timings:
+        print("No materialized view found; run init_db first.")
+    for view, seconds in timings.items():
+        print(f"{view} refreshed in {seconds:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Génère des CSV nettoyés synthétiques, aux mêmes en-têtes que ceux de T1, pour mesurer
+le peuplement à une échelle choisie (10k, 100k, 1M pistes...).
+
+Les colonnes sont lues dans les tables de staging de `T2_BDD/src/sql/populate/*.sql` :
+un CSV généré se charge donc avec `populate.sql` comme avec `bulk_load.py`.
+Les proportions suivent le jeu FMA (~6 pistes par artiste, ~7 par album, 163 genres,
+données Echo Nest pour ~13 % des pistes).
+    python3 T2_BDD/src/loader/synthetic_data.py --tracks 100000 --out /tmp/fma_100k
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from db import ROOT
+
+POPULATE_DIR = ROOT / "T2_BDD" / "src" / "sql" / "populate"
+REAL_ANSWERS = ROOT / "T1_alternants" / "src" / "clean" / "out" / "clean_answers.csv"
+
+# fichier CSV -> (script de peuplement, table de staging qui le reçoit)
+STAGING = {
+    "clean_genres.csv": ("1_genres.sql", "stg_genre"),
+    "clean_raw_artists.csv": ("2_artists.sql", "stg_artist"),
+    "clean_raw_albums.csv": ("3_albums.sql", "stg_album"),
+    "clean_tracks.csv": ("4_tracks.sql", "stg_track"),
+    "clean_raw_tracks.csv": ("4_tracks.sql", "stg_raw_track_numbers"),
+    "clean_echonest.csv": ("6_audio_features.sql", "stg_echonest"),
+    "clean_features.csv": ("7_temporal_features.sql", "stg_features"),
+}
+
+N_GENRES = 163
+N_TAGS = 500
+TRACKS_PER_ARTIST = 6
+TRACKS_PER_ALBUM = 7
+ECHONEST_SHARE = 0.13
+NULL_SHARE = 0.1
+ROWS_PER_CHUNK = 20_000
+
+_TABLE = r"CREATE TEMP TABLE {name} \((.*?)\n\);"
+_COLUMN = re.compile(r'^\s*("[^"]+"|\w+)\s+(DOUBLE PRECISION|\w+)')
+
+
+@dataclass
+class Scale:
+    tracks: int
+    users: int | None = None
+    seed: int = 0
+
+    @property
+    def artists(self) -> int:
+        return max(1, self.tracks // TRACKS_PER_ARTIST)
+
+    @property
+    def albums(self) -> int:
+        return max(1, self.tracks // TRACKS_PER_ALBUM)
+
+
+def staging_columns(sql_file: str, table: str) -> list[tuple[str, str]]:
+    """[(colonne, type SQL)] de `CREATE TEMP TABLE table (...)` dans un script de peuplement."""
+    text = (POPULATE_DIR / sql_file).read_text(encoding="utf-8").replace("\r\n", "\n")
+    match = re.search(_TABLE.format(name=table), text, re.S)
+    if match is None:
+        raise ValueError(f"{table} not found in {sql_file}")
+    columns = []
+    for line in match.group(1).splitlines():
+        column = _COLUMN.match(line)
+        if column:
+            columns.append((column.group(1).strip('"'), column.group(2).upper()))
+    return columns
+
+
+def _with_nulls(values: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    values = values.astype(object)
+    values[rng.random(len(values)) < NULL_SHARE] = ""
+    return values
+
+
+def _generic(name: str, sql_type: str, ids: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    count = len(ids)
+    if sql_type == "INT":
+        return _with_nulls(rng.integers(0, 5_000, count), rng)
+    if sql_type == "DOUBLE PRECISION":
+        return np.round(rng.random(count), 6)
+    if sql_type == "DATE":
+        days = rng.integers(0, 20 * 365, count).astype("timedelta64[D]")
+        return _with_nulls((np.datetime64("2000-01-01") + days).astype(str), rng)
+    if sql_type == "BOOLEAN":
+        return np.where(rng.random(count) < 0.5, "True", "False")
+    return _with_nulls(np.char.add(f"{name} ", ids.astype(str)), rng)
+
+
+def _python_lists(values: Sequence[Sequence], quote: bool) -> list[str]:
+    """Listes au format `str(list)` de pandas, comme dans les CSV de T1."""
+    if quote:
+        return ["[" + ", ".join(f"'{item}'" for item in row) + "]" for row in values]
+    return ["[" + ", ".join(str(item) for item in row) + "]" for row in values]
+
+
+def _sample_lists(pool_size: int, count: int, max_items: int, rng: np.random.Generator) -> list[np.ndarray]:
+    lengths = rng.integers(0, max_items + 1, count)
+    flat = rng.integers(1, pool_size + 1, lengths.sum())
+    return np.split(flat, np.cumsum(lengths)[:-1])
+
+
+def _special(table: str, name: str, ids: np.ndarray, scale: Scale, rng: np.random.Generator):
+    """Colonnes qui portent des clés ou des listes : cohérentes entre fichiers."""
+    count = len(ids)
+    if table == "stg_genre":
+        if name == "parent_id":
+            return np.where(ids > 16, rng.integers(1, 17, count), 0).astype(str)
+        if name == "title":
+            return np.char.add("Genre ", ids.astype(str))
+        if name == "top_level":
+            return np.where(ids > 16, rng.integers(1, 17, count), ids).astype(str)
+    if name == "album_id":
+        return _with_nulls(rng.integers(1, scale.albums + 1, count), rng)
+    if name == "artist_id":
+        return rng.integers(1, scale.artists + 1, count).astype(str)
+    if name == "track_genres":
+        return _python_lists(_sample_lists(N_GENRES, count, 3, rng), quote=False)
+    if name in ("tags", "track_tags"):
+        tags = _sample_lists(N_TAGS, count, 4, rng)
+        return _python_lists([[f"tag{i}" for i in row] for row in tags], quote=True)
+    return None
+
+
+def _write_table(path: Path, table: str, columns: list[tuple[str, str]], ids: np.ndarray, scale: Scale, rng) -> None:
+    header = True
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        for start in range(0, len(ids), ROWS_PER_CHUNK):
+            chunk_ids = ids[start:start + ROWS_PER_CHUNK]
+            data = {}
+            for index, (name, sql_type) in enumerate(columns):
+                # La première colonne est l'identifiant legacy de la ligne
+                values = chunk_ids.astype(str) if index == 0 else _special(table, name, chunk_ids, scale, rng)
+                data[name] = values if values is not None else _generic(name, sql_type, chunk_ids, rng)
+            pd.DataFrame(data).to_csv(fh, index=False, header=header)
+            header = False
+
+
+def _write_answers(path: Path, users: int | None, rng: np.random.Generator) -> None:
+    """Réponses au questionnaire : le vrai fichier, ou ses lignes rééchantillonnées."""
+    if not REAL_ANSWERS.exists():
+        raise FileNotFoundError(f"survey answers not found: {REAL_ANSWERS}")
+    if users is None:
+        shutil.copyfile(REAL_ANSWERS, path)
+        return
+    answers = pd.read_csv(REAL_ANSWERS, dtype=str, keep_default_na=False)
+    answers.iloc[rng.integers(0, len(answers), users)].to_csv(path, index=False)
+
+
+def generate(out_dir: Path, scale: Scale) -> dict[str, int]:
+    """Écrit tous les CSV dans `out_dir` ; retourne le nombre de lignes par fichier."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(scale.seed)
+    echonest = np.sort(rng.choice(scale.tracks, max(1, int(scale.tracks * ECHONEST_SHARE)), replace=False)) + 1
+    tracks = np.arange(1, scale.tracks + 1)
+    ids = {
+        "clean_genres.csv": np.arange(1, N_GENRES + 1),
+        "clean_raw_artists.csv": np.arange(1, scale.artists + 1),
+        "clean_raw_albums.csv": np.arange(1, scale.albums + 1),
+        "clean_tracks.csv": tracks,
+        "clean_raw_tracks.csv": tracks,
+        "clean_echonest.csv": echonest,
+        "clean_features.csv": tracks,
+    }
+    rows = {}
+    for file_name, (sql_file, table) in STAGING.items():
+        _write_table(out_dir / file_name, table, staging_columns(sql_file, table), ids[file_name], scale, rng)
+        rows[file_name] = len(ids[file_name])
+    _write_answers(out_dir / "clean_answers.csv", scale.users, rng)
+    rows["clean_answers.csv"] = sum(1 for _ in open(out_dir / "clean_answers.csv", encoding="utf-8")) - 1
+    return rows
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic cleaned CSV files for load benchmarks.")
+    parser.add_argument("--tracks", type=int, required=True, help="Number of tracks (artists, albums follow FMA ratios)")
+    parser.add_argument("--users", type=int, default=None, help="Resample the survey answers to this many users")
+    parser.add_argument("--out", type=Path, required=True, help="Output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rows = generate(args.out, Scale(args.tracks, args.users, args.seed))
+    for file_name, count in rows.items():
+        print(f"{file_name:<24} {count:>9} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
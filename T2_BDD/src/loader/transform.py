@@ -0,0 +1,418 @@
+"""Préparation côté client des tables à charger.
+
+Reprend la logique de `sql/populate/*.sql` : parsing des listes Python
+(`parse_python_list`) et correspondance ids legacy -> UUID (`_legacy_id_map`),
+mais en opérations pandas vectorisées au lieu de fonctions PL/pgSQL ligne à ligne.
+Les UUID sont générés ici, ce qui permet de calculer toutes les tables de liaison
+avant la moindre écriture en base.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from pgcopy import Column, columns
+
+# Un élément de liste Python : 'quoté', "quoté" ou nu (ids numériques)
+_LIST_ITEM = r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"|([^,\[\]'\"]+)"
+
+USER_COLUMNS = [
+    "created_at", "has_consented", "is_listening", "frequency", "context", "when", "how",
+    "platform", "utility", "track_genre", "duration", "energy", "tempo", "feeling", "is_live",
+    "quality", "curiosity", "age_range", "gender", "position",
+]
+
+
+def read_table(
+    path: Path,
+    usecols: Sequence[str] | None = None,
+    names: Sequence[str] | None = None,
+    numeric_except: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    """Lit un fichier nettoyé ; un `.parquet` du même nom est préféré au CSV.
+
+    Comme le `\\copy ... (FORMAT csv)` du script SQL, seule une cellule vide vaut NULL
+    et les colonnes restent du texte jusqu'à l'encodage. Avec `numeric_except`, toutes
+    les autres colonnes sont lues directement en float64 par le parseur C (tables
+    larges de caractéristiques).
+    """
+    parquet = path.with_suffix(".parquet")
+    if parquet.exists():
+        frame = pd.read_parquet(parquet, columns=list(usecols) if usecols else None)
+        if names is not None:
+            frame.columns = list(names)
+        if numeric_except is not None:
+            return frame.astype({name: object for name in numeric_except})
+        return frame.astype(object).where(frame.notna(), None)
+    options = dict(keep_default_na=False, na_values=[""])
+    if numeric_except is not None:
+        options["dtype"] = {name: str for name in numeric_except}
+    else:
+        options["dtype"] = str
+    if names is not None:
+        return pd.read_csv(path, header=0, names=list(names), **options)
+    return pd.read_csv(path, usecols=usecols, **options)
+
+
+def new_uuids(count: int) -> np.ndarray:
+    """UUID v4 aléatoires, sous forme de bytes de 16 octets (format binaire de COPY)."""
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    data = raw.tobytes()
+    return np.array([data[i:i + 16] for i in range(0, len(data), 16)], dtype=object)
+
+
+def uuid_prefix(uuids: pd.Series, length: int = 8) -> pd.Series:
+    """Équivalent de `substr(uuid::text, 1, length)`."""
+    return uuids.map(lambda value: value.hex()[:length])
+
+
+def explode_list(series: pd.Series) -> pd.Series:
+    """Équivalent vectorisé de `unnest(parse_python_list(col))` suivi de `trim`.
+
+    Retourne une Series indexée comme `series` (un index répété par élément).
+    """
+    text = series.dropna().astype(str)
+    text = text[(text != "") & (text != "[]")].str.replace('""', '"', regex=False)
+    if text.empty:
+        return pd.Series([], dtype=object)
+    items = text.str.extractall(_LIST_ITEM)
+    values = items[0].fillna(items[1]).fillna(items[2]).str.strip()
+    values = values[values != ""]
+    return values.droplevel("match")
+
+
+@dataclass
+class LegacyIds:
+    """Table de correspondance id legacy -> UUID, une Series par table source."""
+
+    maps: Dict[str, pd.Series] = field(default_factory=dict)
+
+    def register(self, table: str, old_ids: pd.Series, uuids: pd.Series) -> None:
+        mapping = pd.Series(uuids.to_numpy(), index=old_ids.astype(str).to_numpy())
+        self.maps[table] = mapping[~mapping.index.duplicated()]
+
+    def lookup(self, table: str, old_ids: pd.Series) -> pd.Series:
+        """UUID correspondant à chaque id (None si inconnu), aligné sur `old_ids`."""
+        mapping = self.maps[table]
+        positions = mapping.index.get_indexer(old_ids.astype(str))
+        found = positions >= 0
+        values = np.full(len(positions), None, dtype=object)
+        values[found] = mapping.to_numpy()[positions[found]]
+        return pd.Series(values, index=old_ids.index, dtype=object)
+
+
+@dataclass
+class TableLoad:
+    """Une table prête pour le COPY ; `upsert_key` => passage par une table de staging."""
+
+    table: str
+    frame: pd.DataFrame
+    spec: list[Column]
+    upsert_key: tuple[str, ...] = ()
+
+
+def _link(table: str, left: str, right: str, frame: pd.DataFrame) -> TableLoad:
+    frame = frame.dropna().drop_duplicates()
+    return TableLoad(table, frame, columns(f"{left} uuid", f"{right} uuid"))
+
+
+# ---------------------------------------------------------------------------------
+# Tables de référence (indépendantes, chargées en parallèle)
+# ---------------------------------------------------------------------------------
+
+def build_genres(data_dir: Path, ids: LegacyIds) -> list[TableLoad]:
+    stg = read_table(data_dir / "clean_genres.csv")
+    stg["new_uuid"] = new_uuids(len(stg))
+    ids.register("genre", stg["genre_id"], stg["new_uuid"])
+    has_parent = stg["parent_id"].notna() & (stg["parent_id"] != "0")
+    parent = ids.lookup("genre", stg["parent_id"]).where(has_parent, None)
+    frame = pd.DataFrame(
+        {"genre_id": stg["new_uuid"], "parent_id": parent, "title": stg["title"], "top_level": stg["top_level"]}
+    )
+    # Le FK parent -> genre est vérifié en fin d'instruction : un seul COPY suffit
+    return [TableLoad("genre", frame, columns("genre_id uuid", "parent_id uuid", "title text", "top_level int4"))]
+
+
+def build_artists(data_dir: Path, ids: LegacyIds) -> tuple[list[TableLoad], pd.DataFrame]:
+    stg = read_table(data_dir / "clean_raw_artists.csv")
+    stg["new_uuid"] = new_uuids(len(stg))
+    ids.register("artist", stg["artist_id"], stg["new_uuid"])
+    now = pd.Timestamp.now()
+    account = pd.DataFrame(
+        {
+            "account_id": stg["new_uuid"],
+            "login": "artist_" + stg["artist_id"],
+            "name": stg["artist_name"],
+            "email": "artist_" + stg["artist_id"] + "@example.com",
+            "created_at": now,
+        }
+    )
+    artist = stg.rename(columns={"new_uuid": "artist_id", "artist_id": "legacy_id"})
+    loads = [
+        TableLoad(
+            "account",
+            account,
+            columns("account_id uuid", "login text", "name text", "email text", "created_at timestamp"),
+        ),
+        TableLoad(
+            "artist",
+            artist,
+            columns(
+                "artist_id uuid", "artist_bio text", "artist_location text", "artist_latitude float8",
+                "artist_longitude float8", "artist_active_year_begin int4", "artist_active_year_end int4",
+                "artist_favorites int8", "artist_comments int8",
+            ),
+        ),
+    ]
+    return loads, stg
+
+
+def build_albums(data_dir: Path, ids: LegacyIds) -> list[TableLoad]:
+    stg = read_table(data_dir / "clean_raw_albums.csv")
+    stg["new_uuid"] = new_uuids(len(stg))
+    ids.register("album", stg["album_id"], stg["new_uuid"])
+    frame = stg.rename(columns={"new_uuid": "album_id", "album_id": "legacy_id", "album_tracks": "album_tracks_count"})
+    spec = columns(
+        "album_id uuid", "album_title text", "album_type text", "album_tracks_count int4",
+        "album_date_released date", "album_listens int8", "album_favorites int8", "album_comments int8",
+        "album_producer text",
+    )
+    return [TableLoad("album", frame, spec)]
+
+
+def build_tags(artists: pd.DataFrame, tracks: pd.DataFrame) -> tuple[list[TableLoad], pd.Series]:
+    """Tags distincts issus des artistes et des pistes ; retourne aussi nom -> UUID."""
+    names = pd.concat([explode_list(artists["tags"]), explode_list(tracks["track_tags"])])
+    names = pd.Series(names.unique(), dtype=object)
+    tag_ids = pd.Series(new_uuids(len(names)), index=names.to_numpy(), dtype=object)
+    frame = pd.DataFrame({"tag_id": tag_ids.to_numpy(), "tag_name": names.to_numpy()})
+    return [TableLoad("tag", frame, columns("tag_id uuid", "tag_name text"))], tag_ids
+
+
+def build_users(answers_path: Path, genres: pd.DataFrame) -> list[TableLoad]:
+    stg = read_table(answers_path, names=USER_COLUMNS)
+    stg["account_uuid"] = new_uuids(len(stg))
+    prefix = uuid_prefix(stg["account_uuid"])
+    account = pd.DataFrame(
+        {
+            "account_id": stg["account_uuid"],
+            "login": "user_" + prefix,
+            "name": "User " + prefix,
+            "email": "user_" + prefix + "@test.com",
+            "created_at": stg["created_at"],
+        }
+    )
+    user = pd.DataFrame({"account_id": stg["account_uuid"], "pseudo": "User_" + prefix})
+    preference = pd.DataFrame(
+        {
+            "account_id": stg["account_uuid"],
+            "age_range": stg["age_range"],
+            "gender": stg["gender"],
+            "position": stg["position"],
+            "has_consented": stg["has_consented"] == "True",
+            "is_listening": stg["is_listening"] == "True",
+            "frequency": stg["frequency"],
+            "when_listening": stg["when"],
+            "duration_pref": stg["duration"],
+            "energy_pref": stg["energy"],
+            "tempo_pref": stg["tempo"],
+            "feeling_pref": stg["feeling"],
+            "is_live_pref": stg["is_live"],
+            "quality_pref": stg["quality"],
+            "curiosity_pref": stg["curiosity"],
+            "context": stg["context"],
+            "how": stg["how"],
+            "platform": stg["platform"],
+            "utility": stg["utility"],
+        }
+    )
+    liked = explode_list(stg["track_genre"]).str.lower()
+    by_title = pd.DataFrame({"title": genres["title"].str.lower(), "genre_id": genres["genre_id"]}).dropna()
+    pairs = (
+        pd.DataFrame({"account_id": stg["account_uuid"].loc[liked.index].to_numpy(), "title": liked.to_numpy()})
+        .merge(by_title, on="title")[["account_id", "genre_id"]]
+    )
+    return [
+        TableLoad(
+            "account",
+            account,
+            columns("account_id uuid", "login text", "name text", "email text", "created_at timestamp"),
+        ),
+        TableLoad('"user"', user, columns("account_id uuid", "pseudo text")),
+        TableLoad(
+            "preference",
+            preference,
+            columns(
+                "account_id uuid", "age_range text", "gender text", "position text", "has_consented bool",
+                "is_listening bool", "frequency text", "when_listening float8", "duration_pref int4",
+                "energy_pref text", "tempo_pref float8", "feeling_pref text", "is_live_pref text",
+                "quality_pref int4", "curiosity_pref int4", "context text", "how text", "platform text",
+                "utility text",
+            ),
+        ),
+        _link("genre_preference", "account_id", "genre_id", pairs),
+    ]
+
+
+# ---------------------------------------------------------------------------------
+# Pistes et tables dépendantes
+# ---------------------------------------------------------------------------------
+
+def read_tracks(data_dir: Path) -> pd.DataFrame:
+    return read_table(data_dir / "clean_tracks.csv")
+
+
+def build_tracks(data_dir: Path, stg: pd.DataFrame, ids: LegacyIds) -> tuple[list[TableLoad], pd.DataFrame]:
+    """Pistes dont l'artiste est connu (comme la jointure de `4_tracks.sql`)."""
+    stg = stg.copy()
+    stg["new_uuid"] = new_uuids(len(stg))
+    stg["artist_uuid"] = ids.lookup("artist", stg["artist_id"])
+    stg["album_uuid"] = ids.lookup("album", stg["album_id"])
+    kept = stg[stg["artist_uuid"].notna()]
+    ids.register("track", kept["track_id"], kept["new_uuid"])
+
+    numbers = read_table(data_dir / "clean_raw_tracks.csv", usecols=["track_id", "track_number", "track_disc_number"])
+    numbers = numbers.drop_duplicates("track_id").set_index("track_id")
+    track = pd.DataFrame(
+        {
+            "track_id": kept["new_uuid"],
+            "album_id": kept["album_uuid"],
+            "track_title": kept["track_title"],
+            "track_duration": kept["track_duration"],
+            "track_listens": kept["track_listens"],
+            "track_favorites": kept["track_favorites"],
+            "track_interest": kept["track_interest"],
+            "track_comments": kept["track_comments"],
+            "track_date_created": kept["track_date_created"],
+            "track_composer": kept["track_composer"],
+            "track_lyricist": kept["track_lyricist"],
+            "track_publisher": kept["track_publisher"],
+            "track_number": numbers["track_number"].reindex(kept["track_id"]).to_numpy(),
+            "track_disc_number": numbers["track_disc_number"].reindex(kept["track_id"]).to_numpy(),
+        }
+    )
+    spec = columns(
+        "track_id uuid", "album_id uuid", "track_title text", "track_duration int8", "track_listens int8",
+        "track_favorites int8", "track_interest float8", "track_comments int8", "track_date_created date",
+        "track_composer text", "track_lyricist text", "track_publisher text", "track_number int4",
+        "track_disc_number int4",
+    )
+    return [TableLoad("track", track, spec)], kept
+
+
+def build_track_links(kept: pd.DataFrame, artists: pd.DataFrame, tag_ids: pd.Series, ids: LegacyIds) -> list[TableLoad]:
+    main = pd.DataFrame({"track_id": kept["new_uuid"], "artist_id": kept["artist_uuid"]})
+    album_artist = pd.DataFrame({"album_id": kept["album_uuid"], "artist_id": kept["artist_uuid"]})
+
+    genre_ids = explode_list(kept["track_genres"])
+    track_genre = pd.DataFrame(
+        {
+            "track_id": kept["new_uuid"].loc[genre_ids.index].to_numpy(),
+            "genre_id": ids.lookup("genre", genre_ids).to_numpy(),
+        }
+    )
+
+    track_tags = explode_list(kept["track_tags"])
+    track_tag = pd.DataFrame(
+        {
+            "track_id": kept["new_uuid"].loc[track_tags.index].to_numpy(),
+            "tag_id": tag_ids.reindex(track_tags.to_numpy()).to_numpy(),
+        }
+    )
+    artist_tags = explode_list(artists["tags"])
+    artist_tag = pd.DataFrame(
+        {
+            "artist_id": artists["new_uuid"].loc[artist_tags.index].to_numpy(),
+            "tag_id": tag_ids.reindex(artist_tags.to_numpy()).to_numpy(),
+        }
+    )
+    return [
+        _link("track_artist_main", "track_id", "artist_id", main),
+        _link("album_artist", "album_id", "artist_id", album_artist),
+        _link("track_genre", "track_id", "genre_id", track_genre),
+        _link("track_tag", "track_id", "tag_id", track_tag),
+        _link("artist_tag", "artist_id", "tag_id", artist_tag),
+    ]
+
+
+def build_echonest(data_dir: Path, ids: LegacyIds, kept: pd.DataFrame) -> list[TableLoad]:
+    stg = read_table(data_dir / "clean_echonest.csv", numeric_except=["track_id"])
+    stg["track_uuid"] = ids.lookup("track", stg["track_id"])
+    stg = stg[stg["track_uuid"].notna()]
+
+    audio_cols = ["acousticness", "danceability", "energy", "instrumentalness", "liveness", "speechiness", "tempo", "valence"]
+    audio = stg.drop_duplicates("track_uuid", keep="last")[["track_uuid", *audio_cols]].rename(columns={"track_uuid": "track_id"})
+
+    rank_track = stg.drop_duplicates("track_uuid")[["track_uuid", "song_currency_rank", "song_hotttnesss_rank"]]
+    rank_track.columns = ["track_id", "rank_song_currency", "rank_song_hotttnesss"]
+
+    main_artist = kept.set_index("new_uuid")["artist_uuid"]
+    ranks = stg[stg["artist_discovery_rank"].notna()]
+    rank_artist = pd.DataFrame(
+        {
+            "artist_id": main_artist.reindex(ranks["track_uuid"].to_numpy()).to_numpy(),
+            "rank_artist_discovery": ranks["artist_discovery_rank"].to_numpy(),
+            "rank_artist_familiarity": ranks["artist_familiarity_rank"].to_numpy(),
+            "rank_artist_hotttnesss": ranks["artist_hotttnesss_rank"].to_numpy(),
+        }
+    )
+    # ON CONFLICT DO NOTHING sur (artist_id, ranks_date) : une ligne par artiste
+    rank_artist = rank_artist.dropna(subset=["artist_id"]).drop_duplicates("artist_id")
+
+    return [
+        TableLoad(
+            "audio_feature",
+            audio,
+            [Column("track_id", "uuid"), *(Column(name, "float8") for name in audio_cols)],
+            upsert_key=("track_id",),
+        ),
+        TableLoad("rank_track", rank_track, columns("track_id uuid", "rank_song_currency int8", "rank_song_hotttnesss int8")),
+        TableLoad(
+            "rank_artist",
+            rank_artist,
+            columns(
+                "artist_id uuid", "rank_artist_discovery int8", "rank_artist_familiarity int8",
+                "rank_artist_hotttnesss int8",
+            ),
+        ),
+    ]
+
+
+def build_temporal(data_dir: Path, ids: LegacyIds) -> TableLoad:
+    stg = read_table(data_dir / "clean_features.csv", numeric_except=["track_id"])
+    stg["track_id"] = ids.lookup("track", stg["track_id"])
+    stg = stg[stg["track_id"].notna()].drop_duplicates("track_id", keep="last")
+    # Même nommage que 7_temporal_features.sql : les points sont retirés
+    stg.columns = [name.replace(".", "") for name in stg.columns]
+    feature_cols = [name for name in stg.columns if name != "track_id"]
+    spec = [Column("track_id", "uuid"), *(Column(name, "float8") for name in feature_cols)]
+    return TableLoad("temporal_feature", stg, spec, upsert_key=("track_id",))
+
+
+def pack_temporal(temporal: TableLoad) -> list[TableLoad]:
+    """Même contenu que `temporal_feature`, en un blob float32 little-endian par piste.
+
+    Le manifeste donne le nom de chaque position ; la lecture côté recommandeurs
+    devient un simple `np.frombuffer` sur les blobs concaténés.
+    """
+    names = [column.name for column in temporal.spec if column.name != "track_id"]
+    matrix = np.ascontiguousarray(temporal.frame[names].to_numpy(dtype="<f4"))
+    data, width = matrix.tobytes(), matrix.shape[1] * 4
+    packed = pd.DataFrame(
+        {
+            "track_id": temporal.frame["track_id"].to_numpy(),
+            "features": [data[i:i + width] for i in range(0, len(data), width)],
+        }
+    )
+    manifest = pd.DataFrame({"position": np.arange(len(names)), "column_name": names})
+    return [
+        TableLoad("temporal_feature_manifest", manifest, columns("position int4", "column_name text")),
+        TableLoad("temporal_feature_packed", packed, columns("track_id uuid", "features bytea"), upsert_key=("track_id",)),
+    ]
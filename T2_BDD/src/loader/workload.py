@@ -0,0 +1,257 @@
+"""Requêtes émises par les recommandeurs T3, rejouées par `index_advisor.py`.
+
+Les requêtes que T3 expose en constantes (`*_QUERY`) sont importées de leur module :
+index_advisor rejoue exactement leur texte. Les autres reprennent le texte du module
+indiqué dans `source` (mêmes jointures, mêmes filtres). Les paramètres sont nommés ;
+les valeurs d'exemple sont choisies dans la base au moment de l'analyse. Garder cette
+liste alignée avec T3 quand une requête y est ajoutée.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Union
+
+T3_SRC = Path(__file__).resolve().parents[3] / "T3_Recommandation" / "src"
+# db_pool.py (T3_Recommandation/src) et vector_index.py (user_based) sont importés par les modules T3
+for _path in (T3_SRC, T3_SRC / "user_based"):
+    if str(_path) not in sys.path:
+        sys.path.append(str(_path))
+
+from item_based_song_user.utils.catalog_stream import catalog_query  # noqa: E402
+from item_based_song_user.utils.track_catalog import TRACK_CATALOG_QUERY, catalog_source  # noqa: E402
+from popularity_cache import (  # noqa: E402
+    GENRE_PREFERENCE_COUNTS_QUERY,
+    GENRE_TOP_QUERY,
+    GENRE_TRACKS_QUERY,
+    GLOBAL_TOP_QUERY,
+)
+from similar_users import GRAPH_SIMILAR_USERS_QUERY, LIVE_SIMILAR_USERS_QUERY, SIMILAR_USERS_K  # noqa: E402
+from user_based import (  # noqa: E402
+    GET_CLOSEST_USERS_BATCH_QUERY,
+    GET_LISTENED_TRACKS_BATCH_QUERY,
+    MAX,
+    RECOMMEND_TOP_TRACKS_QUERY,
+    TOP,
+)
+
+
+@dataclass(frozen=True)
+class Probe:
+    name: str
+    source: str
+    # Texte de la requête, ou fonction qui le construit sur la connexion (colonnes lues dans la base)
+    sql: Union[str, Callable[..., str]]
+
+    def text(self, conn) -> str:
+        return self.sql(conn) if callable(self.sql) else self.sql
+
+
+def _streamed_catalog(temporal_storage: str) -> Callable[..., str]:
+    """SELECT de catalog_stream.stream_catalog, sur la même source que get_all_tracks_data."""
+
+    def build(conn) -> str:
+        return catalog_query(conn, catalog_source(conn), temporal_storage)[2]
+
+    return build
+
+
+def _named(sql: str, *names: str) -> str:
+    """Remplace les `%s` positionnels d'une requête T3, dans l'ordre, par des paramètres nommés."""
+    if sql.count("%s") != len(names):
+        raise ValueError(f"{sql.count('%s')} placeholders, {len(names)} names: {names}")
+    placeholders = iter(names)
+    return re.sub(r"%s", lambda _: f"%({next(placeholders)})s", sql)
+
+
+# Les sondes sont rejouées dans l'ordre, dans une même transaction annulée à la fin.
+WORKLOAD: tuple[Probe, ...] = (
+    Probe(
+        "song_user.listen_history",
+        "item_based_song_user/utils/data_loader.py:get_user_listen_history",
+        "SELECT track_id, count FROM track_user_listen WHERE account_id = %(account_id)s",
+    ),
+    Probe(
+        "song_user.catalog_inline",
+        "item_based_song_user/utils/track_catalog.py:TRACK_CATALOG_QUERY",
+        TRACK_CATALOG_QUERY,
+    ),
+    Probe(
+        "song_user.catalog_columns",
+        "item_based_song_user/utils/catalog_stream.py:catalog_query",
+        _streamed_catalog("columns"),
+    ),
+    Probe(
+        "song_user.catalog_packed",
+        "item_based_song_user/utils/catalog_stream.py:catalog_query",
+        _streamed_catalog("packed"),
+    ),
+    Probe(
+        "audio.catalog_view",
+        "item_based_audio/utils/data_loader.py:get_all_tracks_data",
+        """
+    SELECT track_id, track_title, acousticness, danceability, energy, instrumentalness,
+           liveness, speechiness, tempo, valence, genres, tags, artists, album_title
+    FROM mv_track_features
+    """,
+    ),
+    Probe(
+        "user_based.closest_users",
+        "user_based/user_based.py:GET_CLOSEST_USERS_BATCH_QUERY",
+        _named(GET_CLOSEST_USERS_BATCH_QUERY, "neighbours", "account_ids"),
+    ),
+    Probe(
+        "user_based.listened_tracks",
+        "user_based/user_based.py:GET_LISTENED_TRACKS_BATCH_QUERY",
+        _named(GET_LISTENED_TRACKS_BATCH_QUERY, "account_ids"),
+    ),
+    Probe(
+        "user_based.top_tracks",
+        "user_based/user_based.py:RECOMMEND_TOP_TRACKS_QUERY",
+        RECOMMEND_TOP_TRACKS_QUERY,
+    ),
+    Probe(
+        "profile.target_profile",
+        "user_based_user_profile.py:fetch_target_profile",
+        "SELECT age_range, gender FROM preference WHERE account_id = %(account_id)s",
+    ),
+    Probe(
+        "profile.target_genres",
+        "user_based_user_profile.py:fetch_target_profile",
+        """
+    SELECT g.genre_id, g.title
+    FROM genre_preference gp
+    JOIN genre g ON g.genre_id = gp.genre_id
+    WHERE gp.account_id = %(account_id)s
+    """,
+    ),
+    Probe(
+        "profile.similar_users",
+        "similar_users.py:GRAPH_SIMILAR_USERS_QUERY",
+        _named(GRAPH_SIMILAR_USERS_QUERY, "account_id"),
+    ),
+    Probe(
+        "profile.similar_users_live",
+        "similar_users.py:LIVE_SIMILAR_USERS_QUERY",
+        LIVE_SIMILAR_USERS_QUERY,
+    ),
+    Probe(
+        "profile.scored_tracks",
+        "user_based_user_profile.py:recommend_for_user",
+        """
+    WITH sim(account_id, score) AS (
+        SELECT * FROM unnest(%(similar_ids)s::uuid[], %(similar_scores)s::int[])
+    )
+    SELECT tr.track_id, tr.track_title, SUM(l.count * GREATEST(sim.score, 1)) AS total_score
+    FROM track_user_listen l
+    JOIN sim ON sim.account_id = l.account_id
+    JOIN track tr ON tr.track_id = l.track_id
+    LEFT JOIN track_genre tg ON tg.track_id = tr.track_id
+    WHERE tr.track_id NOT IN (
+        SELECT track_id FROM track_user_listen WHERE account_id = %(account_id)s
+    )
+    AND tg.genre_id = ANY(%(genre_ids)s::uuid[])
+    GROUP BY tr.track_id, tr.track_title
+    HAVING SUM(l.count * GREATEST(sim.score, 1)) > 0
+    ORDER BY total_score DESC
+    LIMIT %(limit)s
+    """,
+    ),
+    Probe(
+        "profile.popularity_global",
+        "popularity_cache.py:GLOBAL_TOP_QUERY",
+        _named(GLOBAL_TOP_QUERY, "depth"),
+    ),
+    Probe(
+        "profile.popularity_by_genre",
+        "popularity_cache.py:GENRE_TOP_QUERY",
+        _named(GENRE_TOP_QUERY, "depth"),
+    ),
+    Probe(
+        "profile.genre_tracks",
+        "popularity_cache.py:GENRE_TRACKS_QUERY",
+        GENRE_TRACKS_QUERY,
+    ),
+    Probe(
+        "profile.genre_pref_counts",
+        "popularity_cache.py:GENRE_PREFERENCE_COUNTS_QUERY",
+        GENRE_PREFERENCE_COUNTS_QUERY,
+    ),
+    Probe(
+        "nn_listens.tracks",
+        "neural_network_listens/data_loader.py:load_tracks",
+        """
+    WITH latest_rank AS (
+        SELECT track_id, rank_song_hotttnesss, rank_song_currency,
+               ROW_NUMBER() OVER (PARTITION BY track_id ORDER BY ranks_date DESC) AS rn
+        FROM rank_track
+    )
+    SELECT t.track_id, t.track_duration, t.track_number, t.track_disc_number, t.track_favorites,
+           t.track_interest, t.track_comments, t.track_date_created, t.track_listens,
+           lr.rank_song_hotttnesss, lr.rank_song_currency
+    FROM track t
+    LEFT JOIN latest_rank lr ON lr.track_id = t.track_id AND lr.rn = 1
+    """,
+    ),
+    Probe(
+        "nn_listens.track_by_id",
+        "neural_network_listens/data_loader.py:load_track_by_id",
+        """
+    SELECT track_id, track_duration, track_number, track_disc_number, track_favorites,
+           track_interest, track_comments, track_date_created, track_listens
+    FROM track
+    WHERE track_id = %(track_id)s
+    """,
+    ),
+)
+
+# Paramètres fixes, aux valeurs par défaut des modules T3
+DEFAULT_PARAMETERS = {
+    "limit": TOP,
+    "top": TOP,
+    "neighbours": MAX,
+    "k": SIMILAR_USERS_K,
+    "depth": 200,  # POPULARITY_CACHE_DEPTH
+}
+
+# Paramètres d'exemple : l'auditeur le plus actif est le pire cas des filtres par compte
+SAMPLE_QUERIES = {
+    "account_id": """
+        SELECT u.account_id
+        FROM "user" u
+        LEFT JOIN track_user_listen l ON l.account_id = u.account_id
+        GROUP BY u.account_id
+        ORDER BY count(l.track_id) DESC, u.account_id
+        LIMIT 1
+    """,
+    "track_id": "SELECT track_id FROM track ORDER BY track_id LIMIT 1",
+    # Lot des recommandations user_based : l'auditeur d'exemple et 99 autres comptes vectorisés
+    "account_ids": """
+        SELECT array_agg(account_id)
+        FROM (
+            SELECT account_id FROM preference_vector
+            ORDER BY account_id <> %(account_id)s, account_id
+            LIMIT 100
+        ) batch
+    """,
+    # Même lot, sous le nom de RECOMMEND_TOP_TRACKS_QUERY
+    "user_ids": "SELECT %(account_ids)s::uuid[]",
+    "genre_ids": """
+        SELECT COALESCE(array_agg(genre_id), ARRAY[]::uuid[])
+        FROM genre_preference
+        WHERE account_id = %(account_id)s
+    """,
+    # Voisins précalculés de l'auditeur d'exemple (vides si similar_users.py n'a pas tourné)
+    "similar_ids": """
+        SELECT COALESCE(array_agg(similar_account_id ORDER BY rank), ARRAY[]::uuid[])
+        FROM similar_user
+        WHERE account_id = %(account_id)s
+    """,
+    "similar_scores": """
+        SELECT COALESCE(array_agg(score::int ORDER BY rank), ARRAY[]::int[])
+        FROM similar_user
+        WHERE account_id = %(account_id)s
+    """,
+}
@@ -0,0 +1,20 @@
+-- Migration 001 : index des requetes des recommandeurs (T3)
+-- Proposes par T2_BDD/src/loader/index_advisor.py ; idempotent, applicable sur une base deja peuplee :
+--   psql -f T2_BDD/src/sql/migrations/001_recommender_indexes.sql
+
+-- Historique d'ecoute par utilisateur : la cle primaire (track_id, account_id) ne sert pas
+-- les filtres sur account_id seul (historique, NOT IN des titres deja ecoutes).
+-- INCLUDE permet un parcours d'index seul pour get_user_listen_history.
+CREATE INDEX IF NOT EXISTS idx_track_user_listen_account_id
+    ON track_user_listen (account_id) INCLUDE (track_id, count);
+
+-- Dernier rang par piste (ROW_NUMBER() OVER (PARTITION BY track_id ORDER BY ranks_date DESC))
+-- lu dans l'ordre de l'index, sans tri.
+CREATE INDEX IF NOT EXISTS idx_rank_track_track_id_ranks_date
+    ON rank_track (track_id, ranks_date DESC) INCLUDE (rank_song_hotttnesss, rank_song_currency);
+
+-- Plus proches voisins par distance cosinus (embedding <=> ...) : index approche HNSW (pgvector >= 0.5)
+CREATE INDEX IF NOT EXISTS idx_preference_vector_embedding_hnsw
+    ON preference_vector USING hnsw (embedding vector_cosine_ops);
+
+-- track_genre et track_tag sont joints par track_id : leur cle primaire (track_id, ...) les couvre deja.
@@ -0,0 +1,7 @@
+-- Migration 002 : empreinte de la ligne preference d'ou vient chaque vecteur
+-- Idempotent, applicable sur une base deja peuplee :
+--   psql -f T2_BDD/src/sql/migrations/002_preference_vector_source.sql
+
+-- md5(preference::text) au moment du calcul : populate_vectors.py --incremental ne recalcule
+-- que les comptes dont la ligne preference a change (ou qui n'ont pas encore de vecteur).
+ALTER TABLE preference_vector ADD COLUMN IF NOT EXISTS source_hash TEXT;
@@ -0,0 +1,16 @@
+-- Migration 003 : graphe des utilisateurs similaires (user_based_user_profile.py)
+-- Idempotent, applicable sur une base deja peuplee :
+--   psql -f T2_BDD/src/sql/migrations/003_similar_user.sql
+-- Rempli par T3_Recommandation/src/similar_users.py (K voisins par compte, recalcul complet).
+
+-- Pas de cle etrangere vers preference : le graphe est reecrit en entier a chaque calcul
+-- (~1M lignes pour K = 50), et la verification ligne a ligne quadruplait la duree du COPY.
+-- Un compte supprime depuis le dernier calcul n'a plus d'ecoutes : ses lignes ne comptent pas.
+CREATE TABLE IF NOT EXISTS similar_user (
+    account_id UUID,
+    similar_account_id UUID NOT NULL,
+    score SMALLINT NOT NULL,
+    -- 1 pour le plus proche : la cle primaire sert la lecture des voisins d'un compte dans l'ordre
+    rank SMALLINT,
+    PRIMARY KEY (account_id, rank)
+);
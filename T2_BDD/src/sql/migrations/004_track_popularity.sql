@@ -0,0 +1,29 @@
+-- Migration 004 : popularite des pistes, pour les fallbacks de user_based_user_profile.py
+-- Idempotent, applicable sur une base deja peuplee :
+--   psql -f T2_BDD/src/sql/migrations/004_track_popularity.sql
+-- Rafraichie avec les autres vues (T2_BDD/src/loader/refresh_views.py) ; T3 en garde
+-- les listes globale et par genre en memoire (T3_Recommandation/src/popularity_cache.py).
+
+/*
+  Nombre total d'ecoutes par piste (0 pour une piste jamais ecoutee) : le fallback
+  n'agrege plus track_user_listen a chaque recommandation sans voisin.
+*/
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_track_popularity AS
+WITH listens AS (
+    SELECT track_id, SUM(count) AS listens
+    FROM track_user_listen
+    GROUP BY track_id
+)
+SELECT
+    t.track_id,
+    t.track_title,
+    COALESCE(l.listens, 0) AS listens
+FROM track t
+LEFT JOIN listens l ON l.track_id = t.track_id;
+
+-- Index unique requis par REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_track_popularity_track_id ON mv_track_popularity (track_id);
+
+-- Classement global lu dans l'ordre de l'index (ORDER BY listens DESC, track_id LIMIT n)
+CREATE INDEX IF NOT EXISTS idx_mv_track_popularity_listens
+    ON mv_track_popularity (listens DESC, track_id);
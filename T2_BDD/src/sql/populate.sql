@@ -9,3 +9,4 @@
 \i T2_BDD/src/sql/populate/7_temporal_features.sql
 \i T2_BDD/src/sql/populate/8_users.sql
 \i T2_BDD/src/sql/populate/9_cleanup.sql
+\i T2_BDD/src/sql/populate/10_refresh_views.sql
@@ -0,0 +1,5 @@
+-- ====================================================================================
+-- RAFRAICHISSEMENT DES VUES MATERIALISEES
+-- ====================================================================================
+REFRESH MATERIALIZED VIEW mv_track_features;
+REFRESH MATERIALIZED VIEW mv_track_popularity;
@@ -4,3 +4,8 @@
 \i T2_BDD/src/sql/schema/2_views.sql
 \i T2_BDD/src/sql/schema/3_functions.sql
 \i T2_BDD/src/sql/schema/4_triggers.sql
+\i T2_BDD/src/sql/schema/5_materialized_views.sql
+\i T2_BDD/src/sql/migrations/001_recommender_indexes.sql
+\i T2_BDD/src/sql/migrations/002_preference_vector_source.sql
+\i T2_BDD/src/sql/migrations/003_similar_user.sql
+\i T2_BDD/src/sql/migrations/004_track_popularity.sql
@@ -89,6 +89,21 @@ CREATE TABLE temporal_feature (
     FOREIGN KEY (track_id) REFERENCES track(track_id)
 );
 
+-- Stockage compact des caracteristiques temporelles : un vecteur float32 little-endian par piste,
+-- l'ordre des valeurs est donne par temporal_feature_manifest
+CREATE TABLE temporal_feature_packed (
+    track_id UUID,
+    features BYTEA NOT NULL,
+    PRIMARY KEY (track_id),
+    FOREIGN KEY (track_id) REFERENCES track(track_id)
+);
+
+CREATE TABLE temporal_feature_manifest (
+    position INTEGER,
+    column_name VARCHAR(255) NOT NULL,
+    PRIMARY KEY (position)
+);
+
 CREATE TABLE tag (
     tag_id UUID DEFAULT uuid_generate_v4(),
     tag_name VARCHAR(255),
@@ -86,6 +86,7 @@ BEGIN
     DELETE FROM rank_track WHERE track_id = OLD.track_id;
     DELETE FROM audio_feature WHERE track_id = OLD.track_id;
     DELETE FROM temporal_feature WHERE track_id = OLD.track_id;
+    DELETE FROM temporal_feature_packed WHERE track_id = OLD.track_id;
 
     -- Décrémenter album_tracks_count
     IF OLD.album_id IS NOT NULL THEN
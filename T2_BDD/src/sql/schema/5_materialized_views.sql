@@ -0,0 +1,54 @@
+-- ====================================================================================
+-- VUES MATERIALISEES
+-- ====================================================================================
+
+/*
+  Catalogue des pistes pour les recommandeurs : champs texte agreges et
+  caracteristiques audio, une ligne par piste. Evite de refaire les trois
+  string_agg a chaque recommandation ; a rafraichir apres un chargement
+  (T2_BDD/src/loader/refresh_views.py).
+*/
+CREATE MATERIALIZED VIEW mv_track_features AS
+WITH track_genres AS (
+    SELECT tg.track_id, string_agg(DISTINCT g.title, ' ') AS genres
+    FROM track_genre tg
+    JOIN genre g ON g.genre_id = tg.genre_id
+    GROUP BY tg.track_id
+),
+track_tags AS (
+    SELECT tt.track_id, string_agg(DISTINCT tag.tag_name, ' ') AS tags
+    FROM track_tag tt
+    JOIN tag ON tag.tag_id = tt.tag_id
+    GROUP BY tt.track_id
+),
+track_artists AS (
+    SELECT tam.track_id, string_agg(DISTINCT a.name, ' ') AS artists
+    FROM track_artist_main tam
+    JOIN artist art ON art.artist_id = tam.artist_id
+    JOIN account a ON a.account_id = art.artist_id
+    GROUP BY tam.track_id
+)
+SELECT
+    t.track_id,
+    t.track_title,
+    COALESCE(tg.genres, '') AS genres,
+    COALESCE(tt.tags, '') AS tags,
+    COALESCE(ta.artists, '') AS artists,
+    COALESCE(alb.album_title, '') AS album_title,
+    af.acousticness,
+    af.danceability,
+    af.energy,
+    af.instrumentalness,
+    af.liveness,
+    af.speechiness,
+    af.tempo,
+    af.valence
+FROM track t
+LEFT JOIN audio_feature af ON af.track_id = t.track_id
+LEFT JOIN track_genres tg ON tg.track_id = t.track_id
+LEFT JOIN track_tags tt ON tt.track_id = t.track_id
+LEFT JOIN track_artists ta ON ta.track_id = t.track_id
+LEFT JOIN album alb ON alb.album_id = t.album_id;
+
+-- Index unique requis par REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX idx_mv_track_features_track_id ON mv_track_features (track_id);
@@ -0,0 +1,184 @@
+"""Pool de connexions PostgreSQL partagé par tous les recommandeurs T3.
+
+Une seule poignée de main TCP + authentification par connexion du pool, au lieu d'une
+par appel. `get_db_connection()` renvoie une connexion empruntée : `conn.close()` la
+rend au pool (les appelants existants n'ont rien à changer), `pooled_connection()` fait
+de même en context manager.
+
+Configuration (variables d'environnement, `.env` à la racine du projet) :
+- PGDB_HOST, PGDB_PORT, DB_NAME, DB_USER, DB_ROOT_PASSWORD : comme avant ;
+- DB_POOL_MIN / DB_POOL_MAX : connexions ouvertes au départ / au plus (1 / 8) ;
+- DB_POOL_PING_AFTER : au-delà de ce nombre de secondes d'inactivité, une connexion
+  est vérifiée (`SELECT 1`) avant d'être prêtée, et remplacée si le serveur l'a perdue (30) ;
+- DB_POOL_TIMEOUT : attente maximale d'une connexion libre quand le pool est plein (30).
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+ROOT_ENV = Path(__file__).resolve().parents[2] / ".env"
+
+_pool: Optional["SharedPool"] = None
+_pool_lock = threading.Lock()
+_engine = None
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connexion dont `close()` la rend au pool tant qu'elle est empruntée."""
+
+    _pool: Optional["SharedPool"] = None
+    _borrowed = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self._borrowed and self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+
+class SharedPool:
+    def __init__(self, minconn: int, maxconn: int, ping_after: float, timeout: float, **params):
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self._pool = ThreadedConnectionPool(minconn, maxconn, connection_factory=PooledConnection, **params)
+        # psycopg2 ferme toute connexion rendue au-delà de minconn : on garde jusqu'à maxconn ouvertes
+        self._pool.minconn = maxconn
+        # ThreadedConnectionPool lève une erreur quand il est plein : on fait attendre à la place
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self) -> PooledConnection:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError(f"no free connection after {self.timeout:.0f}s")
+        try:
+            # Au pire toutes les connexions inactives sont mortes (redémarrage du serveur)
+            for _ in range(self._pool.maxconn + 1):
+                conn = self._pool.getconn()
+                if self._healthy(conn):
+                    conn._pool = self
+                    conn._borrowed = True
+                    return conn
+                self._pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("no healthy connection available in the pool")
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: PooledConnection) -> None:
+        conn._borrowed = False
+        conn.last_used = time.monotonic()
+        try:
+            if self._pool.closed:
+                conn.close()
+            else:
+                # Le pool annule une transaction restée ouverte et ferme une connexion cassée
+                self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def closeall(self) -> None:
+        if not self._pool.closed:
+            # closeall() appelle close() sur les connexions prêtées : elles doivent vraiment se fermer
+            for conn in list(self._pool._used.values()):
+                conn._borrowed = False
+            self._pool.closeall()
+
+
+def connection_params() -> dict:
+    return {
+        "host": os.getenv("PGDB_HOST", "localhost"),
+        "port": os.getenv("PGDB_PORT", "5432"),
+        "dbname": os.getenv("DB_NAME", "sae5idfou"),
+        "user": os.getenv("DB_USER", "idfou"),
+        "password": os.getenv("DB_ROOT_PASSWORD"),
+    }
+
+
+def get_pool(env_path: Optional[str | Path] = None) -> SharedPool:
+    """Crée le pool au premier appel (le `.env` lu ensuite n'a plus d'effet)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                load_dotenv(dotenv_path=env_path or ROOT_ENV)
+                _pool = SharedPool(
+                    int(os.getenv("DB_POOL_MIN", "1")),
+                    int(os.getenv("DB_POOL_MAX", "8")),
+                    float(os.getenv("DB_POOL_PING_AFTER", "30")),
+                    float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                    **connection_params(),
+                )
+    return _pool
+
+
+def get_db_connection(env_path: Optional[str | Path] = None):
+    """Connexion empruntée au pool (None si la base est injoignable, comme avant)."""
+    try:
+        return get_pool(env_path).acquire()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+        return None
+
+
+@contextmanager
+def pooled_connection(env_path: Optional[str | Path] = None) -> Iterator[PooledConnection]:
+    """Context manager : la connexion est rendue au pool en sortie, erreurs comprises."""
+    conn = get_pool(env_path).acquire()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_sqlalchemy_engine(env_path: Optional[str | Path] = None):
+    """Engine SQLAlchemy adossé au même pool (NullPool : SQLAlchemy ne garde rien, close() rend au pool)."""
+    global _engine
+    if _engine is None:
+        import sqlalchemy as sa
+        from sqlalchemy.pool import NullPool
+
+        pool = get_pool(env_path)
+        _engine = sa.create_engine("postgresql+psycopg2://", creator=pool.acquire, poolclass=NullPool)
+    return _engine
+
+
+def close_pool() -> None:
+    global _pool, _engine
+    with _pool_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+atexit.register(close_pool)
@@ -2,31 +2,54 @@
 
 This variant exposes `audio_weight` and `random_noise` to influence the final score.
 """
+from dataclasses import dataclass
 from typing import List, Dict, Optional
 import numpy as np
+import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
 
 from .utils.data_loader import get_all_tracks_data
 from .utils.feature_processing import prepare_features, transform_single_track
 
 
-def recommend_for_track(payload_or_track_id: object, n: int = 10, audio_weight: float = 0.5, random_noise: float = 0.0, random_seed: Optional[int] = None) -> List[Dict]:
+@dataclass
+class TrackModel:
+    """Catalog and fitted vectorizers/scaler; read-only once built, so it can be shared between calls."""
+    df_indexed: pd.DataFrame
+    matrices: Dict[str, object]
+    track_index: List[str]
+    preprocessors: Dict
+
+
+def load_track_model(df: Optional[pd.DataFrame] = None) -> Optional[TrackModel]:
+    """Load the catalog (unless given) and fit the features; None when no track is available."""
+    if df is None:
+        df = get_all_tracks_data()
+    if df.empty:
+        return None
+    matrices, track_index, preprocessors = prepare_features(df)
+    return TrackModel(df.set_index('track_id'), matrices, track_index, preprocessors)
+
+
+def recommend_for_track(payload_or_track_id: object, n: int = 10, audio_weight: float = 0.5, random_noise: float = 0.0, random_seed: Optional[int] = None, model: Optional[TrackModel] = None) -> List[Dict]:
     """Given a payload dict describing a single track or a track_id present in DB, return recs.
 
     Parameters:
       audio_weight: weight for audio similarity in final score (between 0 and 1).
       random_noise: standard deviation of Gaussian noise added to final scores (0 = no noise).
       random_seed: optional seed for reproducible randomness.
+      model: a TrackModel from load_track_model(), reused instead of reloading and refitting.
     """
     if not (0.0 <= audio_weight <= 1.0):
         raise ValueError('audio_weight must be between 0 and 1')
 
-    df = get_all_tracks_data()
-    if df.empty:
-        return []
+    if model is None:
+        model = load_track_model()
+        if model is None:
+            return []
 
-    matrices, track_index, preprocessors = prepare_features(df)
-    df_indexed = df.set_index('track_id')
+    matrices, track_index, preprocessors = model.matrices, model.track_index, model.preprocessors
+    df_indexed = model.df_indexed
 
     single = None
     input_id = None
@@ -38,7 +61,9 @@ def recommend_for_track(payload_or_track_id: object, n: int = 10, audio_weight:
                 'album_title': row.get('album_title', ''), 'track_title': row.get('track_title', '')
             }
             for c in preprocessors.get('numeric_cols', []):
-                payload[c] = row.get(c, 0.0)
+                # Same fill as prepare_features: a track without audio features scales from 0
+                value = row.get(c, 0.0)
+                payload[c] = 0.0 if pd.isna(value) else value
             input_id = payload_or_track_id
             single = transform_single_track(payload, preprocessors)
         else:
@@ -5,10 +5,13 @@ import pandas as pd
 
 try:
     from item_based_song_user.utils.db_connexion import get_db_connection
+    from item_based_song_user.utils.track_catalog import TRACK_FEATURES_VIEW, has_track_features_view
 except Exception:
     def get_db_connection():
         return None
 
+AUDIO_COLUMNS = ['acousticness', 'danceability', 'energy', 'instrumentalness', 'liveness', 'speechiness', 'tempo', 'valence']
+
 
 def get_all_tracks_data() -> pd.DataFrame:
    
@@ -57,6 +60,12 @@ def get_all_tracks_data() -> pd.DataFrame:
             LEFT JOIN track_artists ta ON ta.track_id = t.track_id
             LEFT JOIN album alb ON alb.album_id = t.album_id;
             """
+            if has_track_features_view(conn):
+                # Meme colonnes, en une seule lecture sequentielle de la vue materialisee
+                query = f"""
+                SELECT track_id, track_title, {', '.join(AUDIO_COLUMNS)}, genres, tags, artists, album_title
+                FROM {TRACK_FEATURES_VIEW};
+                """
             df = pd.read_sql_query(query, conn)
             df = df.loc[:, ~df.columns.duplicated()]
             return df
@@ -75,8 +84,7 @@ def get_all_tracks_data() -> pd.DataFrame:
                 # Keep only relevant columns if present
                 keep = ['track_id', 'track_title', 'genres', 'tags', 'artists', 'album_title']
                 # audio cols might be present under audio_feature or top-level
-                audio_cols = ['acousticness','danceability','energy','instrumentalness','liveness','speechiness','tempo','valence']
-                for c in audio_cols:
+                for c in AUDIO_COLUMNS:
                     if c in df.columns and c not in keep:
                         keep.append(c)
                 df = df[[c for c in keep if c in df.columns]]
@@ -3,19 +3,21 @@ import os
 import argparse
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 # Add parent directory to path to allow importing from utils
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from utils.data_loader import get_user_listen_history, get_all_tracks_data
-from utils.feature_processing import prepare_features
+from utils.data_loader import get_user_listen_history
+from utils.feature_store import load_track_features
+from utils.similarity import component_weight_type
 from utils.env_loader import load_env_file
 
-def recommend_tracks(user_id, n_recommendations=10):
-    load_env_file()
+# Define components to use for Mk1 (Text/Metadata only)
+COMPONENTS = ['genres', 'tags', 'artists', 'albums', 'titles']
+
+def recommend_tracks(user_id, n_recommendations=10, component_weights=None, features=None):
     print(f"Starting recommendation for User: {user_id}")
     
     # 1. Load Data
@@ -28,39 +30,29 @@ def recommend_tracks(user_id, n_recommendations=10):
         print("User has no listening history. Cannot compute item-based recommendations.")
         return []
     
-    print("Loading all tracks data...")
-    tracks_df = get_all_tracks_data()
-    print(f"Loaded {len(tracks_df)} tracks from database.")
+    # 2. Load Features (fitted once per catalog version, see utils/feature_store.py),
+    # unless the caller keeps them loaded (recommendation_service.py)
+    print("Loading track features...")
+    if features is None:
+        features = load_track_features()
     
-    if tracks_df.empty:
+    if features is None:
         print("No tracks found in database.")
         return []
-        
-    # 2. Prepare Features
-    print("Vectorizing features...")
-    # Now returns a dict of matrices and the index
-    feature_matrices, track_index = prepare_features(tracks_df)
-    
-    if not feature_matrices:
-        print("Failed to prepare features.")
-        return []
+    print(f"Loaded {len(features)} tracks ({features.origin}).")
+    feature_matrices, track_index = features.matrices, features.track_ids
 
     # Map track_id to matrix index
     id_to_idx = {tid: i for i, tid in enumerate(track_index)}
     tracks_index_list = list(track_index)
-    
-    if 'track_id' in tracks_df.columns:
-        tracks_df = tracks_df.set_index('track_id')
         
-    # 3. Create User Profile & Compute Similarity per Component
-    print("Computing similarities per component...")
+    # 3. Create User Profile per Component
+    print("Building user profiles per component...")
     
-    # Define components to use for Mk1 (Text/Metadata only)
-    components = ['genres', 'tags', 'artists', 'albums', 'titles']
-    valid_components = []
+    components = COMPONENTS
     
     # Store similarities for each component
-    component_similarities = []
+    profiles = {}
     
     # Identify user indices and weights once
     user_indices = []
@@ -96,21 +88,16 @@ def recommend_tracks(user_id, n_recommendations=10):
         
         # Safe dot product for sparse
         user_profile = user_track_vectors.T.dot(weights) # result is (n_features,)
-        user_profile = user_profile.reshape(1, -1)
-        
-        # Compute Cosine Similarity
-        # (1, F) vs (N, F) -> (1, N)
-        sim = cosine_similarity(user_profile, matrix).flatten()
-        component_similarities.append(sim)
-        valid_components.append(comp)
+        profiles[comp] = user_profile
 
-    if not component_similarities:
+    if not profiles:
         print("No valid feature components found.")
         return []
         
     # 4. Average Similarity
-    print(f"Averaging scores from: {', '.join(valid_components)}")
-    final_similarity = np.mean(component_similarities, axis=0) # Average across components
+    # One mat-vec over the stacked, L2-normalized components (utils/similarity.py)
+    print(f"Averaging scores from: {', '.join(profiles)}")
+    final_similarity = features.combined.score(profiles, component_weights)
     
     # 5. Rank and Filter
     sorted_indices = final_similarity.argsort()[::-1]
@@ -126,14 +113,11 @@ def recommend_tracks(user_id, n_recommendations=10):
             continue
             
         score = final_similarity[idx]
-        # Retrieve metadata
-        # tracks_df index is track_id
-        track_info = tracks_df.loc[track_id]
         
         rec = {
             'track_id': track_id,
-            'title': track_info['track_title'],
-            'artist': track_info['artists'],
+            'title': features.titles[idx],
+            'artist': features.artists[idx],
             'score': float(score)
         }
         recommendations.append(rec)
@@ -148,11 +132,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Item-Based Music Recommendation Mk1")
     parser.add_argument("user_id", type=str, help="UUID of the user")
     parser.add_argument("--n", type=int, default=10, help="Number of recommendations")
+    parser.add_argument("--weight", action="append", type=component_weight_type(COMPONENTS), metavar="COMPONENT=WEIGHT",
+                        help="Weight of a component in the averaged score (default 1), e.g. --weight genres=2")
     
     args = parser.parse_args()
+    load_env_file()
     
     try:
-        recs = recommend_tracks(args.user_id, args.n)
+        recs = recommend_tracks(args.user_id, args.n, dict(args.weight or []))
         
         print("\n" + "="*50)
         print(f"Top {len(recs)} Recommendations for User {args.user_id}")
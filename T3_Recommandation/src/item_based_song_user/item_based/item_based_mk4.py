@@ -10,12 +10,12 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir) # item_based_song_user
 sys.path.append(parent_dir)
 
-from utils.data_loader import get_user_listen_history, get_all_tracks_data
-from utils.feature_processing import prepare_features
+from utils.data_loader import get_user_listen_history
+from utils.feature_store import load_track_features
+from utils.similarity import individual_feature_similarity
 from utils.env_loader import load_env_file
 
-def recommend_tracks(user_id, n_recommendations=10):
-    load_env_file()
+def recommend_tracks(user_id, n_recommendations=10, features=None):
     print(f"Starting recommendation (Mk4 - Individual Feature Similarity) for User: {user_id}")
     
     # 1. Load Data
@@ -28,28 +28,21 @@ def recommend_tracks(user_id, n_recommendations=10):
         print("User has no listening history. Cannot compute item-based recommendations.")
         return []
 
-    print("Loading all tracks data...")
-    tracks_df = get_all_tracks_data()
-    print(f"Loaded {len(tracks_df)} tracks from database.")
+    # 2. Load Features (fitted once per catalog version, see utils/feature_store.py),
+    # unless the caller keeps them loaded (recommendation_service.py)
+    print("Loading track features...")
+    if features is None:
+        features = load_track_features()
     
-    if tracks_df.empty:
+    if features is None:
         print("No tracks found in database.")
         return []
-        
-    # 2. Prepare Features
-    print("Vectorizing features...")
-    feature_matrices, track_index = prepare_features(tracks_df)
-    
-    if not feature_matrices:
-        print("Failed to prepare features.")
-        return []
+    print(f"Loaded {len(features)} tracks ({features.origin}).")
+    feature_matrices, track_index = features.matrices, features.track_ids
 
     # Map track_id to matrix index
     id_to_idx = {tid: i for i, tid in enumerate(track_index)}
     tracks_index_list = list(track_index)
-    
-    if 'track_id' in tracks_df.columns:
-        tracks_df = tracks_df.set_index('track_id')
         
     # 3. Create User Profile & Compute Similarity per Component
     print("Computing similarities per component...")
@@ -57,7 +50,7 @@ def recommend_tracks(user_id, n_recommendations=10):
     # Mk4: Text Components + Individual Audio Features
     text_components = ['genres', 'tags', 'artists', 'albums', 'titles']
     
-    # List to store all similarity arrays (1 per text component, 1 per audio feature)
+    # Similarity arrays of the text components (the audio dimensions are summed in closed form)
     all_similarities = []
     valid_component_names = []
     
@@ -106,49 +99,25 @@ def recommend_tracks(user_id, n_recommendations=10):
 
     # B. Process Individual Audio Features
     print("  Processing Individual Audio Features...")
-    if 'audio' in feature_matrices:
-        audio_matrix = feature_matrices['audio']
-        
-        # Convert to dense for easier column iteration (assumption: metrics fit in memory)
-        # 100k rows * 300 cols * 8 bytes ~ 240MB. Should be fine.
-        if hasattr(audio_matrix, 'toarray'):
-            audio_dense = audio_matrix.toarray()
-        else:
-            audio_dense = audio_matrix
-            
-        n_features = audio_dense.shape[1]
-        print(f"    Iterating over {n_features} audio dimensions...")
-        
-        for i in range(n_features):
-            # Extract column i: shape (N,)
-            col_data = audio_dense[:, i]
-            
-            # User profile for this specific feature (Weighted Average)
-            user_vals = col_data[user_indices]
-            # user_profile_val is a scalar
-            user_profile_val = np.average(user_vals, weights=weights)
-            if user_profile_val == 0:
-                sim = np.zeros(len(col_data))
-            else:
-                # Reshape for sklearn: (1, 1) and (N, 1)
-                u_vec = np.array([[user_profile_val]])
-                c_vecs = col_data.reshape(-1, 1)
-                
-                sim = cosine_similarity(u_vec, c_vecs).flatten()
-                
-            all_similarities.append(sim)
-            valid_component_names.append(f"audio_{i}")
+    audio_scores = None
+    if feature_matrices.get('audio') is not None:
+        # Closed form of the per-dimension cosine loop: one sparse mat-vec (utils/similarity.py)
+        audio_scores, n_features = individual_feature_similarity(feature_matrices['audio'], user_indices, weights)
+        print(f"    Scoring {n_features} audio dimensions at once...")
+        valid_component_names.extend(f"audio_{i}" for i in range(n_features))
 
-    if not all_similarities:
+    if not valid_component_names:
         print("No valid feature components found.")
         return []
         
-    print(f"Averaging scores from {len(all_similarities)} components...")
+    print(f"Averaging scores from {len(valid_component_names)} components...")
     
     # 4. Average Similarity
-    # Stack arrays: (n_components, n_tracks)
-    stacked_sims = np.vstack(all_similarities)
-    final_similarity = np.mean(stacked_sims, axis=0) # Average across components
+    # Sum of the text similarities and of the per-dimension audio ones, over all components
+    total_similarity = np.sum(all_similarities, axis=0)
+    if audio_scores is not None:
+        total_similarity = total_similarity + audio_scores
+    final_similarity = total_similarity / len(valid_component_names)
     
     # Mk3 Logic: Add Random Noise
     print("Adding random variation (Mk3 style)...")
@@ -168,12 +137,11 @@ def recommend_tracks(user_id, n_recommendations=10):
             continue
             
         score = final_similarity[idx]
-        track_info = tracks_df.loc[track_id]
         
         rec = {
             'track_id': track_id,
-            'title': track_info['track_title'],
-            'artist': track_info['artists'],
+            'title': features.titles[idx],
+            'artist': features.artists[idx],
             'score': float(score)
         }
         recommendations.append(rec)
@@ -190,6 +158,7 @@ if __name__ == "__main__":
     parser.add_argument("--n", type=int, default=10, help="Number of recommendations")
     
     args = parser.parse_args()
+    load_env_file()
     
     try:
         recs = recommend_tracks(args.user_id, args.n)
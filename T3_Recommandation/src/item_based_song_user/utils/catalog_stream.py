@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from .temporal_features import decode_packed, get_feature_names
+
+TEXT_COLUMNS = ["genres", "tags", "artists", "album_title"]
+# Lignes par aller-retour du curseur serveur : ~500 x 518 floats Python (~8 Mo) par lot
+DEFAULT_ITERSIZE = 500
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_temporal_columns(conn):
+    """Feature columns of the wide temporal_feature table, in table order (track_id excluded)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM temporal_feature LIMIT 0")
+        return [column[0] for column in cur.description if column[0] != "track_id"]
+
+
+def _count_rows(conn, from_clause):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM {from_clause}")
+        return cur.fetchone()[0]
+
+
+class _CatalogArrays:
+    """Preallocated destination arrays, filled batch after batch."""
+
+    def __init__(self, n_rows, n_features, dtype):
+        self.size = 0
+        self.track_ids = np.empty(n_rows, dtype=object)
+        self.titles = np.empty(n_rows, dtype=object)
+        self.text = {column: np.empty(n_rows, dtype=object) for column in TEXT_COLUMNS}
+        self.features = np.empty((n_rows, n_features), dtype=dtype)
+
+    def reserve(self, count):
+        # Des pistes ajoutees entre le COUNT et la lecture : rare, on agrandit
+        needed = self.size + count
+        if needed <= len(self.track_ids):
+            return
+        extra = needed - len(self.track_ids)
+        self.track_ids = np.concatenate([self.track_ids, np.empty(extra, dtype=object)])
+        self.titles = np.concatenate([self.titles, np.empty(extra, dtype=object)])
+        for column in TEXT_COLUMNS:
+            self.text[column] = np.concatenate([self.text[column], np.empty(extra, dtype=object)])
+        self.features = np.concatenate([self.features, np.empty((extra, self.features.shape[1]), self.features.dtype)])
+
+    def add_metadata(self, rows):
+        start, end = self.size, self.size + len(rows)
+        self.track_ids[start:end] = [row[0] for row in rows]
+        self.titles[start:end] = [row[1] for row in rows]
+        for offset, column in enumerate(TEXT_COLUMNS, start=2):
+            self.text[column][start:end] = [row[offset] for row in rows]
+
+    def to_frame(self, feature_names):
+        """Same column order as the read_sql_query path; the feature block is not copied."""
+        size = self.size
+        df = pd.DataFrame(self.features[:size], columns=feature_names, copy=False)
+        df.insert(0, "track_id", self.track_ids[:size])
+        df.insert(1, "track_title", self.titles[:size])
+        for column in TEXT_COLUMNS:
+            df[column] = self.text[column][:size]
+        return df
+
+
+def catalog_query(conn, source, temporal_storage="columns"):
+    """
+    (feature_names, from_clause, select) read by stream_catalog: `select` returns
+    track_id, track_title, the TEXT_COLUMNS then the features (one bytea blob when packed).
+    """
+    metadata = "c.track_id, c.track_title, " + ", ".join(f"c.{column}" for column in TEXT_COLUMNS)
+    if temporal_storage == "packed":
+        feature_names = get_feature_names(conn)
+        from_clause = f"{source} c JOIN temporal_feature_packed tp ON tp.track_id = c.track_id"
+        select = f"SELECT {metadata}, tp.features FROM {from_clause}"
+    else:
+        feature_names = get_temporal_columns(conn)
+        from_clause = f"{source} c JOIN temporal_feature tf ON tf.track_id = c.track_id"
+        features = ", ".join(f"COALESCE(tf.{_quote(name)}::float8, 'NaN')" for name in feature_names)
+        select = f"SELECT {metadata}, {features} FROM {from_clause}"
+    return feature_names, from_clause, select
+
+
+def stream_catalog(conn, source, temporal_storage="columns", itersize=DEFAULT_ITERSIZE):
+    """
+    Reads the catalog through a named (server-side) cursor, `itersize` rows
+    per round trip, and writes every batch into arrays allocated once from a
+    COUNT(*). Only the final feature matrix plus one batch of row tuples are
+    held in memory, instead of all the tuples, the DataFrame built from them
+    and its copy.
+
+    temporal_storage:
+    - "columns": float64 features read from temporal_feature (NULL -> NaN)
+    - "packed": float32 features decoded from temporal_feature_packed blobs
+
+    Returns a DataFrame: track_id, track_title, <features>, genres, tags, artists, album_title.
+    """
+    feature_names, from_clause, select = catalog_query(conn, source, temporal_storage)
+    dtype = np.float32 if temporal_storage == "packed" else np.float64
+
+    n_features = len(feature_names)
+    first_feature = 2 + len(TEXT_COLUMNS)
+    arrays = _CatalogArrays(_count_rows(conn, from_clause), n_features, dtype)
+
+    with conn.cursor(name="catalog_stream") as cur:
+        cur.itersize = itersize
+        cur.execute(select)
+        while True:
+            rows = cur.fetchmany(itersize)
+            if not rows:
+                break
+            arrays.reserve(len(rows))
+            arrays.add_metadata(rows)
+            start, end = arrays.size, arrays.size + len(rows)
+            if temporal_storage == "packed":
+                arrays.features[start:end] = decode_packed((row[first_feature] for row in rows), n_features)
+            else:
+                arrays.features[start:end] = [row[first_feature:] for row in rows]
+            arrays.size = end
+
+    return arrays.to_frame(feature_names)
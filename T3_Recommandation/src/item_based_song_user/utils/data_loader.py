@@ -1,6 +1,9 @@
 import pandas as pd
 import psycopg2
+from .catalog_stream import DEFAULT_ITERSIZE, stream_catalog
 from .db_connexion import get_db_connection
+from .temporal_features import has_packed_features
+from .track_catalog import catalog_source
 
 def get_user_listen_history(account_id):
     """
@@ -30,12 +33,23 @@ def get_user_listen_history(account_id):
     finally:
         conn.close()
 
-def get_all_tracks_data():
+def get_all_tracks_data(temporal_storage="auto", itersize=DEFAULT_ITERSIZE):
     """
     Fetches feature-rich data for all tracks:
     - Metadata: Track ID, Title
     - Temporal Features: All columns from temporal_feature table
     - Textual Data: Genres, Tags, Artist Names
+
+    Text fields come from the mv_track_features materialized view when it has
+    been refreshed, otherwise they are aggregated on the fly.
+
+    temporal_storage:
+    - "columns": reads the wide temporal_feature table (float64 features)
+    - "packed": decodes temporal_feature_packed blobs (float32 features)
+    - "auto": "packed" when it has been populated, "columns" otherwise
+
+    Rows are streamed through a server-side cursor, `itersize` at a time,
+    into preallocated arrays (see utils/catalog_stream.py).
     
     Returns a pandas DataFrame.
     """
@@ -44,51 +58,11 @@ def get_all_tracks_data():
         return pd.DataFrame()
 
     try:
+        if temporal_storage == "auto":
+            temporal_storage = "packed" if has_packed_features(conn) else "columns"
 
-        
-        # Optimization: Use CTEs to pre-aggregate tags/genres/artists because the GROUP BY above is insane.
-        optimized_query = """
-        WITH track_genres AS (
-            SELECT tg.track_id, string_agg(DISTINCT g.title, ' ') as genres
-            FROM track_genre tg
-            JOIN genre g ON g.genre_id = tg.genre_id
-            GROUP BY tg.track_id
-        ),
-        track_tags AS (
-            SELECT tt.track_id, string_agg(DISTINCT tag.tag_name, ' ') as tags
-            FROM track_tag tt
-            JOIN tag ON tag.tag_id = tt.tag_id
-            GROUP BY tt.track_id
-        ),
-        track_artists AS (
-            SELECT tam.track_id, string_agg(DISTINCT a.name, ' ') as artists
-            FROM track_artist_main tam
-            JOIN artist art ON art.artist_id = tam.artist_id
-            JOIN account a ON a.account_id = art.artist_id
-            GROUP BY tam.track_id
-        )
-        SELECT 
-            t.track_id,
-            t.track_title,
-            -- Temporal Features (ALL columns)
-            tf.*,
-            -- Textual
-            COALESCE(tg.genres, '') as genres,
-            COALESCE(tt.tags, '') as tags,
-            COALESCE(ta.artists, '') as artists,
-            COALESCE(alb.album_title, '') as album_title
-        FROM track t
-        JOIN temporal_feature tf ON tf.track_id = t.track_id
-        LEFT JOIN track_genres tg ON tg.track_id = t.track_id
-        LEFT JOIN track_tags tt ON tt.track_id = t.track_id
-        LEFT JOIN track_artists ta ON ta.track_id = t.track_id
-        LEFT JOIN album alb ON alb.album_id = t.album_id;
-        """
-        
-        df = pd.read_sql_query(optimized_query, conn)
-        # Drop duplicate track_id columns if any (tf has track_id too)
-        df = df.loc[:, ~df.columns.duplicated()]
-        return df
+        source = catalog_source(conn)
+        return stream_catalog(conn, source, temporal_storage, itersize)
         
     except Exception as e:
         print(f"Error fetching track data: {e}")
@@ -1,27 +1,14 @@
 import os
+import sys
 
-import psycopg2
-from dotenv import load_dotenv
+# db_pool.py est partage par tous les recommandeurs (T3_Recommandation/src)
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
 
+import db_pool  # noqa: E402
 
-def get_db_connection():
-    """Create database connection."""
-    load_dotenv()
-
-    DB_HOST = "localhost"
-    DB_PORT = os.getenv("PGDB_PORT", "5432")
-    DB_NAME = os.getenv("DB_NAME", "sae5idfou")
-    DB_USER = os.getenv("DB_USER", "idfou")
-    DB_PASSWORD = os.getenv("DB_ROOT_PASSWORD")
 
-    try:
-        return psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-        )
-    except Exception as e:
-        print(f"Error connecting to database: {e}")
-        return None
+def get_db_connection():
+    """Borrow a connection from the shared pool; conn.close() gives it back."""
+    return db_pool.get_db_connection()
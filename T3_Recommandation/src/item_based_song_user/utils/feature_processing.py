@@ -8,30 +8,50 @@ def prepare_features(tracks_df):
     """
     Processes the raw tracks DataFrame into a dictionary of feature matrices.
     
+    Args:
+        tracks_df (pd.DataFrame): see fit_features.
+    
+    Returns:
+        tuple: (feature_matrices (dict), track_ids (list/index))
+               feature_matrices dict keys: 'genres', 'tags', 'artists', 'albums', 'titles', 'audio'
+    """
+    feature_matrices, track_index, _ = fit_features(tracks_df)
+    return feature_matrices, track_index
+
+def fit_features(tracks_df):
+    """
+    Same as prepare_features, also returning the fitted preprocessors so that
+    they can be stored with the matrices (see utils/feature_store.py).
+    
     Args:
         tracks_df (pd.DataFrame): DataFrame containing track data. 
                                   Must have 'track_id', 'track_title', 'genres', 'tags', 'artists', 'album_title' columns 
                                   and numeric temporal features.
     
     Returns:
-        tuple: (feature_matrices (dict), track_ids (list/index))
+        tuple: (feature_matrices (dict), track_ids (list/index), preprocessors (dict))
                feature_matrices dict keys: 'genres', 'tags', 'artists', 'albums', 'titles', 'audio'
+               preprocessors: the TfidfVectorizer of each text component, the StandardScaler
+               under 'audio' and the scaled columns under 'audio_columns'
     """
     if tracks_df.empty:
-        return {}, []
+        return {}, [], {}
 
     # Ensure track_id is identifying the rows
     df = tracks_df.set_index('track_id')
     
     feature_matrices = {}
+    preprocessors = {}
     
     # Helper to vectorize text
-    def vectorize_text(column_name, data):
+    def vectorize_text(component, data):
         # FillNa and basic cleanup
         text_data = data.fillna('').astype(str).str.lower().str.strip()
         # Use simple TF-IDF
         tfidf = TfidfVectorizer(stop_words='english', min_df=1) # min_df=1 because some attributes might be rare but exact matches matter (e.g. unique album)
-        return tfidf.fit_transform(text_data)
+        matrix = tfidf.fit_transform(text_data)
+        preprocessors[component] = tfidf
+        return matrix
 
     # 1. Textual Features (Independent)
     print("  Vectorizing Genres...")
@@ -46,13 +66,13 @@ def prepare_features(tracks_df):
     # Check if album_title and track_title exist (support partial data if needed, but they should be there)
     if 'album_title' in df.columns:
         print("  Vectorizing Albums...")
-        feature_matrices['albums'] = vectorize_text('album_title', df['album_title'])
+        feature_matrices['albums'] = vectorize_text('albums', df['album_title'])
     else:
         feature_matrices['albums'] = None
         
     if 'track_title' in df.columns:
         print("  Vectorizing Titles...")
-        feature_matrices['titles'] = vectorize_text('track_title', df['track_title'])
+        feature_matrices['titles'] = vectorize_text('titles', df['track_title'])
     else:
         feature_matrices['titles'] = None
     
@@ -76,8 +96,10 @@ def prepare_features(tracks_df):
         scaler = StandardScaler()
         # Create sparse matrix from audio features for consistency
         feature_matrices['audio'] = csr_matrix(scaler.fit_transform(numeric_data))
+        preprocessors['audio'] = scaler
+        preprocessors['audio_columns'] = list(numeric_cols)
     else:
         print("  WARNING: No numeric features found. using empty matrix for audio.")
         feature_matrices['audio'] = csr_matrix((len(df), 0))
 
-    return feature_matrices, df.index
+    return feature_matrices, df.index, preprocessors
@@ -0,0 +1,377 @@
+"""
+On-disk store of the fitted item-based features.
+
+prepare_features refits five TfidfVectorizers and a StandardScaler on the whole
+catalog at every recommend_tracks call. The store keeps the result of one fit per
+catalog version, in its own directory:
+
+- manifest.json: fingerprint, shapes, creation date;
+- <component>.data.npy / .indices.npy / .indptr.npy: the CSR matrices, one .npy per
+  array so that np.load(mmap_mode="r") maps them instead of reading them (an .npz
+  archive is always read in full);
+- combined.*.npy: the same components L2-normalized and stacked side by side (CSC),
+  so that mk1-mk3 score the catalog with a single mat-vec (see utils/similarity.py);
+- track_ids.npy, titles and artists (UTF-8 blob + offsets) for the recommendation output;
+- preprocessors.pkl: the fitted vectorizers and scaler, only unpickled on demand.
+
+While the catalog fingerprint does not change, load_track_features maps the stored
+matrices; otherwise it refits and writes a new version, which replaces the previous one.
+
+Environment variables:
+- FEATURE_STORE_DIR: store directory (item_based_song_user/artifacts/feature_store);
+- FEATURE_STORE=off: always refit, without reading or writing the store.
+
+    cd T3_Recommandation/src/item_based_song_user
+    python -m utils.feature_store [--rebuild]
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csc_matrix, csr_matrix
+
+from .data_loader import get_all_tracks_data
+from .db_connexion import get_db_connection
+from .feature_processing import fit_features
+from .similarity import COMPONENTS, CombinedMatrix
+from .temporal_features import has_packed_features
+from .track_catalog import TRACK_FEATURES_VIEW, has_track_features_view
+
+DEFAULT_STORE_DIR = Path(
+    os.getenv("FEATURE_STORE_DIR", Path(__file__).resolve().parent.parent / "artifacts" / "feature_store")
+)
+# A incrementer quand fit_features change : les versions stockees deviennent invalides
+FORMAT_VERSION = 2
+
+CSR_PARTS = ("data", "indices", "indptr")
+
+# Tables lues par TRACK_CATALOG_QUERY (track_catalog.py) quand mv_track_features n'est pas remplie
+CATALOG_TABLES = (
+    "track", "album", "genre", "track_genre", "tag", "track_tag", "track_artist_main", "artist", "account",
+)
+TEMPORAL_TABLES = ("temporal_feature", "temporal_feature_packed", "temporal_feature_manifest")
+# Les triggers T2 mettent ces tables a jour a chaque ecoute, favori ou commentaire
+# (track_listens, artist_favorites...) : leurs UPDATE sont remplaces par l'empreinte
+# des colonnes que le catalogue lit (CATALOG_COLUMNS_QUERY)
+COUNTER_TABLES = ("track", "artist")
+
+CATALOG_COLUMNS_QUERY = """
+SELECT
+    (SELECT md5(coalesce(string_agg(format('%L,%L,%L', track_id, track_title, album_id), ';' ORDER BY track_id), ''))
+     FROM track),
+    (SELECT md5(coalesce(string_agg(artist_id::text, ';' ORDER BY artist_id), '')) FROM artist)
+"""
+
+TABLE_WRITES_QUERY = """
+SELECT relname, n_tup_ins, n_tup_upd, n_tup_del
+FROM pg_stat_user_tables
+WHERE relname = ANY(%s)
+ORDER BY relname
+"""
+
+
+def catalog_fingerprint(conn, temporal_storage):
+    """
+    Version of the catalog: track row count plus the rows written so far in each
+    table the features are read from (pg_stat_user_tables), in place of a
+    max(updated_at) the schema does not have.
+
+    When mv_track_features is populated the text fields come from it alone: its
+    counters (every REFRESH rewrites it) and the temporal tables' are enough, and
+    an edit of track, artist, genre... is seen at the next REFRESH, as it is by
+    the recommendations. Otherwise the base tables are counted, except the UPDATEs
+    of track and artist that the listen/like triggers keep issuing: a hash of the
+    columns the catalog reads from them (track_id, track_title, album_id,
+    artist_id) stands in for those. Artist names live in account, whose updates count.
+
+    Statistics are flushed asynchronously, so a write changes the fingerprint up to
+    about a second after its commit; a statistics reset changes it too, which only
+    costs a refit.
+    """
+    view = has_track_features_view(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM track")
+        parts = [f"format={FORMAT_VERSION}", f"temporal={temporal_storage}", f"tracks={cur.fetchone()[0]}"]
+        if view:
+            tables = (TRACK_FEATURES_VIEW,) + TEMPORAL_TABLES
+        else:
+            tables = CATALOG_TABLES + TEMPORAL_TABLES
+            cur.execute(CATALOG_COLUMNS_QUERY)
+            parts.append("columns={}/{}".format(*cur.fetchone()))
+        cur.execute(TABLE_WRITES_QUERY, (list(tables),))
+        for relname, inserted, updated, deleted in cur.fetchall():
+            if not view and relname in COUNTER_TABLES:
+                updated = 0
+            parts.append(f"{relname}={inserted}/{updated}/{deleted}")
+    return hashlib.sha1(";".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _mapped(path):
+    # Vue ndarray sur le mmap (comme user_based/vector_index.py)
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+def _save_csr(directory, name, matrix):
+    """Saves data/indices/indptr (of a CSR, or CSC, matrix); returns the manifest entry."""
+    # Index tries a l'ecriture : scipy n'a jamais a les trier sur place (tableaux en lecture seule)
+    matrix.sort_indices()
+    for part in CSR_PARTS:
+        np.save(directory / f"{name}.{part}.npy", getattr(matrix, part))
+    return {"shape": list(matrix.shape), "nnz": int(matrix.nnz)}
+
+
+def _load_csr(directory, name, info, matrix_type=csr_matrix):
+    arrays = tuple(_mapped(directory / f"{name}.{part}.npy") for part in CSR_PARTS)
+    return matrix_type(arrays, shape=tuple(info["shape"]), copy=False)
+
+
+class StringColumn:
+    """Strings kept as one UTF-8 blob plus offsets: mappable, decoded one at a time."""
+
+    def __init__(self, blob, offsets, missing):
+        self.blob = blob
+        self.offsets = offsets
+        self.missing = missing
+
+    @staticmethod
+    def encode(values):
+        """(blob, offsets, missing) arrays for a sequence of strings; None/NaN are kept as missing."""
+        missing = np.fromiter((pd.isna(value) for value in values), dtype=bool, count=len(values))
+        encoded = [b"" if absent else str(value).encode("utf-8") for value, absent in zip(values, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, offsets, missing
+
+    @classmethod
+    def load(cls, directory, name):
+        return cls(*(_mapped(directory / f"{name}.{part}.npy") for part in ("blob", "offsets", "missing")))
+
+    def save(self, directory, name):
+        for part in ("blob", "offsets", "missing"):
+            np.save(directory / f"{name}.{part}.npy", getattr(self, part))
+
+    def __len__(self):
+        return len(self.missing)
+
+    def __getitem__(self, i):
+        if self.missing[i]:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class StoredFeatures:
+    """
+    Feature matrices of one catalog version, as returned by prepare_features,
+    with the titles and artists needed to print the recommendations.
+    """
+
+    def __init__(self, fingerprint, matrices, track_ids, titles, artists, directory=None, preprocessors=None, combined=None):
+        self.fingerprint = fingerprint
+        self.matrices = matrices
+        self.track_ids = track_ids
+        self.titles = titles
+        self.artists = artists
+        self.directory = directory
+        self._preprocessors = preprocessors
+        self._combined = combined
+
+    @property
+    def origin(self):
+        return f"feature store {self.fingerprint}" if self.directory else "fitted in memory"
+
+    @property
+    def preprocessors(self):
+        """Fitted TfidfVectorizers and StandardScaler (see fit_features)."""
+        if self._preprocessors is None and self.directory is not None:
+            with open(self.directory / "preprocessors.pkl", "rb") as f:
+                self._preprocessors = pickle.load(f)
+        return self._preprocessors
+
+    @property
+    def combined(self):
+        """All components L2-normalized and stacked (CombinedMatrix), built on first use if not stored."""
+        if self._combined is None:
+            self._combined = CombinedMatrix.build(self.matrices, COMPONENTS)
+        return self._combined
+
+    def __len__(self):
+        return len(self.track_ids)
+
+
+class FeatureStore:
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = Path(directory)
+
+    def path_for(self, fingerprint):
+        return self.directory / fingerprint
+
+    def load(self, fingerprint):
+        """Stored features of this catalog version, memory-mapped; None if not stored."""
+        directory = self.path_for(fingerprint)
+        manifest_path = directory / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format") != FORMAT_VERSION or manifest.get("fingerprint") != fingerprint:
+            return None
+
+        matrices = {}
+        for name, info in manifest["components"].items():
+            if info is None:
+                matrices[name] = None
+                continue
+            matrices[name] = _load_csr(directory, name, info)
+        combined_info = manifest["combined"]
+        blocks = {name: tuple(block) for name, block in combined_info["blocks"].items()}
+
+        return StoredFeatures(
+            fingerprint,
+            matrices,
+            np.load(directory / "track_ids.npy").tolist(),
+            StringColumn.load(directory, "titles"),
+            StringColumn.load(directory, "artists"),
+            directory=directory,
+            combined=CombinedMatrix(_load_csr(directory, "combined", combined_info, csc_matrix), blocks),
+        )
+
+    def save(self, fingerprint, matrices, track_index, tracks_df, preprocessors, replace=False):
+        """
+        Writes a complete version in a staging directory, then renames it: a reader never
+        sees a partial version. Older versions are removed afterwards; processes that still
+        map them keep their (unlinked) files. An existing copy of the same version is kept
+        unless `replace` is set (--rebuild).
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{fingerprint}-", dir=self.directory))
+        target = self.path_for(fingerprint)
+        try:
+            manifest = {
+                "format": FORMAT_VERSION,
+                "fingerprint": fingerprint,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "tracks": len(track_index),
+                "components": {},
+            }
+            for name in COMPONENTS:
+                matrix = matrices.get(name)
+                if matrix is None:
+                    manifest["components"][name] = None
+                    continue
+                manifest["components"][name] = _save_csr(staging, name, csr_matrix(matrix))
+            combined = CombinedMatrix.build(matrices, COMPONENTS)
+            manifest["combined"] = _save_csr(staging, "combined", combined.matrix)
+            manifest["combined"]["blocks"] = {name: list(block) for name, block in combined.blocks.items()}
+
+            np.save(staging / "track_ids.npy", np.asarray([str(track_id) for track_id in track_index]))
+            StringColumn(*StringColumn.encode(tracks_df["track_title"].tolist())).save(staging, "titles")
+            StringColumn(*StringColumn.encode(tracks_df["artists"].tolist())).save(staging, "artists")
+            with open(staging / "preprocessors.pkl", "wb") as f:
+                pickle.dump(preprocessors, f, protocol=pickle.HIGHEST_PROTOCOL)
+            (staging / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+            # mkdtemp cree le repertoire en 0700
+            os.chmod(staging, 0o755)
+            if target.exists() and replace:
+                # Renommee en repertoire cache : prune la supprime une fois la nouvelle en place
+                os.replace(target, self.directory / f".{fingerprint}-replaced-{os.getpid()}")
+            if target.exists():
+                # Meme version ecrite entre-temps par un autre processus
+                shutil.rmtree(staging)
+            else:
+                os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.prune(keep=fingerprint)
+        return target
+
+    def prune(self, keep):
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name != keep and (not path.name.startswith(".") or "-replaced-" in path.name):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def store_enabled():
+    return os.getenv("FEATURE_STORE", "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+def load_track_features(temporal_storage="auto", rebuild=False, directory=None):
+    """
+    Fitted features of the current catalog: mapped from the store when its
+    fingerprint matches, refitted (and stored) otherwise.
+    Returns a StoredFeatures, or None when the catalog is empty or unreachable.
+    """
+    fingerprint = None
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        if temporal_storage == "auto":
+            temporal_storage = "packed" if has_packed_features(conn) else "columns"
+        fingerprint = catalog_fingerprint(conn, temporal_storage)
+    except Exception as e:
+        print(f"Error computing catalog fingerprint, features will be refitted: {e}")
+    finally:
+        conn.close()
+
+    store = FeatureStore(directory or DEFAULT_STORE_DIR)
+    use_store = fingerprint is not None and store_enabled()
+    if use_store and not rebuild:
+        features = store.load(fingerprint)
+        if features is not None:
+            return features
+
+    tracks_df = get_all_tracks_data(temporal_storage)
+    if tracks_df.empty:
+        return None
+    print("Vectorizing features...")
+    matrices, track_index, preprocessors = fit_features(tracks_df)
+
+    if use_store:
+        try:
+            store.save(fingerprint, matrices, track_index, tracks_df, preprocessors, replace=rebuild)
+            return store.load(fingerprint)
+        except OSError as e:
+            print(f"Could not write the feature store ({e}), using the fitted features.")
+
+    return StoredFeatures(
+        fingerprint,
+        matrices,
+        [str(track_id) for track_id in track_index],
+        tracks_df["track_title"].tolist(),
+        tracks_df["artists"].tolist(),
+        preprocessors=preprocessors,
+    )
+
+
+def main(argv=None):
+    from .env_loader import load_env_file
+
+    parser = argparse.ArgumentParser(description="Fit the item-based features of the current catalog and store them.")
+    parser.add_argument("--rebuild", action="store_true", help="Refit even if the stored version matches the catalog")
+    args = parser.parse_args(argv)
+
+    load_env_file()
+    started = time.perf_counter()
+    features = load_track_features(rebuild=args.rebuild)
+    if features is None:
+        print("No tracks found in database.")
+        return 1
+    print(f"{len(features)} tracks, {features.origin} ({time.perf_counter() - started:.2f}s)")
+    for name, matrix in features.matrices.items():
+        if matrix is not None:
+            print(f"  {name}: {matrix.shape[0]} x {matrix.shape[1]}, {matrix.nnz} non-zero")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
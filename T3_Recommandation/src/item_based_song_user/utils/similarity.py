@@ -0,0 +1,161 @@
+"""
+Component similarities of the item-based recommenders in one sparse mat-vec.
+
+cosine_similarity(profile, matrix) renormalizes the whole catalog matrix at every
+call, once per component. Here every component matrix is L2-normalized row by row
+once, and the blocks are stacked side by side in a single sparse matrix. The score of
+a track is a weighted sum of its cosine with each component profile:
+
+    sum_c w_c * cos(p_c, x_c) = H @ concat_c(w_c * p_c / ||p_c||)
+
+so one product H @ q scores the whole catalog, whatever the weights.
+
+H is kept in CSC (column-major): when only some components are used (mk1 leaves
+out the ~500 audio columns), the product runs on a view of their column range
+instead of going through every stored value.
+"""
+import argparse
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix, hstack
+from sklearn.preprocessing import normalize
+
+# Composantes produites par fit_features, dans l'ordre de la matrice combinee
+COMPONENTS = ("genres", "tags", "artists", "albums", "titles", "audio")
+
+
+class CombinedMatrix:
+    """Row-wise L2-normalized components stacked in one CSC matrix; blocks: {component: (start, stop)}."""
+
+    def __init__(self, matrix, blocks):
+        self.matrix = matrix
+        self.blocks = blocks
+
+    @classmethod
+    def build(cls, matrices, components):
+        """Stacks the given components (None ones are skipped), in float64 like cosine_similarity."""
+        parts, blocks, start = [], {}, 0
+        for name in components:
+            matrix = matrices.get(name)
+            if matrix is None:
+                continue
+            # Une ligne nulle reste nulle, comme dans cosine_similarity
+            parts.append(normalize(csr_matrix(matrix, dtype=np.float64)))
+            blocks[name] = (start, start + matrix.shape[1])
+            start += matrix.shape[1]
+        if not parts:
+            return cls(csc_matrix((0, 0)), {})
+        combined = hstack(parts, format="csc")
+        combined.sort_indices()
+        return cls(combined, blocks)
+
+    def score(self, profiles, weights=None):
+        """
+        Weighted mean of cos(profile, row) over the components in `profiles`
+        ({component: 1-D profile}) for every row. `weights` ({component: weight},
+        1 when missing) default to the plain mean of the previous per-component loop.
+        Raises ValueError on an unknown component or a negative weight.
+        """
+        check_component_weights(weights)
+        used = [name for name in profiles if name in self.blocks]
+        total = sum(component_weight(weights, name) for name in used)
+        active = [name for name in used if component_weight(weights, name)]
+        if not active or total == 0:
+            return np.zeros(self.matrix.shape[0])
+
+        # Plage de colonnes des composantes utilisees : les autres ne sont pas parcourues
+        low = min(self.blocks[name][0] for name in active)
+        high = max(self.blocks[name][1] for name in active)
+        query = np.zeros(high - low)
+        for name in active:
+            profile = np.asarray(profiles[name], dtype=np.float64).ravel()
+            norm = np.linalg.norm(profile)
+            if norm > 0:
+                start, stop = self.blocks[name]
+                query[start - low:stop - low] = profile * (component_weight(weights, name) / (norm * total))
+        return self.columns(low, high) @ query
+
+    def columns(self, low, high):
+        """Columns [low, high) as a CSC view sharing the data arrays (no copy)."""
+        matrix = self.matrix
+        if low == 0 and high == matrix.shape[1]:
+            return matrix
+        first, last = matrix.indptr[low], matrix.indptr[high]
+        return csc_matrix(
+            (matrix.data[first:last], matrix.indices[first:last], matrix.indptr[low:high + 1] - first),
+            shape=(matrix.shape[0], high - low),
+            copy=False,
+        )
+
+
+def individual_feature_similarity(matrix, user_indices, weights):
+    """
+    Sum over the columns i of `matrix` of cos(u_i, x_ji) for every track j, where
+    u_i is the weighted mean of column i over the user's tracks: mk4's loop of one
+    cosine_similarity per audio dimension, in closed form.
+
+    Between two one-value vectors the cosine is (u / |u|) * (x / |x|), each value
+    divided by its own norm as normalize() does it (sqrt(v * v), replaced by 1 below
+    10 * eps), and 0 when u or x is 0. Computing unit(u_i) * unit(x_ji) with the same
+    float64 operations gives the same per-dimension similarities; their sum is one
+    sparse mat-vec over the stored values, without densifying the matrix.
+    Returns (scores, number of columns).
+    """
+    matrix = csr_matrix(matrix)
+    weights = np.asarray(weights, dtype=np.float64)
+    # np.average(colonne[user_indices], weights=weights) pour toutes les colonnes a la fois
+    user_rows = matrix[user_indices].toarray().astype(np.float64)
+    profile = np.ascontiguousarray((user_rows * weights[:, None]).T).sum(axis=1) / weights.sum()
+    unit_matrix = csr_matrix((_unit(matrix.data), matrix.indices, matrix.indptr), shape=matrix.shape)
+    return unit_matrix @ _unit(profile), matrix.shape[1]
+
+
+def _unit(values):
+    """v / |v| value by value, as sklearn's normalize() computes it for a single value."""
+    values = np.asarray(values, dtype=np.float64)
+    # Carre hors limites (|v| > 1e154 ou < 1e-162) : meme resultat que normalize(), sans avertissement
+    with np.errstate(over="ignore", under="ignore"):
+        norms = np.sqrt(values * values)
+    norms[norms < 10 * np.finfo(np.float64).eps] = 1.0
+    return values / norms
+
+
+def component_weight(weights, name):
+    return 1.0 if weights is None else float(weights.get(name, 1.0))
+
+
+def _weight_error(name, weight, components):
+    """Why (name, weight) is not a valid component weight, None if it is."""
+    if name not in components:
+        return f"unknown component {name!r}, expected one of: {', '.join(components)}"
+    # Un poids negatif (ou nan/inf) ne donne plus une moyenne des cosinus
+    if not np.isfinite(weight) or weight < 0:
+        return f"weight of {name!r} must be a finite number >= 0, got {weight}"
+    return None
+
+
+def check_component_weights(weights, components=COMPONENTS):
+    """Raises ValueError if `weights` ({component: weight}) names an unknown component or a negative weight."""
+    for name, weight in (weights or {}).items():
+        error = _weight_error(name, float(weight), components)
+        if error:
+            raise ValueError(error)
+
+
+def component_weight_type(components=COMPONENTS):
+    """argparse type of the --weight option of a recommender using `components`: 'genres=2' -> ('genres', 2.0)."""
+
+    def parse(value):
+        name, sep, weight = value.partition("=")
+        try:
+            if not sep:
+                raise ValueError
+            name, weight = name.strip(), float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected COMPONENT=WEIGHT, got {value!r}") from None
+        error = _weight_error(name, weight, components)
+        if error:
+            raise argparse.ArgumentTypeError(error)
+        return name, weight
+
+    return parse
@@ -0,0 +1,40 @@
+import numpy as np
+
+# Format ecrit par T2_BDD/src/loader (pack_temporal) : float32 little-endian
+PACKED_DTYPE = np.dtype("<f4")
+
+
+def has_packed_features(conn):
+    """True si le stockage compact existe et a ete rempli (manifeste non vide)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('temporal_feature_manifest') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return False
+        cur.execute("SELECT EXISTS (SELECT 1 FROM temporal_feature_manifest)")
+        return cur.fetchone()[0]
+
+
+def get_feature_names(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT column_name FROM temporal_feature_manifest ORDER BY position")
+        return [row[0] for row in cur.fetchall()]
+
+
+def decode_packed(blobs, n_features):
+    """
+    Concatenates the per-track blobs and reinterprets them as one contiguous
+    (n_tracks, n_features) float32 matrix: no per-column parsing.
+    """
+    blobs = list(blobs)
+    if not blobs:
+        return np.empty((0, n_features), dtype=np.float32)
+    buffer = b"".join(blobs)
+    expected = len(blobs) * n_features * PACKED_DTYPE.itemsize
+    if len(buffer) != expected:
+        raise ValueError(
+            f"packed temporal features do not match the manifest "
+            f"({len(buffer)} bytes for {len(blobs)} tracks x {n_features} features)"
+        )
+    matrix = np.frombuffer(buffer, dtype=PACKED_DTYPE).reshape(len(blobs), n_features)
+    # Vue sans copie sur une machine little-endian
+    return matrix.astype(np.float32, copy=False)
@@ -0,0 +1,56 @@
+# Vue materialisee creee par T2_BDD/src/sql/schema/5_materialized_views.sql
+TRACK_FEATURES_VIEW = "mv_track_features"
+
+TRACK_CATALOG_QUERY = """
+        WITH track_genres AS (
+            SELECT tg.track_id, string_agg(DISTINCT g.title, ' ') as genres
+            FROM track_genre tg
+            JOIN genre g ON g.genre_id = tg.genre_id
+            GROUP BY tg.track_id
+        ),
+        track_tags AS (
+            SELECT tt.track_id, string_agg(DISTINCT tag.tag_name, ' ') as tags
+            FROM track_tag tt
+            JOIN tag ON tag.tag_id = tt.tag_id
+            GROUP BY tt.track_id
+        ),
+        track_artists AS (
+            SELECT tam.track_id, string_agg(DISTINCT a.name, ' ') as artists
+            FROM track_artist_main tam
+            JOIN artist art ON art.artist_id = tam.artist_id
+            JOIN account a ON a.account_id = art.artist_id
+            GROUP BY tam.track_id
+        )
+        SELECT
+            t.track_id,
+            t.track_title,
+            COALESCE(tg.genres, '') as genres,
+            COALESCE(tt.tags, '') as tags,
+            COALESCE(ta.artists, '') as artists,
+            COALESCE(alb.album_title, '') as album_title
+        FROM track t
+        LEFT JOIN track_genres tg ON tg.track_id = t.track_id
+        LEFT JOIN track_tags tt ON tt.track_id = t.track_id
+        LEFT JOIN track_artists ta ON ta.track_id = t.track_id
+        LEFT JOIN album alb ON alb.album_id = t.album_id
+"""
+
+
+def has_track_features_view(conn):
+    """True si la vue materialisee existe et a ete remplie (REFRESH)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = %s", (TRACK_FEATURES_VIEW,))
+        row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def catalog_source(conn):
+    """
+    Relation usable in a FROM clause with one row per track:
+    track_id, track_title, genres, tags, artists, album_title.
+    The materialized view is a single sequential scan; without it the
+    aggregations are computed inline.
+    """
+    if has_track_features_view(conn):
+        return TRACK_FEATURES_VIEW
+    return "(" + TRACK_CATALOG_QUERY + ")"
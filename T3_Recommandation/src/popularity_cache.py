@@ -0,0 +1,195 @@
+"""
+Index de popularité en mémoire pour les fallbacks de user_based_user_profile.py.
+
+Quand un compte n'a pas de reco via ses voisins, le recommandeur agrégeait
+track_user_listen (popularité globale) puis genre_preference (genres les plus
+choisis) à chaque appel. Ces classements ne changent qu'au rythme des chargements :
+ils sont lus dans la vue matérialisée mv_track_popularity (migration T2_BDD 004),
+découpés en listes « top N » globale et par genre, et gardés en mémoire pendant
+POPULARITY_CACHE_TTL secondes avec la liste complète des pistes de chaque genre
+(tirage parmi les ex aequo des genres les plus choisis). Un fallback ne fait plus
+qu'une fusion de quelques listes déjà triées ou un tirage dans des listes prêtes.
+
+Variables d'environnement :
+- POPULARITY_CACHE_TTL : durée de vie du cache en secondes (300) ;
+- POPULARITY_CACHE_DEPTH : pistes gardées par liste (200, agrandi si un appel demande plus).
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Track = Tuple[str, str, int]  # (track_id, track_title, score)
+
+# Groupes d'ex aequo gardés par ensemble de genres, jusqu'au prochain chargement
+TIE_GROUPS_CACHE_SIZE: int = 1024
+
+GLOBAL_TOP_QUERY: str = """
+SELECT track_id, track_title, listens
+FROM mv_track_popularity
+ORDER BY listens DESC, track_id
+LIMIT %s
+"""
+
+GENRE_TOP_QUERY: str = """
+SELECT genre_id, track_id, track_title, listens
+FROM (
+    SELECT
+        tg.genre_id,
+        p.track_id,
+        p.track_title,
+        p.listens,
+        ROW_NUMBER() OVER (PARTITION BY tg.genre_id ORDER BY p.listens DESC, p.track_id) AS position
+    FROM mv_track_popularity p
+    JOIN track_genre tg ON tg.track_id = p.track_id
+) ranked
+WHERE position <= %s
+ORDER BY genre_id, position
+"""
+
+GENRE_TRACKS_QUERY: str = """
+SELECT tg.genre_id, t.track_id, t.track_title
+FROM track t
+LEFT JOIN track_genre tg ON tg.track_id = t.track_id
+ORDER BY tg.genre_id, t.track_id
+"""
+
+GENRE_PREFERENCE_COUNTS_QUERY: str = """
+SELECT genre_id, count(*)
+FROM genre_preference
+GROUP BY genre_id
+"""
+
+
+class PopularityIndex:
+    """Listes triées par écoutes décroissantes (puis track_id), globale et par genre."""
+
+    def __init__(
+        self,
+        depth: int,
+        most_listened: List[Track],
+        by_genre: Dict[str, List[Track]],
+        preference_counts: Dict[str, int],
+        genre_tracks: Dict[Optional[str], List[Tuple[str, str]]],
+    ) -> None:
+        self.depth = depth
+        self.loaded_at = time.monotonic()
+        self.most_listened = most_listened
+        self.by_genre = by_genre
+        self.preference_counts = preference_counts
+        # Toutes les pistes de chaque genre (clé None : pistes sans genre), pas seulement le top N
+        self.genre_tracks = genre_tracks
+        # Groupes d'ex aequo sans filtre de genre, calculés une fois par chargement
+        self.preferred_groups = self._tie_groups(list(genre_tracks))
+        self._groups_by_genres: Dict[Tuple[str, ...], List[List[Track]]] = {}
+
+    @classmethod
+    def load(cls, conn, depth: int) -> "PopularityIndex":
+        with conn.cursor() as cur:
+            cur.execute(GLOBAL_TOP_QUERY, (depth,))
+            most_listened = [(str(row[0]), row[1], int(row[2])) for row in cur.fetchall()]
+            cur.execute(GENRE_TOP_QUERY, (depth,))
+            by_genre: Dict[str, List[Track]] = {}
+            for genre_id, track_id, title, listens in cur.fetchall():
+                by_genre.setdefault(str(genre_id), []).append((str(track_id), title, int(listens)))
+            cur.execute(GENRE_PREFERENCE_COUNTS_QUERY)
+            preference_counts = {str(genre_id): int(count) for genre_id, count in cur.fetchall()}
+            cur.execute(GENRE_TRACKS_QUERY)
+            genre_tracks: Dict[Optional[str], List[Tuple[str, str]]] = {}
+            for genre_id, track_id, title in cur.fetchall():
+                key = None if genre_id is None else str(genre_id)
+                genre_tracks.setdefault(key, []).append((str(track_id), title))
+        return cls(depth, most_listened, by_genre, preference_counts, genre_tracks)
+
+    def top_listened(self, genre_ids: Sequence[str], limit: int) -> List[Track]:
+        """
+        Pistes les plus écoutées (au moins une écoute), dans les genres donnés s'il y en a.
+        Fusion des listes par genre : une piste de plusieurs genres n'est comptée qu'une fois.
+        """
+        if genre_ids:
+            lists = [self.by_genre.get(str(genre_id), []) for genre_id in genre_ids]
+            candidates = heapq.merge(*lists, key=lambda track: (-track[2], track[0]))
+        else:
+            candidates = iter(self.most_listened)
+
+        rows: List[Track] = []
+        seen = set()
+        for track in candidates:
+            if len(rows) >= limit or track[2] <= 0:
+                break
+            if track[0] not in seen:
+                seen.add(track[0])
+                rows.append(track)
+        return rows
+
+    def top_preferred_genres(self, genre_ids: Sequence[str], limit: int) -> List[Track]:
+        """
+        Pistes des genres les plus choisis dans genre_preference (parmi ceux donnés s'il y en a),
+        score = nombre de comptes ayant choisi le genre ; tirage aléatoire parmi toutes les pistes
+        ex aequo, comme l'ancien ORDER BY score DESC, random().
+        """
+        if genre_ids:
+            key = tuple(sorted({str(genre_id) for genre_id in genre_ids}))
+            groups = self._groups_by_genres.get(key)
+            if groups is None:
+                if len(self._groups_by_genres) >= TIE_GROUPS_CACHE_SIZE:
+                    self._groups_by_genres.clear()
+                groups = self._groups_by_genres[key] = self._tie_groups(list(key))
+        else:
+            groups = self.preferred_groups
+
+        rows: List[Track] = []
+        for group in groups:
+            rows.extend(random.sample(group, min(len(group), limit - len(rows))))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def _tie_groups(self, genres: List[Optional[str]]) -> List[List[Track]]:
+        """
+        Pistes des genres donnés regroupées par score décroissant, chacune dans le groupe de son
+        meilleur genre (le MAX(score) d'origine). Les pistes sans genre (None) ont un score nul,
+        comme avec le LEFT JOIN d'origine.
+        """
+        genres = sorted(genres, key=lambda genre_id: -self.preference_counts.get(genre_id, 0))
+        groups: List[List[Track]] = []
+        seen = set()
+        for score, group in groupby(genres, key=lambda genre_id: self.preference_counts.get(genre_id, 0)):
+            tied = {
+                track_id: (track_id, title, score)
+                for genre_id in group
+                for track_id, title in self.genre_tracks.get(genre_id, [])
+                if track_id not in seen
+            }
+            seen.update(tied)
+            if tied:
+                groups.append(list(tied.values()))
+        return groups
+
+
+_index: Optional[PopularityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_popularity_index(conn, min_depth: int = 0) -> PopularityIndex:
+    """Index partagé par le processus, rechargé après POPULARITY_CACHE_TTL secondes."""
+    global _index
+    ttl = float(os.getenv("POPULARITY_CACHE_TTL", "300"))
+    depth = max(int(os.getenv("POPULARITY_CACHE_DEPTH", "200")), min_depth)
+    with _index_lock:
+        index = _index
+        if index is None or index.depth < depth or time.monotonic() - index.loaded_at > ttl:
+            index = PopularityIndex.load(conn, depth)
+            _index = index
+    return index
+
+
+def invalidate_popularity_index() -> None:
+    """Force le rechargement au prochain appel (après un rafraîchissement de la vue)."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,431 @@
+"""
+Service de recommandation asynchrone : les recommandeurs T3 restent chargés entre deux requêtes.
+
+En CLI, chaque appel rouvre une connexion, relit le catalogue et réapprend les
+vectoriseurs. Ici tout est chargé une fois au démarrage (index ANN des vecteurs de
+préférences, catalogue et vectoriseurs de item_based_audio, features de
+item_based_song_user) ; la boucle asyncio ne
+fait que le HTTP, le calcul (NumPy, scikit-learn, requêtes) part dans un pool de threads.
+
+- GET /recommend/user/<account_id>?n=10 : user_based (voisins des vecteurs de préférences).
+  Les requêtes arrivées dans la même fenêtre (--batch-window-ms) sont regroupées en un
+  seul appel à recommend_batch : deux requêtes SQL pour tout le lot.
+- GET /recommend/user/<account_id>?method=profile : user_based_user_profile.
+- GET /recommend/user/<account_id>?method=mk1|mk2|mk3|mk4 : item_based_song_user
+  (recommend_tracks de item_based_mkN, sur les StoredFeatures chargées au démarrage).
+- GET /recommend/track/<track_id>?n=10&audio_weight=0.5 : item_based_audio (MK2).
+- GET /health : état des composants chargés.
+
+Une requête qui dépasse --timeout reçoit 504, au-delà de --max-pending requêtes en
+cours le service répond 503. La base est celle de db_pool (.env à la racine, ou --env) :
+une base PostgreSQL locale ou de test suffit.
+
+Usage :
+    python T3_Recommandation/src/recommendation_service.py --port 8766
+    curl localhost:8766/recommend/user/<account_id>?n=10
+    curl localhost:8766/recommend/track/<track_id>
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# user_based.py importe ses voisins (vector_index, ...) sans préfixe de paquet,
+# item_based_mkN importe utils.* depuis item_based_song_user
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(SRC_DIR, "user_based"))
+sys.path.append(os.path.join(SRC_DIR, "item_based_song_user"))
+
+from db_pool import get_pool, pooled_connection  # noqa: E402
+from item_based import item_based_mk1, item_based_mk2, item_based_mk3, item_based_mk4  # noqa: E402
+from item_based_audio.item_based_audio_mk2 import TrackModel, load_track_model, recommend_for_track  # noqa: E402
+from user_based import MAX, canonical_id, recommend_batch  # noqa: E402
+from user_based_user_profile import recommend_for_user  # noqa: E402
+from utils.feature_store import StoredFeatures, load_track_features  # noqa: E402
+from vector_index import PreferenceIndex  # noqa: E402
+
+
+MAX_RESULTS: int = 100
+KEEP_ALIVE_SECONDS: float = 15.0
+
+ITEM_BASED: Dict[str, Any] = {
+    "mk1": item_based_mk1,
+    "mk2": item_based_mk2,
+    "mk3": item_based_mk3,
+    "mk4": item_based_mk4,
+}
+
+STATUS_TEXT: Dict[int, str] = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Recommenders:
+    """Modèles chargés une fois ; lus en parallèle par les threads du pool."""
+
+    def __init__(self, use_ann: bool = True, load_tracks: bool = True) -> None:
+        self.use_ann = use_ann
+        self.load_tracks = load_tracks
+        self.index: Optional[PreferenceIndex] = None
+        self.track_model: Optional[TrackModel] = None
+        self.features: Optional[StoredFeatures] = None
+        self.load_seconds: Dict[str, float] = {}
+
+    def load(self) -> None:
+        if self.use_ann and PreferenceIndex.exists():
+            started = time.perf_counter()
+            self.index = PreferenceIndex.load()
+            self.load_seconds["preference_index"] = time.perf_counter() - started
+        if self.load_tracks:
+            started = time.perf_counter()
+            self.track_model = load_track_model()
+            self.load_seconds["track_model"] = time.perf_counter() - started
+            if self.track_model is not None and self.track_model.track_index:
+                # Premier appel à blanc : index pandas et caches scikit-learn prêts avant la première requête
+                recommend_for_track(self.track_model.track_index[0], 1, model=self.track_model)
+            started = time.perf_counter()
+            self.features = load_track_features()
+            self.load_seconds["track_features"] = time.perf_counter() - started
+
+    def users(self, account_ids: Sequence[str], top: int) -> Dict[str, List[Tuple[str, str, float]]]:
+        with pooled_connection() as conn:
+            return recommend_batch(conn.cursor(), account_ids, MAX, self.index, top)
+
+    def user_profile(self, account_id: str, n: int) -> List[Tuple[str, str, int]]:
+        return recommend_for_user(account_id, limit=n)
+
+    def item_based(self, method: str, account_id: str, n: int) -> List[Dict[str, Any]]:
+        if self.features is None:
+            raise HttpError(503, "track features not loaded (no catalog, or started with --no-tracks)")
+        return ITEM_BASED[method].recommend_tracks(account_id, n, features=self.features)
+
+    def track(self, track_id: str, n: int, audio_weight: float) -> List[Dict[str, Any]]:
+        if self.track_model is None:
+            raise HttpError(503, "track recommender not loaded (no catalog, or started with --no-tracks)")
+        return recommend_for_track(track_id, n, audio_weight=audio_weight, model=self.track_model)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "preference_index": self.index is not None,
+            "tracks": len(self.track_model.track_index) if self.track_model is not None else 0,
+            "track_features": len(self.features) if self.features is not None else 0,
+            "load_seconds": {name: round(seconds, 3) for name, seconds in self.load_seconds.items()},
+        }
+
+
+@dataclass
+class _PendingUser:
+    account_id: str
+    top: int
+    future: asyncio.Future = field(repr=False)
+
+
+class UserBatcher:
+    """
+    File des requêtes /recommend/user : le premier arrivé ouvre une fenêtre de `window`
+    secondes, tout ce qui arrive pendant ce temps (jusqu'à `max_batch`) part dans le même
+    appel à `run_batch(account_ids, top)`. Au plus `concurrency` lots s'exécutent à la fois.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Sequence[str], int], Dict[str, list]],
+        executor: ThreadPoolExecutor,
+        window: float,
+        max_batch: int,
+        concurrency: int,
+    ) -> None:
+        self.run_batch = run_batch
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.queue: "asyncio.Queue[_PendingUser]" = asyncio.Queue()
+        self.slots = asyncio.Semaphore(concurrency)
+        self.batch_sizes: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def submit(self, account_id: str, top: int) -> list:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_PendingUser(account_id, top, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._execute(batch))
+
+    async def _execute(self, batch: List[_PendingUser]) -> None:
+        try:
+            # Les requêtes déjà expirées (504) ne sont pas calculées
+            batch = [pending for pending in batch if not pending.future.done()]
+            if not batch:
+                return
+            account_ids = list(dict.fromkeys(pending.account_id for pending in batch))
+            top = max(pending.top for pending in batch)
+            self.batch_sizes.append(len(account_ids))
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.run_batch, account_ids, top
+                )
+            except Exception as exc:  # noqa: BLE001
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+                return
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_result(results.get(pending.account_id, [])[: pending.top])
+        finally:
+            self.slots.release()
+
+
+def _int_param(query: Dict[str, List[str]], name: str, default: int, maximum: int) -> int:
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"'{name}' must be an integer") from None
+    if not 1 <= value <= maximum:
+        raise HttpError(400, f"'{name}' must be between 1 and {maximum}")
+    return value
+
+
+def _float_param(query: Dict[str, List[str]], name: str, default: float) -> float:
+    try:
+        return float(query.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"'{name}' must be a number") from None
+
+
+class RecommendationService:
+    def __init__(
+        self,
+        recommenders: Recommenders,
+        threads: int = 4,
+        batch_window: float = 0.005,
+        max_batch: int = 64,
+        timeout: float = 10.0,
+        max_pending: int = 256,
+    ) -> None:
+        self.recommenders = recommenders
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="recommend")
+        self.threads = threads
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batcher: Optional[UserBatcher] = None
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.recommenders.load)
+        self.batcher = UserBatcher(
+            self.recommenders.users, self.executor, self.batch_window, self.max_batch, self.threads
+        )
+        self.batcher.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self) -> None:
+        if self.batcher is not None:
+            await self.batcher.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _in_thread(self, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def recommend_user(self, account_id: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        n = _int_param(query, "n", 10, MAX_RESULTS)
+        method = query.get("method", ["vector"])[0]
+        canonical = canonical_id(account_id)
+        if canonical is None:
+            raise HttpError(400, f"invalid account id '{account_id}'")
+        if method == "vector":
+            rows = await self.batcher.submit(canonical, n)
+        elif method == "profile":
+            rows = await self._in_thread(self.recommenders.user_profile, canonical, n)
+        elif method in ITEM_BASED:
+            tracks = await self._in_thread(self.recommenders.item_based, method, canonical, n)
+            return {"account_id": canonical, "method": method, "tracks": tracks}
+        else:
+            raise HttpError(400, f"'method' must be one of vector, profile, {', '.join(ITEM_BASED)}")
+        tracks = [{"track_id": str(track_id), "title": title, "score": float(score)} for track_id, title, score in rows]
+        return {"account_id": canonical, "method": method, "tracks": tracks}
+
+    async def recommend_track(self, track_id: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        n = _int_param(query, "n", 10, MAX_RESULTS)
+        audio_weight = _float_param(query, "audio_weight", 0.5)
+        try:
+            tracks = await self._in_thread(self.recommenders.track, track_id, n, audio_weight)
+        except ValueError as exc:
+            # Piste absente du catalogue chargé, ou audio_weight hors de [0, 1]
+            status = 404 if "not found" in str(exc) else 400
+            raise HttpError(status, str(exc)) from None
+        return {"track_id": track_id, "tracks": tracks}
+
+    async def dispatch(self, method: str, target: str) -> Tuple[int, Dict[str, Any]]:
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        if method != "GET":
+            raise HttpError(405, f"{method} not supported, use GET")
+        if parts == ["health"]:
+            health = self.recommenders.health()
+            health.update(pending=self.pending, threads=self.threads, batches=len(self.batcher.batch_sizes))
+            return 200, health
+        if len(parts) != 3 or parts[0] != "recommend" or parts[1] not in ("user", "track"):
+            raise HttpError(404, f"unknown path {url.path}")
+
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "too many pending requests, retry later")
+        self.pending += 1
+        try:
+            handler = self.recommend_user if parts[1] == "user" else self.recommend_track
+            return 200, await asyncio.wait_for(handler(parts[2], query), self.timeout)
+        except asyncio.TimeoutError:
+            raise HttpError(504, f"recommendation exceeded {self.timeout:g}s") from None
+        finally:
+            self.pending -= 1
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """HTTP/1.1 minimal : requêtes GET, réponses JSON, connexions persistantes."""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("content-length", "0").isdigit():
+                    await reader.readexactly(int(headers.get("content-length", "0")))
+
+                parts = request_line.decode("latin-1").split()
+                keep_alive = (
+                    len(parts) == 3 and parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                )
+                try:
+                    if len(parts) != 3:
+                        raise HttpError(400, "malformed request line")
+                    status, payload = await self.dispatch(parts[0], parts[1])
+                except HttpError as exc:
+                    status, payload = exc.status, {"error": str(exc)}
+                except Exception as exc:  # noqa: BLE001
+                    status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                        "Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Client parti, ou ligne plus longue que la limite du StreamReader
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    recommenders = Recommenders(use_ann=not args.no_ann, load_tracks=not args.no_tracks)
+    service = RecommendationService(
+        recommenders,
+        threads=args.threads,
+        batch_window=args.batch_window_ms / 1000,
+        max_batch=args.max_batch,
+        timeout=args.timeout,
+        max_pending=args.max_pending,
+    )
+    server = await service.start(args.host, args.port)
+    health = recommenders.health()
+    print(
+        f"Recommendation service listening on http://{args.host}:{args.port} "
+        f"(ANN index: {'yes' if health['preference_index'] else 'no'}, {health['tracks']} tracks, "
+        f"{args.threads} threads)"
+    )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the T3 recommenders from preloaded models.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--env", type=Path, default=None, help=".env file with the DB settings (default: repo root)")
+    parser.add_argument("--threads", type=int, default=4, help="Worker threads for NumPy work and queries (<= DB_POOL_MAX)")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0, help="How long the first user request waits for others")
+    parser.add_argument("--max-batch", type=int, default=64, help="Users per recommend_batch call")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a request gets 504")
+    parser.add_argument("--max-pending", type=int, default=256, help="Requests in flight before 503")
+    parser.add_argument("--no-ann", action="store_true", help="Find user neighbours with SQL even if the ANN index exists")
+    parser.add_argument("--no-tracks", action="store_true", help="Do not load the track catalog (/recommend/track and method=mkN disabled)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    # Crée le pool avec le bon .env avant que les recommandeurs n'empruntent une connexion
+    get_pool(args.env)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+"""
+Graphe des utilisateurs similaires, précalculé pour user_based_user_profile.py.
+
+Le score entre deux comptes est celui du recommandeur : somme pondérée des réponses
+identiques (ou proches, à une tolérance près) dans `preference`. Au lieu d'évaluer
+les quinze CASE pour un compte contre toute la table à chaque requête, ce job score
+toutes les paires en une fois avec NumPy et garde, pour chaque compte, ses K meilleurs
+voisins dans la table `similar_user` (migration T2_BDD 003).
+
+Chaque règle devient un produit scalaire : une colonne est encodée en one-hot sur ses
+valeurs distinctes (NULL : ligne nulle, jamais égale), et la matrice valeur x valeur
+« égales » ou « à moins de la tolérance », pondérée, est repliée d'un côté. Le score de
+toutes les paires est alors L @ R.T, calculé par blocs de lignes.
+
+Usage :
+    python T3_Recommandation/src/similar_users.py [--k 50] [--block 512] [--verify 20]
+"""
+
+import argparse
+import io
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db_pool import pooled_connection
+
+
+SIMILAR_USERS_K: int = 50
+BLOCK_SIZE: int = 512
+
+
+@dataclass(frozen=True)
+class SimilarityRule:
+    """Une composante du score : colonne, poids, tolérance (None : égalité stricte)."""
+
+    column: str
+    weight: int
+    tolerance: Optional[float] = None
+
+
+SIMILARITY_RULES: Tuple[SimilarityRule, ...] = (
+    SimilarityRule("age_range", 3),
+    SimilarityRule("gender", 2),
+    SimilarityRule("platform", 2),
+    SimilarityRule("how", 2),
+    SimilarityRule("context", 1),
+    SimilarityRule("frequency", 1),
+    SimilarityRule("when_listening", 1),
+    SimilarityRule("feeling_pref", 1),
+    SimilarityRule("energy_pref", 1),
+    SimilarityRule("is_live_pref", 1),
+    SimilarityRule("utility", 1),
+    SimilarityRule("duration_pref", 1, 5),
+    SimilarityRule("quality_pref", 1, 2),
+    SimilarityRule("curiosity_pref", 1, 2),
+    SimilarityRule("tempo_pref", 1, 10),
+)
+
+
+def similarity_score_sql(candidate: str = "p", target: str = "t") -> str:
+    """Expression SQL du score entre les alias `candidate` et `target` (mêmes règles que NumPy)."""
+    terms = []
+    for rule in SIMILARITY_RULES:
+        p, t = f"{candidate}.{rule.column}", f"{target}.{rule.column}"
+        if rule.tolerance is None:
+            condition = f"{p} IS NOT NULL AND {p} = {t}"
+        else:
+            condition = f"{p} IS NOT NULL AND {t} IS NOT NULL AND ABS({p} - {t}) <= {rule.tolerance:g}"
+        terms.append(f"(CASE WHEN {condition} THEN {rule.weight} ELSE 0 END)")
+    return " +\n".join(terms)
+
+
+# Voisins calculés à la volée, pour un compte absent du graphe (inscrit depuis le dernier calcul).
+# Même départage des ex aequo que le graphe : account_id croissant.
+LIVE_SIMILAR_USERS_QUERY: str = f"""
+WITH target AS (
+    SELECT * FROM preference WHERE account_id = %(account_id)s
+)
+SELECT p.account_id, (
+{similarity_score_sql()}
+) AS score
+FROM preference p
+CROSS JOIN target t
+WHERE p.account_id <> %(account_id)s
+ORDER BY score DESC, p.account_id
+LIMIT %(k)s
+"""
+
+GRAPH_SIMILAR_USERS_QUERY: str = """
+SELECT similar_account_id, score
+FROM similar_user
+WHERE account_id = %s
+ORDER BY rank
+"""
+
+
+def fetch_similar_users(conn, account_id: str, k: int = SIMILAR_USERS_K) -> List[Tuple[str, int]]:
+    """(account_id, score) des voisins du compte : lus dans le graphe, calculés à la volée s'il n'y figure pas."""
+    with conn.cursor() as cur:
+        cur.execute(GRAPH_SIMILAR_USERS_QUERY, (account_id,))
+        rows = cur.fetchall()
+        if not rows:
+            cur.execute(LIVE_SIMILAR_USERS_QUERY, {"account_id": account_id, "k": k})
+            rows = cur.fetchall()
+    return rows
+
+
+def load_preferences(conn) -> Tuple[List[str], dict]:
+    """account_id (ordre de la base) et valeurs de chaque colonne des règles."""
+    columns = [rule.column for rule in SIMILARITY_RULES]
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT account_id, {', '.join(columns)} FROM preference ORDER BY account_id")
+        rows = cur.fetchall()
+    account_ids = [str(row[0]) for row in rows]
+    values = {column: [row[i] for row in rows] for i, column in enumerate(columns, start=1)}
+    return account_ids, values
+
+
+def encode_rules(values: dict, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrices (n_rows, D) telles que (L @ R.T)[i, j] = score(i, j) : L est le one-hot des
+    valeurs de chaque compte, R le one-hot multiplié par la matrice de correspondance pondérée.
+    """
+    left_blocks, right_blocks = [], []
+    for rule in SIMILARITY_RULES:
+        cells = values[rule.column]
+        distinct = sorted({cell for cell in cells if cell is not None})
+        if not distinct:
+            continue
+        position = {value: i for i, value in enumerate(distinct)}
+        codes = np.fromiter((position.get(cell, -1) for cell in cells), np.intp, n_rows)
+
+        onehot = np.zeros((n_rows, len(distinct)), dtype=np.float32)
+        known = codes >= 0
+        onehot[np.flatnonzero(known), codes[known]] = 1.0
+
+        if rule.tolerance is None:
+            match = np.eye(len(distinct), dtype=np.float32)
+        else:
+            numeric = np.asarray(distinct, dtype=np.float64)
+            match = (np.abs(numeric[:, None] - numeric[None, :]) <= rule.tolerance).astype(np.float32)
+        left_blocks.append(onehot)
+        right_blocks.append(onehot @ (rule.weight * match))
+    return np.hstack(left_blocks), np.hstack(right_blocks)
+
+
+def top_k_similar(left: np.ndarray, right: np.ndarray, k: int, block: int = BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices (n, k) des K meilleurs voisins de chaque ligne (elle-même exclue) et leurs scores,
+    par score décroissant puis indice croissant.
+    """
+    n_rows = left.shape[0]
+    k = min(k, n_rows - 1)
+    neighbours = np.empty((n_rows, k), dtype=np.int64)
+    scores = np.empty((n_rows, k), dtype=np.int32)
+    # Les scores sont entiers : une fraction décroissante avec l'indice départage les ex aequo
+    # sans changer l'ordre des scores (float64 : exact bien au-delà du nombre de comptes)
+    tie_break = np.arange(n_rows, 0, -1, dtype=np.float64) / (n_rows + 1)
+    keys = np.empty((min(block, n_rows), n_rows), dtype=np.float64)
+
+    for start in range(0, n_rows, block):
+        end = min(start + block, n_rows)
+        rows = np.arange(end - start)
+        block_scores = left[start:end] @ right.T
+        block_keys = keys[: end - start]
+        np.add(block_scores, tie_break, out=block_keys)
+        block_keys[rows, rows + start] = -1.0
+        best = np.argpartition(block_keys, -k, axis=1)[:, -k:]
+        order = np.argsort(-np.take_along_axis(block_keys, best, axis=1), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        neighbours[start:end] = best
+        scores[start:end] = np.rint(np.take_along_axis(block_scores, best, axis=1))
+    return neighbours, scores
+
+
+def write_graph(conn, account_ids: Sequence[str], neighbours: np.ndarray, scores: np.ndarray) -> int:
+    """
+    Remplace le contenu de similar_user dans une transaction : TRUNCATE bloque les lectures
+    le temps du COPY (quelques secondes), elles voient ensuite le nouveau graphe.
+    """
+    ids = np.asarray(account_ids, dtype=object)
+    k = neighbours.shape[1]
+    buffer = io.StringIO()
+    for i, account_id in enumerate(account_ids):
+        for rank, (j, score) in enumerate(zip(ids[neighbours[i]], scores[i]), start=1):
+            buffer.write(f"{account_id}\t{j}\t{score}\t{rank}\n")
+    buffer.seek(0)
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE similar_user")
+        cur.copy_expert("COPY similar_user (account_id, similar_account_id, score, rank) FROM STDIN", buffer)
+    conn.commit()
+    return len(account_ids) * k
+
+
+def verify_sample(conn, account_ids: Sequence[str], left: np.ndarray, right: np.ndarray, sample: int) -> int:
+    """Compare les scores NumPy à l'expression SQL pour `sample` comptes ; retourne le nombre d'écarts."""
+    rng = np.random.default_rng(0)
+    position = {account_id: i for i, account_id in enumerate(account_ids)}
+    mismatches = 0
+    with conn.cursor() as cur:
+        for i in rng.choice(len(account_ids), min(sample, len(account_ids)), replace=False):
+            cur.execute(
+                f"""
+                SELECT p.account_id, ({similarity_score_sql()}) AS score
+                FROM preference p
+                CROSS JOIN (SELECT * FROM preference WHERE account_id = %s) t
+                """,
+                (account_ids[i],),
+            )
+            expected = np.rint(left[i] @ right.T)
+            for account_id, score in cur.fetchall():
+                if expected[position[str(account_id)]] != score:
+                    mismatches += 1
+    return mismatches
+
+
+def build_graph(conn, k: int = SIMILAR_USERS_K, block: int = BLOCK_SIZE, verify: int = 0) -> dict:
+    """Recalcule tout le graphe ; retourne les durées de chaque étape."""
+    timings = {}
+    started = time.perf_counter()
+    account_ids, values = load_preferences(conn)
+    timings["load_s"] = time.perf_counter() - started
+    if len(account_ids) < 2:
+        raise ValueError("at least two rows in preference are needed to build the similar-user graph")
+
+    started = time.perf_counter()
+    left, right = encode_rules(values, len(account_ids))
+    neighbours, scores = top_k_similar(left, right, k, block)
+    timings["score_s"] = time.perf_counter() - started
+
+    if verify:
+        timings["mismatches"] = verify_sample(conn, account_ids, left, right, verify)
+        if timings["mismatches"]:
+            raise ValueError(f"{timings['mismatches']} scores differ from the SQL expression, graph not written")
+
+    started = time.perf_counter()
+    timings["rows"] = write_graph(conn, account_ids, neighbours, scores)
+    timings["write_s"] = time.perf_counter() - started
+    timings["accounts"] = len(account_ids)
+    return timings
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute the top-K similar users of every account.")
+    parser.add_argument("--k", type=int, default=SIMILAR_USERS_K, help="Neighbours kept per account")
+    parser.add_argument("--block", type=int, default=BLOCK_SIZE, help="Accounts scored per matrix product")
+    parser.add_argument("--verify", type=int, default=0, help="Check the scores of N random accounts against SQL first")
+    args = parser.parse_args(argv)
+
+    with pooled_connection() as conn:
+        timings = build_graph(conn, args.k, args.block, args.verify)
+    print(
+        f"{timings['accounts']} accounts, {timings['rows']} rows written "
+        f"(load {timings['load_s']:.2f}s, score {timings['score_s']:.2f}s, write {timings['write_s']:.2f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,8 @@ CREATE EXTENSION IF NOT EXISTS vector;
 CREATE TABLE preference_vector (
     account_id UUID,
     embedding VECTOR(71),
+    -- md5 de la ligne preference d'origine (populate_vectors.py --incremental)
+    source_hash TEXT,
     PRIMARY KEY (account_id),
     FOREIGN KEY (account_id) REFERENCES "user"(account_id)
 );
@@ -18,6 +18,25 @@ multi_values: set[str] = {
     "utility",
 }
 
+# Colonnes dont la cellule est une liste Python (`str(list)`) ; energy_pref est séparée par ",  "
+literal_list_values: set[str] = {
+    "context",
+    "how",
+    "platform",
+    "utility",
+}
+
+# Valeur maximale de chaque colonne : la composante du vecteur est ramenée dans [0, 1] (1 par défaut)
+pref_max_values: dict[str, float] = {
+    "duration_pref": 11.0,
+    "age_range": 6.0,
+    "frequency": 2.0,
+    "when_listening": 4.0,
+    "tempo_pref": 4.0,
+    "quality_pref": 4.0,
+    "curiosity_pref": 4.0,
+}
+
 
 pref_to_vec_map: dict[str, dict[str, None | dict[str, float]]] = {
     "age_range": {
@@ -1,116 +1,156 @@
+import argparse
+import io
 import os
-import psycopg2
-
-from dotenv import load_dotenv
-from typing import cast
-from ast import literal_eval
-
-from local_types import pref_type
-from consts import (
-    multi_values,
-    pref_to_vec_map,
-)
-
-
-def main() -> None:
-    load_dotenv()
-
-    connection = psycopg2.connect(
-        host="localhost",
-        port=os.environ["PGDB_PORT"],
-        dbname=os.environ["DB_NAME"],
-        user=os.environ["DB_USER"],
-        password=os.environ["DB_ROOT_PASSWORD"],
+import sys
+import time
+
+from typing import Sequence
+
+import numpy as np
+
+from preference_encoder import PreferenceEncoder
+from vector_index import DEFAULT_INDEX_DIR, sync_index
+
+# db_pool.py est partagé par tous les recommandeurs (T3_Recommandation/src)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import pooled_connection
+
+
+BATCH_SIZE: int = 5000
+
+# md5 de la ligne entière : toute modification d'une colonne de preference change l'empreinte
+SELECT_PREFS_QUERY: str = """
+SELECT md5(p::text) AS source_hash, p.*
+FROM preference p
+"""
+
+# Comptes sans vecteur, ou dont la ligne preference a changé depuis le calcul du vecteur
+SELECT_CHANGED_PREFS_QUERY: str = """
+SELECT md5(p::text) AS source_hash, p.*
+FROM preference p
+LEFT JOIN preference_vector v ON v.account_id = p.account_id
+WHERE v.source_hash IS DISTINCT FROM md5(p::text)
+"""
+
+CREATE_STAGING_QUERY: str = """
+CREATE TEMP TABLE stg_preference_vector (
+    account_id UUID,
+    embedding VECTOR(71),
+    source_hash TEXT
+) ON COMMIT DROP;
+"""
+
+UPSERT_QUERY: str = """
+INSERT INTO preference_vector (account_id, embedding, source_hash)
+SELECT account_id, embedding, source_hash
+FROM stg_preference_vector
+ON CONFLICT (account_id) DO UPDATE
+SET embedding = EXCLUDED.embedding,
+    source_hash = EXCLUDED.source_hash
+-- Une ligne identique n'est pas réécrite : l'index HNSW n'a rien à mettre à jour
+WHERE (preference_vector.embedding, preference_vector.source_hash)
+    IS DISTINCT FROM (EXCLUDED.embedding, EXCLUDED.source_hash);
+"""
+
+# Vecteurs dont la ligne preference a disparu
+DELETE_ORPHANS_QUERY: str = """
+DELETE FROM preference_vector v
+WHERE NOT EXISTS (SELECT 1 FROM preference p WHERE p.account_id = v.account_id);
+"""
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compute the preference vectors used by the user based recommender.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only recompute accounts whose preference row changed since the last run",
     )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows sent per COPY")
+    parser.add_argument("--skip-index", action="store_true", help="Do not update the in-process ANN index")
+    return parser.parse_args(argv)
+
 
-    cursor = connection.cursor()
+def has_source_hash(cursor) -> bool:
     cursor.execute(
-        "SELECT column_name, data_type, ordinal_position "
-        "FROM information_schema.columns "
-        "WHERE table_name = 'preference' "
-        "ORDER BY ordinal_position; "
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'preference_vector' AND column_name = 'source_hash';"
     )
-    prefs_columns: list[tuple[str, str, int]] = cursor.fetchall()
+    return cursor.fetchone() is not None
 
-    cursor.execute("DELETE FROM preference_vector;")
 
-    cursor.execute("SELECT * FROM preference;")
-    prefs: list[pref_type] = cursor.fetchall()
+def copy_vectors(cursor, account_ids: Sequence[str], vectors: np.ndarray, source_hashes: Sequence[str]) -> int:
+    """COPY d'un lot (account_id, vecteur, empreinte) dans la table de staging."""
+    buffer = io.StringIO()
+    for account_id, vector, source_hash in zip(account_ids, vectors.tolist(), source_hashes):
+        embedding = "[" + ",".join(map(repr, vector)) + "]"
+        buffer.write(f"{account_id}\t{embedding}\t{source_hash}\n")
+    buffer.seek(0)
+    cursor.copy_expert("COPY stg_preference_vector (account_id, embedding, source_hash) FROM STDIN", buffer)
+    return len(account_ids)
 
-    for pref in prefs:
-        vector: list[float] = create_vector(pref, prefs_columns)
-        cursor.execute(
-            "INSERT INTO preference_vector (account_id, embedding) VALUES (%s, %s)",
-            (pref[0], vector),
-        )
-
-    connection.commit()
 
+def main(argv: Sequence[str] | None = None) -> None:
+    args = parse_args(argv)
+    start = time.perf_counter()
 
-def create_vector(pref: pref_type, column: list[tuple[str, str, int]]) -> list[float]:
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        if not has_source_hash(cursor):
+            print(
+                "preference_vector.source_hash is missing: apply "
+                "T2_BDD/src/sql/migrations/002_preference_vector_source.sql"
+            )
+            exit(1)
 
-    def get_i_pref() -> int:
-        i_pref: int = 0
-        for col in column:
-            if col[0] == table_col:
+        cursor.execute(
+            "SELECT column_name, data_type, ordinal_position "
+            "FROM information_schema.columns "
+            "WHERE table_name = 'preference' "
+            "ORDER BY ordinal_position; "
+        )
+        prefs_columns: list[tuple[str, str, int]] = cursor.fetchall()
+        encoder = PreferenceEncoder([column[0] for column in prefs_columns])
+
+        cursor.execute(CREATE_STAGING_QUERY)
+        cursor.execute(DELETE_ORPHANS_QUERY)
+        removed: int = cursor.rowcount
+
+        # Curseur serveur : les lignes arrivent par lots, jamais toutes en mémoire
+        prefs_cursor = connection.cursor(name="preference_rows")
+        prefs_cursor.itersize = args.batch_size
+        prefs_cursor.execute(SELECT_CHANGED_PREFS_QUERY if args.incremental else SELECT_PREFS_QUERY)
+
+        computed: int = 0
+        while True:
+            rows = prefs_cursor.fetchmany(args.batch_size)
+            if not rows:
                 break
-            i_pref += 1
-        return i_pref
-
-    def get_values(table_col: str) -> list[str]:
-        values: list[str] = []
-        if table_col in ["energy_pref"]:
-            values = cast(str, pref[i_pref]).split(",  ")
-        elif table_col in ["context", "how", "platform", "utility"]:
-            values = literal_eval(cast(str, pref[i_pref]))
-        return values
-
-    def get_max(table_col: str) -> float:
-        result: float = 1.0
-        if table_col == "duration_pref":
-            result = 11.0
-        elif table_col == "age_range":
-            result = 6.0
-        elif table_col == "frequency":
-            result = 2.0
-        elif table_col in [
-            "when_listening",
-            "tempo_pref",
-            "quality_pref",
-            "curiosity_pref",
-        ]:
-            result = 4.0
-        return result
-
-    vector: list[float] = []
-
-    for vec_item in pref_to_vec_map.keys():
-        for table_col in pref_to_vec_map[vec_item].keys():
-            val: float
-            i_pref = get_i_pref()
-            val_to_vec_val = pref_to_vec_map[vec_item][table_col]
-            if val_to_vec_val is None:
-                val = float(pref[i_pref])
-            elif table_col in multi_values:
-                values: list[str] = get_values(table_col)
-                val = 0.0
-                for value in values:
-                    if value in val_to_vec_val.keys():
-                        val = val_to_vec_val[value]
-            else:
-                try:
-                    val = val_to_vec_val[cast(str, pref[i_pref])]
-                except KeyError:
-                    val = 0.0
-            val /= get_max(table_col)
-            vector.append(val)
-            # print(
-            #     f"{vec_item} {' ' * (30 - len(vec_item))}"
-            #     f"{table_col} {' ' * (14 - len(table_col))}"
-            #     f"{val}"
-            # )
-
-    return vector
+            prefs = [row[1:] for row in rows]
+            computed += copy_vectors(
+                cursor,
+                [pref[0] for pref in prefs],
+                encoder.encode(prefs),
+                [row[0] for row in rows],
+            )
+        prefs_cursor.close()
+
+        cursor.execute(UPSERT_QUERY)
+        written: int = cursor.rowcount
+        connection.commit()
+
+        # L'index ANN (vector_index.py), s'il a été construit, suit les vecteurs écrits
+        index_stats = None if args.skip_index else sync_index(connection, DEFAULT_INDEX_DIR)
+
+    mode = "incremental" if args.incremental else "full"
+    print(
+        f"{computed} vectors computed, {written} written, {removed} removed "
+        f"({mode}, {time.perf_counter() - start:.2f}s)"
+    )
+    if index_stats is not None:
+        state = "rebuilt" if index_stats.rebuilt else "updated"
+        print(f"ANN index {state}: {index_stats.added} added, {index_stats.updated} updated, {index_stats.removed} removed")
 
 
 if __name__ == "__main__":
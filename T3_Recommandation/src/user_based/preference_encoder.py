@@ -0,0 +1,104 @@
+from ast import literal_eval
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from consts import (
+    literal_list_values,
+    multi_values,
+    pref_max_values,
+    pref_to_vec_map,
+)
+
+
+ENERGY_PREF_SEPARATOR: str = ",  "
+
+
+@dataclass(frozen=True)
+class VectorComponent:
+    """Une composante du vecteur : colonne lue, table valeur -> nombre (None : valeur numérique), diviseur."""
+
+    name: str
+    column: str
+    mapping: None | dict[str, float]
+    max_value: float
+
+
+def parse_multi_value(column: str, raw: None | str) -> list[str]:
+    """Valeurs d'une cellule multi-valuée (vide si NULL)."""
+    if raw is None:
+        return []
+    if column in literal_list_values:
+        return list(literal_eval(raw))
+    if column == "energy_pref":
+        return raw.split(ENERGY_PREF_SEPARATOR)
+    return []
+
+
+class PreferenceEncoder:
+    """
+    Encodeur compilé une fois depuis `pref_to_vec_map` : la liste des composantes,
+    l'indice de chaque colonne et les tables de correspondance sont résolus à la
+    construction. `encode` traite ensuite une colonne entière à la fois : chaque
+    valeur distincte (liste multi-valuée comprise) n'est convertie qu'une fois, puis
+    recopiée dans la matrice par indexation NumPy.
+    """
+
+    def __init__(self, columns: Sequence[str]) -> None:
+        self.components: list[VectorComponent] = [
+            VectorComponent(name, column, mapping, pref_max_values.get(column, 1.0))
+            for name, by_column in pref_to_vec_map.items()
+            for column, mapping in by_column.items()
+        ]
+        index: dict[str, int] = {column: i for i, column in enumerate(columns)}
+        missing: list[str] = sorted({c.column for c in self.components} - index.keys())
+        if missing:
+            raise ValueError(f"preference columns missing: {', '.join(missing)}")
+        self.column_index: dict[str, int] = index
+        # Composantes regroupées par colonne, avec leur position dans le vecteur
+        self.by_column: dict[str, list[tuple[int, VectorComponent]]] = {}
+        for position, component in enumerate(self.components):
+            self.by_column.setdefault(component.column, []).append((position, component))
+
+    @property
+    def dimension(self) -> int:
+        return len(self.components)
+
+    def encode(self, rows: Sequence[Sequence]) -> np.ndarray:
+        """Matrice float32 (len(rows), dimension), une ligne par ligne de `preference`."""
+        matrix = np.zeros((len(rows), self.dimension), dtype=np.float64)
+        if not rows:
+            return matrix.astype(np.float32)
+
+        for column, components in self.by_column.items():
+            i: int = self.column_index[column]
+            cells: list = [row[i] for row in rows]
+
+            if components[0][1].mapping is None:
+                values = np.array(cells, dtype=np.float64)
+                if np.isnan(values).any():
+                    raise ValueError(f"preference.{column} is NULL for {int(np.isnan(values).sum())} rows")
+                for position, component in components:
+                    matrix[:, position] = values / component.max_value
+                continue
+
+            # Codes des valeurs distinctes : une seule conversion par valeur
+            distinct: dict = {}
+            codes = np.fromiter((distinct.setdefault(cell, len(distinct)) for cell in cells), np.intp, len(cells))
+            if column in multi_values:
+                parsed: list[list[str]] = [parse_multi_value(column, cell) for cell in distinct]
+            for position, component in components:
+                mapping = component.mapping
+                if column in multi_values:
+                    # Comme avant : la dernière valeur reconnue de la liste l'emporte
+                    lookup = [
+                        next((mapping[value] for value in reversed(values) if value in mapping), 0.0)
+                        for values in parsed
+                    ]
+                else:
+                    lookup = [mapping.get(cell, 0.0) for cell in distinct]
+                matrix[:, position] = np.asarray(lookup, dtype=np.float64)[codes] / component.max_value
+
+        # Division en float64 puis arrondi : mêmes valeurs que pgvector à partir des anciens float Python
+        return matrix.astype(np.float32)
@@ -1,62 +1,235 @@
+import argparse
+import heapq
+import json
 import os
 import sys
-import psycopg2
 
-from dotenv import load_dotenv
+from typing import Iterable, Sequence
+from uuid import UUID
+
+# db_pool.py est partagé par tous les recommandeurs (T3_Recommandation/src)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import pooled_connection
+from vector_index import DEFAULT_NPROBE, PreferenceIndex
 
 
 MAX: int = 5
+TOP: int = 10
 
-GET_CLOSEST_USERS_QUERY: str = """
-SELECT 
-    account_id, 
-    -- Calcule la distance (plus c'est proche de 0, plus c'est similaire)
-    embedding <=> (SELECT embedding FROM preference_vector WHERE account_id = %s) AS distance
-FROM preference_vector
-WHERE account_id != %s -- On ne veut pas se recommander soi-même
-ORDER BY distance ASC
-LIMIT %s;
+# Voisins de plusieurs utilisateurs en une requête : un kNN par utilisateur (LATERAL),
+# trié sur l'expression de distance pour que l'index HNSW de preference_vector serve
+GET_CLOSEST_USERS_BATCH_QUERY: str = """
+SELECT target.account_id, neighbour.account_id, neighbour.distance
+FROM preference_vector target
+CROSS JOIN LATERAL (
+    SELECT pv.account_id, pv.embedding <=> target.embedding AS distance
+    FROM preference_vector pv
+    WHERE pv.account_id != target.account_id
+    ORDER BY pv.embedding <=> target.embedding
+    LIMIT %s
+) neighbour
+WHERE target.account_id = ANY(%s::uuid[])
+ORDER BY target.account_id, neighbour.distance;
 """
 
-GET_LISTENED_TRACKS_QUERY: str = """
-SELECT track.track_id, track.track_title
+GET_LISTENED_TRACKS_BATCH_QUERY: str = """
+SELECT track_user_listen.account_id, track.track_id, track.track_title, COALESCE(track_user_listen.count, 1)
 FROM track
 INNER JOIN track_user_listen
     ON track.track_id = track_user_listen.track_id
-WHERE track_user_listen.account_id = %s;
+WHERE track_user_listen.account_id = ANY(%s::uuid[]);
 """
 
+# Variante tout SQL : voisins, écoutes pondérées par (1 - distance) x count, exclusion de
+# l'historique de l'utilisateur et top-k par utilisateur ; seules les lignes retenues reviennent
+RECOMMEND_TOP_TRACKS_QUERY: str = """
+WITH neighbours AS (
+    SELECT target.account_id AS user_id, neighbour.account_id AS neighbour_id, neighbour.distance
+    FROM preference_vector target
+    CROSS JOIN LATERAL (
+        SELECT pv.account_id, pv.embedding <=> target.embedding AS distance
+        FROM preference_vector pv
+        WHERE pv.account_id != target.account_id
+        ORDER BY pv.embedding <=> target.embedding
+        LIMIT %(neighbours)s
+    ) neighbour
+    WHERE target.account_id = ANY(%(user_ids)s::uuid[])
+),
+scored AS (
+    SELECT nb.user_id, l.track_id, SUM(GREATEST(1 - nb.distance, 0) * COALESCE(l.count, 1)) AS score
+    FROM neighbours nb
+    JOIN track_user_listen l ON l.account_id = nb.neighbour_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM track_user_listen own
+        WHERE own.account_id = nb.user_id AND own.track_id = l.track_id
+    )
+    GROUP BY nb.user_id, l.track_id
+),
+ranked AS (
+    SELECT user_id, track_id, score,
+           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY score DESC, track_id) AS position
+    FROM scored
+)
+SELECT ranked.user_id, ranked.track_id, track.track_title, ranked.score
+FROM ranked
+JOIN track ON track.track_id = ranked.track_id
+WHERE ranked.position <= %(top)s
+ORDER BY ranked.user_id, ranked.position;
+"""
 
-def main() -> None:
-    user_id: str
+
+def canonical_id(account_id: str) -> str | None:
     try:
-        user_id = sys.argv[1]
-    except:
-        print("user_id missing")
-        exit(1)
+        return str(UUID(account_id))
+    except ValueError:
+        return None
 
-    load_dotenv()
 
-    connection = psycopg2.connect(
-        host="localhost",
-        port=os.environ["PGDB_PORT"],
-        dbname=os.environ["DB_NAME"],
-        user=os.environ["DB_USER"],
-        password=os.environ["DB_ROOT_PASSWORD"],
-    )
-    cursor = connection.cursor()
+def get_closest_users_batch(cursor, user_ids: Sequence[str], limit: int = MAX) -> dict[str, list[tuple[str, float]]]:
+    """{user_id: [(voisin, distance), ...]} du plus proche au plus éloigné ; absent si l'utilisateur n'a pas de vecteur."""
+    cursor.execute(GET_CLOSEST_USERS_BATCH_QUERY, (limit, list(user_ids)))
+    closest: dict[str, list[tuple[str, float]]] = {}
+    for user_id, neighbour_id, distance in cursor.fetchall():
+        closest.setdefault(str(user_id), []).append((str(neighbour_id), distance))
+    return closest
+
+
+def get_closest_users_ann(index: PreferenceIndex, user_ids: Sequence[str], limit: int = MAX, nprobe: int = DEFAULT_NPROBE) -> dict[str, list[tuple[str, float]]]:
+    """Même résultat que get_closest_users_batch, calculé par l'index ANN en mémoire (sans requête)."""
+    closest: dict[str, list[tuple[str, float]]] = {}
+    for user_id in user_ids:
+        neighbours = index.search_account(user_id, limit, nprobe)
+        if neighbours:
+            closest[user_id] = neighbours
+    return closest
+
+
+def get_listened_tracks_batch(cursor, account_ids: Iterable[str]) -> dict[str, list[tuple[str, str, int]]]:
+    """{account_id: [(track_id, track_title, count), ...]} pour tous les comptes en une requête."""
+    cursor.execute(GET_LISTENED_TRACKS_BATCH_QUERY, (list(account_ids),))
+    listened: dict[str, list[tuple[str, str, int]]] = {}
+    for account_id, track_id, track_title, count in cursor.fetchall():
+        listened.setdefault(str(account_id), []).append((track_id, track_title, count))
+    return listened
+
+
+def score_tracks(
+    neighbours: Sequence[tuple[str, float]],
+    listened: dict[str, list[tuple[str, str, int]]],
+    own_history: Iterable[tuple[str, str, int]],
+    top: int = TOP,
+) -> list[tuple[str, str, float]]:
+    """
+    Titres écoutés par les voisins, chacun une seule fois, score = somme de (1 - distance) x count
+    sur les voisins qui l'ont écouté ; les titres déjà écoutés par l'utilisateur sont exclus.
+    Top-k par tas : (track_id, track_title, score), meilleur score d'abord (track_id en cas d'égalité).
+    """
+    already_listened = {track_id for track_id, _, _ in own_history}
+    scores: dict[str, float] = {}
+    titles: dict[str, str] = {}
+    for neighbour_id, distance in neighbours:
+        weight = max(1.0 - distance, 0.0)
+        for track_id, track_title, count in listened.get(neighbour_id, []):
+            if track_id in already_listened:
+                continue
+            scores[track_id] = scores.get(track_id, 0.0) + weight * count
+            titles[track_id] = track_title
+    best = heapq.nsmallest(top, scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(track_id, titles[track_id], score) for track_id, score in best]
 
-    cursor.execute(GET_CLOSEST_USERS_QUERY, (user_id, user_id, MAX))
-    closest_users_id_and_distance = cursor.fetchall()
 
-    recommended_music: list = []
+def recommend_batch(
+    cursor,
+    user_ids: Sequence[str],
+    limit: int = MAX,
+    index: PreferenceIndex | None = None,
+    top: int = TOP,
+) -> dict[str, list[tuple[str, str, float]]]:
+    """
+    Recommandations de plusieurs utilisateurs en deux requêtes, quel que soit leur nombre :
+    les voisins de tous les utilisateurs, puis les écoutes des voisins et des utilisateurs.
+    Avec `index`, les voisins viennent de l'index ANN et seule la seconde requête reste.
+    """
+    # Identifiants canoniques (minuscules) ; un identifiant invalide n'annule pas tout le lot
+    canonical: dict[str, str | None] = {user_id: canonical_id(user_id) for user_id in user_ids}
+    valid = [account_id for account_id in dict.fromkeys(canonical.values()) if account_id is not None]
+    if index is not None:
+        closest = get_closest_users_ann(index, valid, limit)
+    else:
+        closest = get_closest_users_batch(cursor, valid, limit) if valid else {}
+    accounts = {neighbour_id for pairs in closest.values() for neighbour_id, _ in pairs} | closest.keys()
+    listened = get_listened_tracks_batch(cursor, accounts) if accounts else {}
+
+    recommendations: dict[str, list[tuple[str, str, float]]] = {}
+    for user_id in user_ids:
+        account_id = canonical[user_id]
+        recommendations[user_id] = score_tracks(
+            closest.get(account_id, []), listened, listened.get(account_id, []), top
+        )
+    return recommendations
+
+
+def recommend_batch_sql(cursor, user_ids: Sequence[str], limit: int = MAX, top: int = TOP) -> dict[str, list[tuple[str, str, float]]]:
+    """Même résultat que recommend_batch, calculé entièrement par PostgreSQL (une requête)."""
+    canonical: dict[str, str | None] = {user_id: canonical_id(user_id) for user_id in user_ids}
+    valid = [account_id for account_id in dict.fromkeys(canonical.values()) if account_id is not None]
+    ranked: dict[str, list[tuple[str, str, float]]] = {}
+    if valid:
+        cursor.execute(RECOMMEND_TOP_TRACKS_QUERY, {"user_ids": valid, "neighbours": limit, "top": top})
+        for user_id, track_id, track_title, score in cursor.fetchall():
+            ranked.setdefault(str(user_id), []).append((track_id, track_title, float(score)))
+    return {user_id: ranked.get(canonical[user_id], []) for user_id in user_ids}
+
+
+def read_user_ids(path: str) -> list[str]:
+    """Un account_id par ligne ; `-` lit l'entrée standard. Lignes vides et doublons ignorés."""
+    lines = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        return list(dict.fromkeys(line.strip() for line in lines if line.strip()))
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="User based recommendations from the closest preference vectors.")
+    parser.add_argument("user_id", nargs="?", help="Account to recommend for")
+    parser.add_argument("--file", help="File with one account_id per line (- for stdin); prints one JSON line per user")
+    parser.add_argument("--limit", type=int, default=MAX, help="Neighbours per user")
+    parser.add_argument("--top", type=int, default=TOP, help="Tracks recommended per user")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--ann", action="store_true", help="Find neighbours with the in-process index (vector_index.py build)")
+    source.add_argument("--sql", action="store_true", help="Score and rank in PostgreSQL, only the top tracks are returned")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.user_id is None and args.file is None:
+        print("user_id missing")
+        exit(1)
+
+    user_ids: list[str] = read_user_ids(args.file) if args.file else [args.user_id]
+    index: PreferenceIndex | None = None
+    if args.ann:
+        if not PreferenceIndex.exists():
+            print("ANN index missing: run `python src/user_based/vector_index.py build`")
+            exit(1)
+        index = PreferenceIndex.load()
 
-    for user_id_and_dist in closest_users_id_and_distance:
-        cursor.execute(GET_LISTENED_TRACKS_QUERY, (user_id_and_dist[0],))
-        listened_tracks = cursor.fetchall()
-        recommended_music += listened_tracks
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        if args.sql:
+            recommendations = recommend_batch_sql(cursor, user_ids, args.limit, args.top)
+        else:
+            recommendations = recommend_batch(cursor, user_ids, args.limit, index, args.top)
 
-    print(recommended_music)
+    if args.file is None:
+        print(recommendations[args.user_id])
+        return
+    for user_id, recommended_music in recommendations.items():
+        print(json.dumps({"account_id": user_id, "tracks": recommended_music}, ensure_ascii=False))
 
 
 if __name__ == "__main__":
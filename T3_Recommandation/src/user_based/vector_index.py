@@ -0,0 +1,492 @@
+"""Index ANN (IVF) des vecteurs de préférences, en mémoire dans le processus.
+
+Les vecteurs de `preference_vector`, normalisés, sont répartis en listes autour de
+centroïdes (k-means sphérique) et écrits triés par liste dans des `.npy` chargés en
+`mmap` : une requête ne compare le vecteur qu'aux centroïdes puis aux `nprobe` listes
+les plus proches. La distance renvoyée est celle de pgvector (`<=>`, 1 - cosinus).
+
+Mise à jour incrémentale : `sync` compare l'empreinte de chaque vecteur
+(`md5(embedding::text)`) à la base ; les vecteurs nouveaux ou modifiés vont dans un
+segment de queue parcouru en entier, les anciens sont marqués supprimés. Au-delà de
+`REBUILD_RATIO` de lignes modifiées, l'index est reconstruit (centroïdes compris).
+Les fichiers écrits par `sync` portent le numéro de génération de `meta.json`, remplacé
+en dernier : un `load` concurrent lit toujours une génération complète.
+
+    python src/user_based/vector_index.py build
+    python src/user_based/vector_index.py sync
+    python src/user_based/vector_index.py query <account_id> -k 5
+    python src/user_based/vector_index.py bench
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+# db_pool.py est partagé par tous les recommandeurs (T3_Recommandation/src)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import pooled_connection
+
+
+DEFAULT_INDEX_DIR: Path = Path(
+    os.getenv("PREFERENCE_INDEX_DIR", Path(__file__).resolve().parent / "artifacts" / "preference_index")
+)
+FORMAT_VERSION: int = 1
+DEFAULT_NPROBE: int = 8
+KMEANS_ITERATIONS: int = 10
+KMEANS_SAMPLE: int = 100_000
+ASSIGN_CHUNK: int = 65_536
+FETCH_BATCH: int = 5_000
+# Part de lignes supprimées ou en queue au-delà de laquelle sync reconstruit tout
+REBUILD_RATIO: float = 0.2
+
+# Fichiers réécrits par sync, suffixés par la génération (meta.json)
+MUTABLE_FILES: tuple[str, ...] = ("alive", "tail_vectors", "tail_ids", "tail_hashes")
+
+ID_DTYPE = "S36"
+HASH_DTYPE = "S32"
+
+COUNT_VECTORS_QUERY: str = "SELECT count(*) FROM preference_vector WHERE embedding IS NOT NULL;"
+
+SELECT_VECTORS_QUERY: str = """
+SELECT account_id::text, md5(embedding::text), embedding::real[]
+FROM preference_vector
+WHERE embedding IS NOT NULL;
+"""
+
+SELECT_HASHES_QUERY: str = """
+SELECT account_id::text, md5(embedding::text)
+FROM preference_vector
+WHERE embedding IS NOT NULL;
+"""
+
+SELECT_VECTORS_BY_ID_QUERY: str = """
+SELECT account_id::text, md5(embedding::text), embedding::real[]
+FROM preference_vector
+WHERE account_id = ANY(%s::uuid[]) AND embedding IS NOT NULL;
+"""
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Lignes de norme 1 (un vecteur nul reste nul : distance 1 à tout le monde)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, seed: int = 0) -> np.ndarray:
+    """k-means sphérique (produit scalaire sur vecteurs normalisés), sur un échantillon au besoin."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[np.sort(rng.choice(len(vectors), KMEANS_SAMPLE, replace=False))]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        # Une liste vide repart d'un point tiré au hasard
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        labels[start:start + ASSIGN_CHUNK] = np.argmax(vectors[start:start + ASSIGN_CHUNK] @ centroids.T, axis=1)
+    return labels
+
+
+def _file_name(name: str, generation: int = 0) -> str:
+    """`build` écrit la génération 0 sans suffixe, chaque `sync` la suivante."""
+    return f"{name}.{generation}.npy" if generation and name in MUTABLE_FILES else f"{name}.npy"
+
+
+def _save(directory: Path, name: str, array: np.ndarray, generation: int = 0) -> None:
+    """Écriture atomique : un lecteur voit l'ancien fichier ou le nouveau, jamais un fichier partiel."""
+    tmp = directory / f".{name}.tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, directory / _file_name(name, generation))
+
+
+def _save_meta(directory: Path, meta: dict) -> None:
+    tmp = directory / ".meta.json.tmp"
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, directory / "meta.json")
+
+
+@dataclass
+class SyncStats:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    rebuilt: bool = False
+
+
+class PreferenceIndex:
+    def __init__(self, directory: Path, meta: dict, centroids, offsets, vectors, ids, hashes, alive, tail_vectors, tail_ids, tail_hashes):
+        self.directory = directory
+        self.meta = meta
+        self.centroids: np.ndarray = centroids
+        self.offsets: np.ndarray = offsets
+        # Segment principal, trié par liste (mmap)
+        self.vectors: np.ndarray = vectors
+        self.ids: np.ndarray = ids
+        self.hashes: np.ndarray = hashes
+        self.alive: np.ndarray = alive
+        # Segment de queue : vecteurs ajoutés ou modifiés depuis la construction
+        self.tail_vectors: np.ndarray = tail_vectors
+        self.tail_ids: np.ndarray = tail_ids
+        self.tail_hashes: np.ndarray = tail_hashes
+        self._positions: dict[bytes, tuple[bool, int]] | None = None
+        self.has_deleted: bool = not alive.all()
+
+    # --- Construction et chargement ---
+
+    @classmethod
+    def build(cls, conn, directory: Path = DEFAULT_INDEX_DIR, n_lists: int | None = None, seed: int = 0) -> "PreferenceIndex":
+        """Lit tous les vecteurs (curseur serveur, tableaux préalloués) et remplace l'index sur disque."""
+        with conn.cursor() as cur:
+            cur.execute(COUNT_VECTORS_QUERY)
+            expected: int = cur.fetchone()[0]
+        ids = np.empty(expected, dtype=ID_DTYPE)
+        hashes = np.empty(expected, dtype=HASH_DTYPE)
+        vectors: np.ndarray | None = None
+        size = 0
+        with conn.cursor(name="preference_index_build") as cur:
+            cur.itersize = FETCH_BATCH
+            cur.execute(SELECT_VECTORS_QUERY)
+            while True:
+                rows = cur.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                end = size + len(rows)
+                if end > len(ids):
+                    # Vecteurs ajoutés entre le COUNT et la lecture
+                    ids = np.resize(ids, end)
+                    hashes = np.resize(hashes, end)
+                    vectors = None if vectors is None else np.resize(vectors, (end, vectors.shape[1]))
+                batch = np.asarray([row[2] for row in rows], dtype=np.float32)
+                if vectors is None:
+                    vectors = np.empty((max(expected, end), batch.shape[1]), dtype=np.float32)
+                ids[size:end] = [row[0] for row in rows]
+                hashes[size:end] = [row[1] for row in rows]
+                vectors[size:end] = normalize(batch)
+                size = end
+        if vectors is None:
+            raise ValueError("preference_vector is empty: run populate_vectors.py first")
+        ids, hashes, vectors = ids[:size], hashes[:size], vectors[:size]
+
+        n_lists = min(n_lists or max(1, int(np.sqrt(size))), size)
+        centroids = train_centroids(vectors, n_lists, seed)
+        labels = assign_lists(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+
+        # Nouveau répertoire complet puis échange : les processus qui ont l'ancien en mmap le gardent
+        directory = Path(directory)
+        staging = directory.with_name(directory.name + ".building")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        dim = vectors.shape[1]
+        for name, array in {
+            "centroids": centroids,
+            "offsets": offsets,
+            "vectors": vectors[order],
+            "ids": ids[order],
+            "hashes": hashes[order],
+            "alive": np.ones(size, dtype=bool),
+            "tail_vectors": np.empty((0, dim), dtype=np.float32),
+            "tail_ids": np.empty(0, dtype=ID_DTYPE),
+            "tail_hashes": np.empty(0, dtype=HASH_DTYPE),
+        }.items():
+            np.save(staging / f"{name}.npy", array)
+        meta = {"version": FORMAT_VERSION, "dimension": dim, "lists": n_lists, "built_at": time.time(), "generation": 0}
+        (staging / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        previous = directory.with_name(directory.name + ".previous")
+        shutil.rmtree(previous, ignore_errors=True)
+        if directory.exists():
+            os.replace(directory, previous)
+        os.replace(staging, directory)
+        shutil.rmtree(previous, ignore_errors=True)
+        return cls.load(directory)
+
+    @classmethod
+    def load(cls, directory: Path = DEFAULT_INDEX_DIR) -> "PreferenceIndex":
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported index version {meta.get('version')}, rebuild it")
+        generation = meta.get("generation", 0)
+
+        def mapped(name: str) -> np.ndarray:
+            # Vue ndarray sur le mmap : même mémoire, sans le surcoût de np.memmap à chaque indexation
+            return np.asarray(np.load(directory / _file_name(name), mmap_mode="r"))
+
+        def loaded(name: str) -> np.ndarray:
+            return np.load(directory / _file_name(name, generation))
+
+        index = cls(
+            directory,
+            meta,
+            loaded("centroids"),
+            loaded("offsets"),
+            mapped("vectors"),
+            mapped("ids"),
+            mapped("hashes"),
+            loaded("alive"),
+            loaded("tail_vectors"),
+            loaded("tail_ids"),
+            loaded("tail_hashes"),
+        )
+        if (
+            len(index.alive) != len(index.ids)
+            or index.offsets[-1] != len(index.ids)
+            or not len(index.tail_vectors) == len(index.tail_ids) == len(index.tail_hashes)
+        ):
+            raise ValueError(f"index files in {directory} are inconsistent, rebuild it")
+        return index
+
+    @staticmethod
+    def exists(directory: Path = DEFAULT_INDEX_DIR) -> bool:
+        return (Path(directory) / "meta.json").exists()
+
+    # --- Requêtes ---
+
+    def __len__(self) -> int:
+        return int(self.alive.sum()) + len(self.tail_ids)
+
+    def _position(self, account_id: str) -> tuple[bool, int] | None:
+        """(dans la queue ?, ligne) d'un compte encore présent dans l'index."""
+        if self._positions is None:
+            positions = {key: (False, row) for row, key in enumerate(self.ids.tolist()) if self.alive[row]}
+            positions.update({key: (True, row) for row, key in enumerate(self.tail_ids.tolist())})
+            self._positions = positions
+        return self._positions.get(account_id.encode())
+
+    def vector_of(self, account_id: str) -> np.ndarray | None:
+        position = self._position(account_id)
+        if position is None:
+            return None
+        in_tail, row = position
+        return self.tail_vectors[row] if in_tail else np.asarray(self.vectors[row])
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = DEFAULT_NPROBE, exclude: str | None = None) -> list[tuple[str, float]]:
+        """k plus proches voisins de `query` : [(account_id, distance cosinus)], du plus proche au plus éloigné."""
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.sqrt(q @ q))
+        if norm > 0:
+            q = q / norm
+        n_lists = len(self.centroids)
+        if nprobe >= n_lists:
+            lists = list(range(n_lists))
+        else:
+            lists = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe].tolist()
+
+        # Une liste = une tranche contiguë du segment principal : un produit matrice-vecteur par liste
+        offsets = self.offsets
+        starts = [offsets[current] for current in lists]
+        ends = [offsets[current + 1] for current in lists]
+        scores = [self.vectors[start:end] @ q for start, end in zip(starts, ends)]
+        if len(self.tail_ids):
+            scores.append(self.tail_vectors @ q)
+        all_scores = np.concatenate(scores) if scores else np.empty(0, dtype=np.float32)
+        if self.has_deleted:
+            dead = np.concatenate([~self.alive[start:end] for start, end in zip(starts, ends)] + [np.zeros(len(self.tail_ids), bool)])
+            all_scores[dead] = -np.inf
+
+        wanted = min(k + (exclude is not None), len(all_scores))
+        if wanted == 0:
+            return []
+        best = np.argpartition(-all_scores, wanted - 1)[:wanted]
+        best = best[np.argsort(-all_scores[best], kind="stable")]
+
+        # Position dans all_scores -> ligne du segment principal ou de la queue
+        bounds = np.cumsum([end - start for start, end in zip(starts, ends)])
+        n_main = int(bounds[-1]) if len(bounds) else 0
+        excluded = exclude.encode() if exclude is not None else None
+        neighbours: list[tuple[str, float]] = []
+        for candidate in best.tolist():
+            score = all_scores[candidate]
+            if score == -np.inf:
+                break
+            if candidate < n_main:
+                slot = int(np.searchsorted(bounds, candidate, side="right"))
+                key = self.ids[starts[slot] + candidate - (bounds[slot - 1] if slot else 0)]
+            else:
+                key = self.tail_ids[candidate - n_main]
+            if key == excluded:
+                continue
+            neighbours.append((key.decode(), float(1.0 - score)))
+            if len(neighbours) == k:
+                break
+        return neighbours
+
+    def search_account(self, account_id: str, k: int, nprobe: int = DEFAULT_NPROBE) -> list[tuple[str, float]]:
+        """Voisins d'un compte de l'index (lui-même exclu) ; [] s'il n'a pas de vecteur."""
+        vector = self.vector_of(account_id)
+        if vector is None:
+            return []
+        return self.search(vector, k, nprobe, exclude=account_id)
+
+    # --- Mise à jour incrémentale ---
+
+    def sync(self, conn, rebuild_ratio: float = REBUILD_RATIO) -> SyncStats:
+        """Aligne l'index sur preference_vector ; reconstruit tout si trop de lignes ont changé."""
+        with conn.cursor() as cur:
+            cur.execute(SELECT_HASHES_QUERY)
+            current: dict[bytes, bytes] = {account_id.encode(): digest.encode() for account_id, digest in cur.fetchall()}
+
+        indexed: dict[bytes, bytes] = {
+            key: digest for key, digest, alive in zip(self.ids.tolist(), self.hashes.tolist(), self.alive) if alive
+        }
+        indexed.update(zip(self.tail_ids.tolist(), self.tail_hashes.tolist()))
+
+        changed = [key for key, digest in current.items() if indexed.get(key) != digest]
+        removed = [key for key in indexed if key not in current]
+        stats = SyncStats(
+            added=sum(key not in indexed for key in changed),
+            updated=sum(key in indexed for key in changed),
+            removed=len(removed),
+        )
+        if not changed and not removed:
+            return stats
+
+        gone = set(changed) | set(removed)
+        alive = self.alive.copy()
+        for key in gone:
+            position = self._position(key.decode())
+            if position is not None and not position[0]:
+                alive[position[1]] = False
+        keep = np.array([key not in gone for key in self.tail_ids.tolist()], dtype=bool)
+        tail_vectors, tail_ids, tail_hashes = self.tail_vectors[keep], self.tail_ids[keep], self.tail_hashes[keep]
+
+        # Trop de lignes mortes ou en queue : les listes ne reflètent plus les données
+        if int((~alive).sum()) + len(tail_ids) + len(changed) > rebuild_ratio * max(len(self.ids), 1):
+            rebuilt = PreferenceIndex.build(conn, self.directory)
+            self.__dict__.update(rebuilt.__dict__)
+            stats.rebuilt = True
+            return stats
+
+        rows = []
+        if changed:
+            with conn.cursor() as cur:
+                cur.execute(SELECT_VECTORS_BY_ID_QUERY, ([key.decode() for key in changed],))
+                rows = cur.fetchall()
+        if rows:
+            tail_vectors = np.concatenate([tail_vectors, normalize([row[2] for row in rows])])
+            tail_ids = np.concatenate([tail_ids, np.array([row[0] for row in rows], dtype=ID_DTYPE)])
+            tail_hashes = np.concatenate([tail_hashes, np.array([row[1] for row in rows], dtype=HASH_DTYPE)])
+
+        # Nouvelle génération complète, puis meta.json qui la désigne : les quatre tableaux
+        # changent ensemble pour un load concurrent. La génération précédente reste sur
+        # disque pour un lecteur qui vient de lire l'ancien meta.json.
+        generation = self.meta.get("generation", 0) + 1
+        for name, array in zip(MUTABLE_FILES, (alive, tail_vectors, tail_ids, tail_hashes)):
+            _save(self.directory, name, array, generation)
+        meta = {**self.meta, "generation": generation}
+        _save_meta(self.directory, meta)
+        for name in MUTABLE_FILES:
+            for old in self.directory.glob(f"{name}.*.npy"):
+                if int(old.name.split(".")[1]) < generation - 1:
+                    old.unlink(missing_ok=True)
+        self.meta = meta
+        self.alive, self.tail_vectors, self.tail_ids, self.tail_hashes = alive, tail_vectors, tail_ids, tail_hashes
+        self.has_deleted = not alive.all()
+        self._positions = None
+        return stats
+
+
+def sync_index(conn, directory: Path = DEFAULT_INDEX_DIR) -> SyncStats | None:
+    """Met à jour l'index s'il a déjà été construit (None sinon)."""
+    if not PreferenceIndex.exists(directory):
+        return None
+    return PreferenceIndex.load(directory).sync(conn)
+
+
+def bench(index: PreferenceIndex, k: int, nprobe: int, queries: int) -> None:
+    """Latence moyenne et rappel@k face à une recherche exacte sur les mêmes vecteurs."""
+    keys = [key.decode() for key, alive in zip(index.ids.tolist(), index.alive) if alive]
+    keys += [key.decode() for key in index.tail_ids.tolist()]
+    rng = np.random.default_rng(0)
+    sample = [keys[i] for i in rng.choice(len(keys), min(queries, len(keys)), replace=False)]
+    index.search_account(sample[0], k, nprobe)  # construit la table des positions
+
+    start = time.perf_counter()
+    results = [index.search_account(key, k, nprobe) for key in sample]
+    seconds = time.perf_counter() - start
+
+    everything = np.concatenate([np.asarray(index.vectors)[index.alive], index.tail_vectors])
+    everything_ids = np.concatenate([np.asarray(index.ids)[index.alive], index.tail_ids])
+    hits = 0
+    for key, found in zip(sample, results):
+        scores = everything @ index.vector_of(key)
+        scores[everything_ids == key.encode()] = -np.inf
+        exact = {everything_ids[i] for i in np.argpartition(-scores, k - 1)[:k]}
+        # Égalités de distance : un voisin aussi proche que le k-ième exact compte comme trouvé
+        threshold = np.sort(scores)[-k]
+        hits += sum(account.encode() in exact or 1.0 - distance >= threshold - 1e-6 for account, distance in found)
+    print(f"{len(sample)} queries, k={k}, nprobe={nprobe}/{len(index.centroids)} lists, {len(index)} vectors")
+    print(f"mean latency {seconds / len(sample) * 1e6:.1f} µs, recall@{k} {hits / (len(sample) * k):.3f}")
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="In-process ANN index over preference_vector.")
+    parser.add_argument("--dir", type=Path, default=DEFAULT_INDEX_DIR, help="Index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from preference_vector")
+    build.add_argument("--lists", type=int, default=None, help="Number of IVF lists (default: sqrt(n))")
+    commands.add_parser("sync", help="Apply the changes made to preference_vector since the last build/sync")
+    query = commands.add_parser("query", help="Nearest users of an account")
+    query.add_argument("account_id")
+    query.add_argument("-k", type=int, default=5)
+    query.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    bench_parser = commands.add_parser("bench", help="Latency and recall against an exact search")
+    bench_parser.add_argument("-k", type=int, default=5)
+    bench_parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    bench_parser.add_argument("--queries", type=int, default=1000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = parse_args(argv)
+
+    if args.command in ("build", "sync"):
+        start = time.perf_counter()
+        with pooled_connection() as connection:
+            if args.command == "build" or not PreferenceIndex.exists(args.dir):
+                index = PreferenceIndex.build(connection, args.dir, args.lists if args.command == "build" else None)
+                print(f"Index built: {len(index)} vectors, {len(index.centroids)} lists ({time.perf_counter() - start:.2f}s)")
+                return
+            stats = PreferenceIndex.load(args.dir).sync(connection)
+        state = "rebuilt" if stats.rebuilt else "updated"
+        print(
+            f"Index {state}: {stats.added} added, {stats.updated} updated, {stats.removed} removed "
+            f"({time.perf_counter() - start:.2f}s)"
+        )
+        return
+
+    if not PreferenceIndex.exists(args.dir):
+        print(f"No index in {args.dir}: run `vector_index.py build` first")
+        exit(1)
+    index = PreferenceIndex.load(args.dir)
+    if args.command == "query":
+        for account_id, distance in index.search_account(args.account_id, args.k, args.nprobe):
+            print(f"{account_id}  {distance:.6f}")
+    else:
+        bench(index, args.k, args.nprobe, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,12 @@ Usage :
 
 import os
 import sys
-import psycopg2
 from typing import List, Tuple, Optional
 
+from db_pool import get_db_connection
+from popularity_cache import get_popularity_index
+from similar_users import fetch_similar_users
+
 
 def load_env_file() -> None:
     """Charge les variables d'environnement depuis le .env à la racine du projet."""
@@ -29,27 +32,6 @@ def load_env_file() -> None:
                 os.environ[key.strip()] = value.strip().strip("'").strip('"')
 
 
-def get_db_connection():
-    """Connexion PostgreSQL via variables d'env (avec valeurs par défaut)."""
-    DB_HOST = os.getenv("PGDB_HOST", "localhost")
-    DB_PORT = os.getenv("PGDB_PORT", "5432")
-    DB_NAME = os.getenv("DB_NAME", "sae5idfou")
-    DB_USER = os.getenv("DB_USER", "idfou")
-    DB_PASSWORD = os.getenv("DB_ROOT_PASSWORD")
-
-    try:
-        return psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-        )
-    except Exception as e:
-        print(f"Erreur de connexion à la base : {e}")
-        return None
-
-
 def fetch_target_profile(conn, account_id: str) -> Optional[dict]:
     """Récupère profil (démographie) + genres préférés de l'utilisateur."""
     with conn.cursor() as cur:
@@ -86,11 +68,13 @@ def fetch_target_profile(conn, account_id: str) -> Optional[dict]:
 def recommend_for_user(account_id: str, limit: int = 10) -> List[Tuple[str, str, int]]:
     """
     Reco basée sur :
-    - utilisateurs similaires (score sur préférences)
+    - utilisateurs similaires (score sur préférences), lus dans le graphe précalculé
+      par similar_users.py (les K plus proches)
     - recos filtrées par genres si existants
+    - sinon, pistes les plus écoutées puis genres les plus choisis (popularity_cache.py)
     Exclut les titres déjà écoutés.
+    Le .env est chargé par l'appelant (voir __main__) : rien n'est relu à chaque appel.
     """
-    load_env_file()
     conn = get_db_connection()
     if not conn:
         return []
@@ -104,73 +88,30 @@ def recommend_for_user(account_id: str, limit: int = 10) -> List[Tuple[str, str,
         has_genres = bool(profile["genres"])
         genre_ids = [g[0] for g in profile["genres"]]
 
-        with conn.cursor() as cur:
-            cur.execute("DROP TABLE IF EXISTS tmp_similar_users")
-            cur.execute(
-                """
-                CREATE TEMP TABLE tmp_similar_users AS
-                WITH target AS (
-                    SELECT
-                        age_range,
-                        gender,
-                        frequency,
-                        context,
-                        when_listening,
-                        duration_pref,
-                        energy_pref,
-                        tempo_pref,
-                        feeling_pref,
-                        is_live_pref,
-                        quality_pref,
-                        curiosity_pref,
-                        platform,
-                        how,
-                        utility
-                    FROM preference
-                    WHERE account_id = %s
-                )
-                SELECT
-                    p.account_id,
-                    (
-                        (CASE WHEN p.age_range IS NOT NULL AND p.age_range = t.age_range THEN 3 ELSE 0 END) +
-                        (CASE WHEN p.gender IS NOT NULL AND p.gender = t.gender THEN 2 ELSE 0 END) +
-                        (CASE WHEN p.platform IS NOT NULL AND p.platform = t.platform THEN 2 ELSE 0 END) +
-                        (CASE WHEN p.how IS NOT NULL AND p.how = t.how THEN 2 ELSE 0 END) +
-                        (CASE WHEN p.context IS NOT NULL AND p.context = t.context THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.frequency IS NOT NULL AND p.frequency = t.frequency THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.when_listening IS NOT NULL AND p.when_listening = t.when_listening THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.feeling_pref IS NOT NULL AND p.feeling_pref = t.feeling_pref THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.energy_pref IS NOT NULL AND p.energy_pref = t.energy_pref THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.is_live_pref IS NOT NULL AND p.is_live_pref = t.is_live_pref THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.utility IS NOT NULL AND p.utility = t.utility THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.duration_pref IS NOT NULL AND t.duration_pref IS NOT NULL AND ABS(p.duration_pref - t.duration_pref) <= 5 THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.quality_pref IS NOT NULL AND t.quality_pref IS NOT NULL AND ABS(p.quality_pref - t.quality_pref) <= 2 THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.curiosity_pref IS NOT NULL AND t.curiosity_pref IS NOT NULL AND ABS(p.curiosity_pref - t.curiosity_pref) <= 2 THEN 1 ELSE 0 END) +
-                        (CASE WHEN p.tempo_pref IS NOT NULL AND t.tempo_pref IS NOT NULL AND ABS(p.tempo_pref - t.tempo_pref) <= 10 THEN 1 ELSE 0 END)
-                    ) AS score
-                FROM preference p
-                CROSS JOIN target t
-                WHERE p.account_id <> %s;
-                """,
-                (account_id, account_id),
-            )
+        similar = fetch_similar_users(conn, account_id)
+        similar_ids = [row[0] for row in similar]
+        similar_scores = [row[1] for row in similar]
 
+        with conn.cursor() as cur:
             genre_filter = ""
             params: Tuple
             if has_genres:
                 genre_filter = "AND tg.genre_id = ANY(%s::uuid[])"
-                params = (account_id, genre_ids, limit)
+                params = (similar_ids, similar_scores, account_id, genre_ids, limit)
             else:
-                params = (account_id, limit)
+                params = (similar_ids, similar_scores, account_id, limit)
 
             cur.execute(
                 f"""
+                WITH sim(account_id, score) AS (
+                    SELECT * FROM unnest(%s::uuid[], %s::int[])
+                )
                 SELECT
                     tr.track_id,
                     tr.track_title,
                     SUM(l.count * GREATEST(sim.score, 1)) AS total_score
                 FROM track_user_listen l
-                JOIN tmp_similar_users sim ON sim.account_id = l.account_id
+                JOIN sim ON sim.account_id = l.account_id
                 JOIN track tr ON tr.track_id = l.track_id
                 LEFT JOIN track_genre tg ON tg.track_id = tr.track_id
                 WHERE tr.track_id NOT IN (
@@ -188,77 +129,11 @@ def recommend_for_user(account_id: str, limit: int = 10) -> List[Tuple[str, str,
 
             if not rows:
                 print("Pas de recos via utilisateurs similaires, fallback popularité globale.")
-                genre_filter_global = ""
-                params_global: Tuple = ()
-                if has_genres:
-                    genre_filter_global = "WHERE tg.genre_id = ANY(%s::uuid[])"
-                    params_global = (genre_ids,)
-
-                cur.execute(
-                    f"""
-                    SELECT
-                        tr.track_id,
-                        tr.track_title,
-                        SUM(l.count) AS total_listens
-                    FROM track_user_listen l
-                    JOIN track tr ON tr.track_id = l.track_id
-                    LEFT JOIN track_genre tg ON tg.track_id = tr.track_id
-                    {genre_filter_global}
-                    GROUP BY tr.track_id, tr.track_title
-                    ORDER BY total_listens DESC
-                    LIMIT %s
-                    """,
-                    params_global + (limit,),
-                )
-                rows = cur.fetchall()
-
-            if not rows:
-                if has_genres:
-                    cur.execute(
-                        """
-                        WITH pref_counts AS (
-                            SELECT genre_id, count(*) AS genre_pref_count
-                            FROM genre_preference
-                            GROUP BY genre_id
-                        ),
-                        candidate AS (
-                            SELECT tr.track_id, tr.track_title, COALESCE(pc.genre_pref_count, 0) AS score
-                            FROM track tr
-                            JOIN track_genre tg ON tg.track_id = tr.track_id
-                            LEFT JOIN pref_counts pc ON pc.genre_id = tg.genre_id
-                            WHERE tg.genre_id = ANY(%s::uuid[])
-                        )
-                        SELECT track_id, track_title, MAX(score) AS score
-                        FROM candidate
-                        GROUP BY track_id, track_title
-                        ORDER BY score DESC, random()
-                        LIMIT %s
-                        """,
-                        (genre_ids, limit),
-                    )
-                else:
-                    cur.execute(
-                        """
-                        WITH pref_counts AS (
-                            SELECT genre_id, count(*) AS genre_pref_count
-                            FROM genre_preference
-                            GROUP BY genre_id
-                        ),
-                        candidate AS (
-                            SELECT tr.track_id, tr.track_title, COALESCE(pc.genre_pref_count, 0) AS score
-                            FROM track tr
-                            LEFT JOIN track_genre tg ON tg.track_id = tr.track_id
-                            LEFT JOIN pref_counts pc ON pc.genre_id = tg.genre_id
-                        )
-                        SELECT track_id, track_title, MAX(score) AS score
-                        FROM candidate
-                        GROUP BY track_id, track_title
-                        ORDER BY score DESC, random()
-                        LIMIT %s
-                        """,
-                        (limit,),
-                    )
-                rows = cur.fetchall()
+                # Classements précalculés (mv_track_popularity), gardés en mémoire : pas d'agrégation ici
+                popularity = get_popularity_index(conn, min_depth=limit)
+                rows = popularity.top_listened(genre_ids, limit)
+                if not rows:
+                    rows = popularity.top_preferred_genres(genre_ids, limit)
 
             return [(r[0], r[1], int(r[2])) for r in rows]
     finally:
@@ -282,5 +157,6 @@ if __name__ == "__main__":
     account_id = sys.argv[1]
     limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
 
+    load_env_file()
     recs = recommend_for_user(account_id, limit=limit)
     print(_format_recs(recs))